@@ -1,40 +1,84 @@
 # analysis.py
 
 import pandas as pd
+from correlations import CORR_METHODS, correlation_matrix, top_pairs
+from outliers import find_outliers
+from grouping import grouped_aggregate
+
+# Every function accepts a DataFrame or a dataset_store.StoredDataset; for a stored
+# (memory-mapped Arrow) dataset only the columns the function needs are read.
+
+# --------------------------
+# Column access
+# --------------------------
+def _columns(df, columns=None):
+    if isinstance(df, pd.DataFrame):
+        return df if columns is None else df[columns]
+    return df.read(columns)
 
 # --------------------------
 # Summary Statistics
 # --------------------------
 def basic_stats(df, columns=None):
     if columns:
-        return df[columns].describe()
-    return df.describe()
+        return _columns(df, columns).describe()
+    if isinstance(df, pd.DataFrame):
+        return df.describe()
+    return df.read(df.numeric_columns()).describe()
 
 # --------------------------
 # Correlation matrix
+# pearson / spearman run on the blocked engine (see correlations); other methods on pandas
 # --------------------------
 def correlation(df, method='pearson'):
-    return df.corr(method=method)
+    data = df if isinstance(df, pd.DataFrame) else df.read(df.numeric_columns())
+    if method in CORR_METHODS:
+        return correlation_matrix(data, method)
+    return data.corr(method=method)
+
+# --------------------------
+# Strongest correlated column pairs (left, right, corr), without the full matrix
+# --------------------------
+def strongest_correlations(df, k=20, method='pearson'):
+    data = df if isinstance(df, pd.DataFrame) else df.read(df.numeric_columns())
+    return top_pairs(data, k, method)
 
 # --------------------------
 # Value counts for categorical columns
 # --------------------------
 def value_counts(df, column):
-    return df[column].value_counts()
+    return _columns(df, [column])[column].value_counts()
 
 # --------------------------
 # Grouped statistics
 # --------------------------
 def grouped_stats(df, group_col, agg_col, agg_func='mean'):
-    return df.groupby(group_col)[agg_col].agg(agg_func).reset_index()
+    data = _columns(df, [group_col, agg_col])
+    return data.groupby(group_col, observed=True)[agg_col].agg(agg_func).reset_index()
+
+# --------------------------
+# Grouped statistics in one batch
+# keys: a column or a list of key sets, e.g. ['region', ['region', 'month']]
+# aggs: count, size, sum, mean, std, var, min, max, median or p<percentile> (e.g. 'p90')
+# returns {key set tuple: frame with '<metric>_<agg>' columns}; factorized keys are
+# cached per dataset (see grouping)
+# --------------------------
+def grouped_stats_many(df, keys, metrics, aggs=('sum', 'mean', 'count')):
+    return grouped_aggregate(df, keys, metrics, aggs)
+
+# --------------------------
+# Detect outliers (rows with an outlier in column)
+# method: 'iqr', 'zscore' or 'mad' (see outliers)
+# --------------------------
+def detect_outliers(df, column, method='iqr', threshold=None):
+    mask = find_outliers(_columns(df, [column]), [column], method, threshold).masks[column]
+    return _columns(df)[mask]
 
 # --------------------------
-# Detect outliers using IQR
+# Outliers across many columns in one batch
+# returns outliers.OutlierResult: per-column masks (or row positions with as_indices=True)
 # --------------------------
-def detect_outliers(df, column):
-    Q1 = df[column].quantile(0.25)
-    Q3 = df[column].quantile(0.75)
-    IQR = Q3 - Q1
-    lower = Q1 - 1.5 * IQR
-    upper = Q3 + 1.5 * IQR
-    return df[(df[column] < lower) | (df[column] > upper)]
+def outlier_masks(df, columns=None, method='iqr', threshold=None, as_indices=False):
+    if columns is None and not isinstance(df, pd.DataFrame):
+        columns = df.numeric_columns()
+    return find_outliers(_columns(df, columns), columns, method, threshold, as_indices)
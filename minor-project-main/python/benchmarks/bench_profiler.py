@@ -0,0 +1,82 @@
+# bench_profiler.py
+"""
+Benchmark: vectorized profiler vs. the previous column-by-column compute_summary loop.
+Run from the python/ directory:  python benchmarks/bench_profiler.py [rows] [columns]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from profiler import profile_columns  # noqa: E402
+
+
+def legacy_profile(df):
+    """The per-column loop compute_summary used before the profiler (without type inference)."""
+    summary = {}
+    for col in df.columns:
+        ser = df[col]
+        info = {
+            "dtype": str(ser.dtype),
+            "n_missing": int(ser.isna().sum()),
+            "n_unique": int(ser.nunique(dropna=True)),
+            "sample_values": ser.dropna().astype(str).unique()[:5].tolist(),
+        }
+        if pd.api.types.is_numeric_dtype(ser):
+            info.update(
+                {
+                    "mean": None if ser.dropna().empty else float(ser.mean()),
+                    "median": None if ser.dropna().empty else float(ser.median()),
+                    "min": None if ser.dropna().empty else float(ser.min()),
+                    "max": None if ser.dropna().empty else float(ser.max()),
+                    "std": None if ser.dropna().empty else float(ser.std()),
+                }
+            )
+        summary[col] = info
+    return summary
+
+
+def make_frame(n_rows, n_cols, seed=0):
+    rng = np.random.default_rng(seed)
+    n_num = int(n_cols * 0.8)
+    data = {f"num_{i}": rng.normal(size=n_rows) for i in range(n_num)}
+    levels = np.array(["alpha", "beta", "gamma", "delta", "epsilon"])
+    for i in range(n_cols - n_num):
+        data[f"cat_{i}"] = levels[rng.integers(0, len(levels), n_rows)]
+    df = pd.DataFrame(data)
+    # sprinkle missing values
+    df.iloc[::97, ::3] = np.nan
+    return df
+
+
+def timeit(fn, df, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_cols = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    df = make_frame(n_rows, n_cols)
+
+    old, new = legacy_profile(df), profile_columns(df)
+    for col in df.columns:
+        for k, v in old[col].items():
+            if isinstance(v, float):
+                assert np.isclose(v, new[col][k], equal_nan=True), (col, k)
+            else:
+                assert v == new[col][k], (col, k)
+
+    t_old = timeit(legacy_profile, df)
+    t_new = timeit(profile_columns, df)
+    print(f"{n_rows:,} rows x {n_cols} columns")
+    print(f"  legacy loop : {t_old:.3f}s")
+    print(f"  vectorized  : {t_new:.3f}s")
+    print(f"  speedup     : {t_old / t_new:.1f}x")
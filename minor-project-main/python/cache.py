@@ -0,0 +1,156 @@
+# cache.py
+"""
+Content-addressed cache for dashboard builds:
+- entries are keyed on a hash of the uploaded bytes plus the options that change
+  the output (cleaning options, dashboard title)
+- each entry stores the rendered dashboard HTML and the intermediate results
+  (compute_summary metadata, pick_columns output, correlation heatmap matrix)
+- the cache lives on local disk and is size-bounded with LRU eviction
+"""
+
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+import pandas as pd
+
+CACHE_DIR = os.getenv("DASHBOARD_CACHE_DIR", "cache")
+CACHE_MAX_BYTES = int(os.getenv("DASHBOARD_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+HTML_FILE = "dashboard.html"
+SUMMARY_FILE = "summary.json"
+COLUMNS_FILE = "columns.json"
+CORRELATION_FILE = "correlation.json"
+COMPACTION_FILE = "compaction.json"
+JSON_ARTIFACTS = (("summary", SUMMARY_FILE), ("columns", COLUMNS_FILE), ("compaction", COMPACTION_FILE))
+
+
+def copy_and_hash(src: BinaryIO, dest_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Copy a stream to dest_path and return the sha256 of its bytes (single pass)."""
+    digest = hashlib.sha256()
+    with open(dest_path, "wb") as out:
+        while True:
+            block = src.read(chunk_size)
+            if not block:
+                break
+            digest.update(block)
+            out.write(block)
+    return digest.hexdigest()
+
+
+def cache_key(content_hash: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """Combine the upload's content hash with the options that change the output."""
+    opts = json.dumps(options or {}, sort_keys=True, default=str)
+    return hashlib.sha256(f"{content_hash}:{opts}".encode("utf-8")).hexdigest()
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return total
+
+
+class DashboardCache:
+    """
+    Disk-backed LRU cache. One directory per key; an entry's last-use time is
+    its directory mtime, so several worker processes can share the cache dir.
+    Entries are written to a temp dir and renamed into place atomically.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached dashboard HTML path for key (marking it recently used), or None."""
+        html_path = os.path.join(self._entry_dir(key), HTML_FILE)
+        if not os.path.exists(html_path):
+            return None
+        try:
+            os.utime(self._entry_dir(key))
+        except OSError:
+            return None
+        return html_path
+
+    def load_artifacts(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached intermediates for key: summary, columns, compaction and correlation."""
+        entry = self._entry_dir(key)
+        if not os.path.isdir(entry):
+            return None
+        artifacts: Dict[str, Any] = {}
+        for name, filename in JSON_ARTIFACTS:
+            path = os.path.join(entry, filename)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    artifacts[name] = json.load(f)
+        corr_path = os.path.join(entry, CORRELATION_FILE)
+        if os.path.exists(corr_path):
+            artifacts["correlation"] = pd.read_json(corr_path, orient="split")
+        return artifacts
+
+    def put(self, key: str, html_path: str, artifacts: Optional[Dict[str, Any]] = None) -> str:
+        """Store a rendered dashboard (and its intermediates) under key; return the cached HTML path."""
+        artifacts = artifacts or {}
+        tmp_dir = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        shutil.copyfile(html_path, os.path.join(tmp_dir, HTML_FILE))
+        for name, filename in JSON_ARTIFACTS:
+            if artifacts.get(name) is not None:
+                with open(os.path.join(tmp_dir, filename), "w", encoding="utf-8") as f:
+                    json.dump(artifacts[name], f, default=str)
+        corr = artifacts.get("correlation")
+        if corr is not None:
+            corr.to_json(os.path.join(tmp_dir, CORRELATION_FILE), orient="split")
+
+        entry = self._entry_dir(key)
+        try:
+            os.rename(tmp_dir, entry)
+        except OSError:
+            # Another worker stored the same key first; theirs is equivalent
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict(keep=key)
+        return os.path.join(entry, HTML_FILE)
+
+    def _entries(self) -> Tuple[list, int]:
+        entries, total = [], 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            size = _dir_size(path)
+            entries.append((mtime, size, path))
+            total += size
+        return entries, total
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove least-recently-used entries until the cache fits in max_bytes (never the entry keep)."""
+        kept = self._entry_dir(keep) if keep is not None else None
+        with self._lock:
+            entries, total = self._entries()
+            for _mtime, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == kept:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        entries, total = self._entries()
+        return {"entries": len(entries), "bytes": total, "max_bytes": self.max_bytes}
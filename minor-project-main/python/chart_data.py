@@ -0,0 +1,128 @@
+# chart_data.py
+"""
+Chart data reduction, applied before any Plotly figure is built:
+- shape-preserving LTTB downsampling for time-series lines
+- histogram bins computed with NumPy instead of embedding raw values
+- groupby pre-aggregation for the stacked bar and pie charts
+Each chart type has a configurable point budget (POINT_BUDGETS).
+"""
+
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+# Max points / bins / categories sent to the browser per chart
+POINT_BUDGETS = {
+    "line": 2000,
+    "histogram": 20,
+    "bar": 30,
+    "bar_colors": 10,
+    "pie": 12,
+}
+OTHER_LABEL = "Other"
+
+
+def budgets(overrides: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Default point budgets merged with per-call overrides."""
+    return {**POINT_BUDGETS, **(overrides or {})}
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out points (x sorted ascending)
+    that best preserve the visual shape of the series.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = x.astype("float64")
+    y = y.astype("float64")
+    # Bucket boundaries for the n - 2 interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        nxt_start, nxt_stop = stop, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_start:nxt_stop].mean()
+        avg_y = y[nxt_start:nxt_stop].mean()
+        bx, by = x[start:stop], y[start:stop]
+        areas = np.abs((x[prev] - avg_x) * (by - y[prev]) - (x[prev] - bx) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(areas))
+        out[i + 1] = prev
+    return out
+
+
+def downsample_line(df: pd.DataFrame, x_col: str, y_col: str, max_points: int) -> pd.DataFrame:
+    """Sorted (x, y) frame for a line chart, reduced to at most max_points with LTTB."""
+    data = df[[x_col, y_col]].dropna()
+    data = data.sort_values(x_col, kind="stable")
+    if len(data) <= max_points:
+        return data.reset_index(drop=True)
+    x = data[x_col]
+    if pd.api.types.is_datetime64_any_dtype(x):
+        x_num = x.to_numpy(dtype="datetime64[ns]").view("int64")
+    else:
+        x_num = x.to_numpy(dtype="float64")
+    idx = lttb_indices(x_num, data[y_col].to_numpy(dtype="float64"), max_points)
+    return data.iloc[idx].reset_index(drop=True)
+
+
+def histogram_bins(series: pd.Series, nbins: int) -> pd.DataFrame:
+    """Bin a numeric column with np.histogram: columns left, right, center, count."""
+    values = series.dropna().to_numpy(dtype="float64")
+    if values.size == 0:
+        return pd.DataFrame(columns=["left", "right", "center", "count"])
+    counts, edges = np.histogram(values, bins=nbins)
+    return pd.DataFrame({
+        "left": edges[:-1],
+        "right": edges[1:],
+        "center": (edges[:-1] + edges[1:]) / 2,
+        "count": counts,
+    })
+
+
+def _fold_other(values: pd.Series, keep: pd.Index) -> pd.Series:
+    """Replace levels outside keep with OTHER_LABEL (as plain object values)."""
+    values = values.astype(object)
+    return values.where(values.isin(keep), OTHER_LABEL)
+
+
+def aggregate_bar(df: pd.DataFrame, x_col: str, y_col: str, color_col: Optional[str] = None,
+                  max_bars: int = POINT_BUDGETS["bar"],
+                  max_colors: int = POINT_BUDGETS["bar_colors"]) -> pd.DataFrame:
+    """
+    Sum y_col per (x_col[, color_col]) for a stacked bar chart. Categories beyond
+    the budget (ranked by total) are folded into an 'Other' bar / segment.
+    """
+    keys = [x_col] + ([color_col] if color_col else [])
+    agg = df.groupby(keys, observed=True, sort=False, dropna=False)[y_col].sum().reset_index()
+    folded = False
+    for col, limit in ((x_col, max_bars), (color_col, max_colors)):
+        if not col:
+            continue
+        totals = agg.groupby(col, observed=True, sort=False)[y_col].sum()
+        if len(totals) > limit:
+            agg[col] = _fold_other(agg[col], totals.nlargest(limit - 1).index)
+            folded = True
+    if folded:
+        agg = agg.groupby(keys, observed=True, sort=False, dropna=False)[y_col].sum().reset_index()
+    return agg
+
+
+def aggregate_pie(df: pd.DataFrame, names_col: str, values_col: Optional[str] = None,
+                  max_slices: int = POINT_BUDGETS["pie"]) -> pd.DataFrame:
+    """
+    Slice totals for a pie chart: sum of values_col per level, or row counts when
+    values_col is None (what px.pie does with raw rows). Returns columns names_col, 'value'.
+    """
+    grouped = df.groupby(names_col, observed=True, sort=False)
+    totals = grouped[values_col].sum() if values_col else grouped.size()
+    totals = totals.sort_values(ascending=False)
+    if len(totals) > max_slices:
+        head = totals.iloc[:max_slices - 1]
+        other = pd.Series([totals.iloc[max_slices - 1:].sum()], index=[OTHER_LABEL])
+        totals = pd.concat([head.rename(index=str), other])
+    return pd.DataFrame({names_col: totals.index, "value": totals.to_numpy()})
@@ -0,0 +1,197 @@
+# chunked.py
+"""
+Out-of-core execution mode for the dashboard pipeline:
+- decide from a memory budget whether a file can be loaded whole
+- size CSV chunks so each pass stays within the budget
+- clean, profile, aggregate (cube) and correlate chunk by chunk, keeping only
+  mergeable state in memory: sketches, cube cuboids and 8-byte row fingerprints
+  (at most dedupe.FINGERPRINT_MEMORY_BYTES of them; the rest spill to disk)
+- later chunks are coerced to the schema frozen on the first one: values of a
+  numeric column that do not parse become missing and are counted (coerced)
+- the state stays open after a pass (the hourly base cube is never rolled up in
+  place) and pickles without its derived cube, so lineage.py can resume it later
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import os
+import pandas as pd
+
+from cube import AggregationCube, pick_dimensions
+from dedupe import FINGERPRINT_MEMORY_BYTES, Deduplicator
+from resampling import choose_granularity_for_range
+from schema import NUMERIC, Schema, infer_schema, apply_schema
+from sketches import CovarianceSketch, StreamingProfile
+
+MEMORY_BUDGET_BYTES = int(os.getenv("DASHBOARD_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024
+# A parsed frame plus the pipeline's working copies take several times the CSV's size
+EXPANSION_FACTOR = 4
+PROBE_ROWS = 1000
+MIN_CHUNK_ROWS = 1000
+# Chunk cubes are built hourly (the finest trend granularity) and rolled up at the end
+BASE_TIME_FREQ = "h"
+
+
+def fits_in_memory(n_bytes: int, budget: int = MEMORY_BUDGET_BYTES) -> bool:
+    """Whether a file of n_bytes can be processed as a single in-memory frame."""
+    return n_bytes * EXPANSION_FACTOR <= budget
+
+
+def chunk_rows_for_budget(path: str, budget: int = MEMORY_BUDGET_BYTES, **read_kwargs) -> int:
+    """Rows per CSV chunk such that a parsed chunk and its working copies fit in budget."""
+    probe = pd.read_csv(path, nrows=PROBE_ROWS, **read_kwargs)
+    per_row = probe.memory_usage(deep=True).sum() / max(1, len(probe))
+    return max(MIN_CHUNK_ROWS, int(budget / (max(per_row, 1.0) * EXPANSION_FACTOR)))
+
+
+class ChunkedPass:
+    """
+    One streaming pass over a dataset. The schema and chart columns are decided
+    on the first (cleaned) chunk; everything else is accumulated mergeably.
+    column_picker is main.pick_columns (passed in to avoid a circular import).
+    Chunks accumulate into base_cube (hourly); finish() derives cube, rolled up
+    to the trend granularity, and more chunks can be fed in afterwards.
+    """
+
+    def __init__(self, cleaning: Dict[str, Any], column_picker: Callable):
+        self.cleaning = cleaning
+        self.column_picker = column_picker
+        self.seen = Deduplicator(max_bytes=FINGERPRINT_MEMORY_BYTES) if cleaning.get("drop_duplicates") else None
+        self.schema: Optional[Schema] = None
+        self.columns = None
+        self.n_columns = 0
+        self.profile = StreamingProfile()
+        self.base_cube: Optional[AggregationCube] = None
+        self.cube: Optional[AggregationCube] = None
+        self.covariance: Optional[CovarianceSketch] = None
+        self._cube_args: Dict[str, Any] = {}
+        self._time_range = [None, None, 0]
+        self.time_label: Optional[str] = None
+        # Rows fed in, before deduplication and dropna
+        self.rows_read = 0
+        # column -> values that did not fit the frozen schema and were read as missing
+        self.coerced: Dict[Any, int] = {}
+
+    def __getstate__(self):
+        # The rolled-up cube is derived from base_cube by finish()
+        return {**self.__dict__, "cube": None}
+
+    def __setstate__(self, state):
+        # States pickled before coerced was recorded
+        self.__dict__.update({"coerced": {}, **state})
+
+    def spill_to(self, directory: str):
+        """Spill dedupe fingerprints past the memory cap into directory (e.g. a lineage's)."""
+        if self.seen is not None:
+            self.seen.seen.spill_dir = directory
+            if self.seen.seen.max_bytes is None:
+                self.seen.seen.max_bytes = FINGERPRINT_MEMORY_BYTES
+
+    def flush(self) -> List[str]:
+        """Spill the in-memory fingerprints too; returns every fingerprint segment file the state refers to."""
+        if self.seen is None:
+            return []
+        self.seen.seen.spill()
+        return self.seen.seen.segment_files()
+
+    def _coerce(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        chunk with its numeric-kind columns made numeric. The kinds were fixed on
+        the first chunk, where e.g. a column may have been empty; a later chunk's
+        strings there become missing rather than breaking the numeric sketches.
+        """
+        conversions = {}
+        for name, col in self.schema.columns.items():
+            if col.kind != NUMERIC or name not in chunk.columns:
+                continue
+            ser = chunk[name]
+            if pd.api.types.is_numeric_dtype(ser) or pd.api.types.is_bool_dtype(ser):
+                continue
+            values = pd.to_numeric(ser, errors="coerce")
+            lost = int((ser.notna() & values.isna()).sum())
+            if lost:
+                if name not in self.coerced:
+                    print(f"⚠️ {name}: non-numeric values after the first chunk are read as missing")
+                self.coerced[name] = self.coerced.get(name, 0) + lost
+            conversions[name] = values
+        if not conversions:
+            return chunk
+        out = chunk.copy(deep=False)
+        for name, values in conversions.items():
+            out[name] = values
+        return out
+
+    def _setup(self, chunk: pd.DataFrame):
+        self.columns = self.column_picker(chunk, self.schema)
+        numeric_cols, categorical_cols, time_col, stacked_cols, pie_col, _val_col, _hist_col = self.columns
+        bar_x, bar_color = (stacked_cols[0], stacked_cols[2]) if stacked_cols else (None, None)
+        chart_dims = [c for c in (bar_x, bar_color, pie_col) if c]
+        self._cube_args = {
+            "measures": numeric_cols,
+            "dimensions": pick_dimensions(chunk, categorical_cols) + chart_dims,
+            "time_col": time_col,
+            "time_freq": BASE_TIME_FREQ if time_col else None,
+            "pairs": [(bar_x, bar_color)] if bar_x and bar_color else [],
+        }
+        self.covariance = CovarianceSketch(numeric_cols)
+        self.n_columns = chunk.shape[1]
+
+    def update(self, chunk: pd.DataFrame) -> "ChunkedPass":
+        self.rows_read += len(chunk)
+        if self.seen is not None:
+            chunk = self.seen.filter(chunk)
+        if self.cleaning.get("missing") == "drop":
+            chunk = chunk.dropna()
+        if chunk.empty:
+            return self
+        if self.schema is None:
+            self.schema = infer_schema(chunk)
+        chunk = self._coerce(apply_schema(chunk, self.schema))
+        if self.columns is None:
+            self._setup(chunk)
+
+        self.profile.update(chunk)
+        self.covariance.update(chunk)
+        part = AggregationCube.build(chunk, **self._cube_args)
+        self.base_cube = part if self.base_cube is None else self.base_cube.merge(part)
+
+        time_col = self._cube_args["time_col"]
+        if time_col:
+            times = chunk[time_col].dropna()
+            if len(times):
+                lo, hi, n = self._time_range
+                self._time_range = [times.min() if lo is None else min(lo, times.min()),
+                                    times.max() if hi is None else max(hi, times.max()),
+                                    n + len(times)]
+        return self
+
+    def run(self, chunks: Iterable[pd.DataFrame]) -> "ChunkedPass":
+        """Consume all chunks, then finish()."""
+        for chunk in chunks:
+            self.update(chunk)
+        return self.finish()
+
+    def finish(self) -> "ChunkedPass":
+        """Set cube: a copy of base_cube rolled up to the trend granularity of all rows so far."""
+        if self.base_cube is None:
+            self.cube = None
+            return self
+        self.cube = self.base_cube.copy()
+        lo, hi, n = self._time_range
+        if lo is not None:
+            time_freq, self.time_label = choose_granularity_for_range(lo, hi, n)
+            self.cube.rollup_time(time_freq)
+        self.cube.n_columns = self.n_columns
+        return self
+
+    def histogram(self, col, nbins: int) -> pd.DataFrame:
+        """Histogram of a numeric column from its quantile sketch (same shape as chart_data.histogram_bins)."""
+        sk = self.profile.columns[col]
+        if sk.moments.count == 0:
+            return pd.DataFrame(columns=["left", "right", "center", "count"])
+        counts, edges = sk.quantiles.histogram(nbins, (sk.moments.min, sk.moments.max))
+        return pd.DataFrame({
+            "left": edges[:-1],
+            "right": edges[1:],
+            "center": (edges[:-1] + edges[1:]) / 2,
+            "count": counts,
+        })
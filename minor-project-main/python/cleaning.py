@@ -1,24 +1,35 @@
 # cleaning.py
 
 import pandas as pd
+from dataset_store import ARROW_SUFFIXES, StoredDataset
+from dialect import read_with_fallback, sniff_dialect
+from excel import EXCEL_SUFFIXES, read_excel_columnar
+from dedupe import drop_duplicates
+from cleaning_plan import CleaningPlan
 
 # --------------------------
 # Load Data
 # --------------------------
-def load_data(file_path):
+def load_data(file_path, dataset_id=None):
     if file_path.endswith('.csv'):
-        df = pd.read_csv(file_path)
-    elif file_path.endswith(('.xls', '.xlsx')):
-        df = pd.read_excel(file_path)
+        df = read_with_fallback(lambda d: pd.read_csv(file_path, **d.read_kwargs()),
+                                sniff_dialect(file_path), file_path)
+    elif file_path.endswith(EXCEL_SUFFIXES):
+        # With a dataset_id: parsed once, then read from the columnar dataset store
+        df = read_excel_columnar(file_path, dataset_id=dataset_id)
+    elif file_path.endswith(ARROW_SUFFIXES):
+        # Columnar copy from the dataset store: memory-mapped, no parsing
+        df = StoredDataset(file_path).read()
     else:
-        raise ValueError("Unsupported file type. Use CSV or Excel.")
+        raise ValueError("Unsupported file type. Use CSV, Excel or Arrow.")
     return df
 
 # --------------------------
 # Remove duplicates
+# subset: key columns (all columns when None)
 # --------------------------
-def remove_duplicates(df):
-    return df.drop_duplicates()
+def remove_duplicates(df, subset=None):
+    return drop_duplicates(df, subset)[0]
 
 # --------------------------
 # Handle missing values
@@ -27,7 +38,7 @@ def remove_duplicates(df):
 # --------------------------
 def handle_missing(df, method='drop', fill_value=None):
     if method == 'drop':
-        return df.dropna()
+        return CleaningPlan().drop_missing().run(df)[0]
     elif method == 'fill':
         if fill_value is not None:
             return df.fillna(fill_value)
@@ -38,11 +49,23 @@ def handle_missing(df, method='drop', fill_value=None):
 
 # --------------------------
 # Convert data types
+# convert_dtypes: {column: dtype} in one astype call
 # --------------------------
 def convert_dtype(df, column, dtype):
     df[column] = df[column].astype(dtype)
     return df
 
+def convert_dtypes(df, dtypes):
+    return CleaningPlan().cast(dtypes).run(df)[0]
+
+# --------------------------
+# Run several cleaning steps as one fused plan
+# e.g. clean(df, CleaningPlan().dedupe().drop_missing(["price"]).impute("median"))
+# returns (df, report)
+# --------------------------
+def clean(df, plan):
+    return plan.run(df)
+
 # --------------------------
 # Basic summary
 # --------------------------
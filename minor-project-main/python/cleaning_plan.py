@@ -0,0 +1,188 @@
+# cleaning_plan.py
+"""
+Declarative cleaning plans:
+- an ordered list of dedupe / drop_missing / filter / impute / cast steps
+- consecutive row steps (dedupe, drop_missing, filter) are fused into one boolean
+  mask over the input rows and applied with a single take
+- consecutive value steps (impute, cast) compute every fill value in one batched
+  reduction and are applied with one fillna / astype call
+- no defensive df.copy(): with copy-on-write (the default from pandas 3) untouched
+  columns are shared with the input, so peak memory stays near 1x the dataset
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+
+from dedupe import Deduplicator
+
+ROW_STEPS = ("dedupe", "drop_missing", "filter")
+IMPUTE_STRATEGIES = ("mean", "median", "mode", "ffill", "value")
+
+
+class Step:
+    def __init__(self, kind: str, **params):
+        self.kind = kind
+        self.params = params
+
+    def __repr__(self):
+        return f"Step({self.kind!r}, {self.params})"
+
+
+class CleaningPlan:
+    """
+    Build with chained calls, then run():
+
+        df, report = (CleaningPlan().dedupe().drop_missing()
+                      .impute("median").cast({"qty": "int32"}).run(df))
+    """
+
+    def __init__(self, steps: Optional[List[Step]] = None):
+        self.steps: List[Step] = list(steps or [])
+
+    def dedupe(self, subset: Optional[Sequence[str]] = None, bits: int = 64) -> "CleaningPlan":
+        """Drop repeated rows (keep first), comparing subset columns (all when None)."""
+        self.steps.append(Step("dedupe", subset=subset, bits=bits))
+        return self
+
+    def drop_missing(self, columns: Optional[Sequence[str]] = None, how: str = "any") -> "CleaningPlan":
+        """Drop rows with missing values in columns (all when None); how is 'any' or 'all'."""
+        if how not in ("any", "all"):
+            raise ValueError("how must be 'any' or 'all'")
+        self.steps.append(Step("drop_missing", columns=columns, how=how))
+        return self
+
+    def filter(self, condition: Union[str, Callable[[pd.DataFrame], Any]]) -> "CleaningPlan":
+        """Keep rows matching a DataFrame.eval expression or a callable returning a boolean mask."""
+        self.steps.append(Step("filter", condition=condition))
+        return self
+
+    def impute(self, strategy: str, columns: Optional[Sequence[str]] = None, value: Any = None,
+               fallback: Optional[str] = "ffill") -> "CleaningPlan":
+        """
+        Fill missing values in columns (all when None). 'mean' / 'median' apply to
+        numeric columns, the others get fallback ('ffill': forward then backward
+        fill, None: left as is). 'mode' fills every column with its most frequent
+        value ("" when a column has none); 'value' fills with value.
+        """
+        if strategy not in IMPUTE_STRATEGIES:
+            raise ValueError(f"strategy must be one of {IMPUTE_STRATEGIES}")
+        self.steps.append(Step("impute", strategy=strategy, columns=columns, value=value, fallback=fallback))
+        return self
+
+    def cast(self, dtypes: Dict[str, Any]) -> "CleaningPlan":
+        """Convert columns to the given dtypes."""
+        self.steps.append(Step("cast", dtypes=dict(dtypes)))
+        return self
+
+    def stages(self) -> List[List[Step]]:
+        """Steps grouped into fused stages: runs of row steps and runs of value steps."""
+        stages: List[List[Step]] = []
+        for step in self.steps:
+            if stages and (step.kind in ROW_STEPS) == (stages[-1][0].kind in ROW_STEPS):
+                stages[-1].append(step)
+            else:
+                stages.append([step])
+        return stages
+
+    def run(self, df: pd.DataFrame) -> "tuple[pd.DataFrame, Dict[str, Any]]":
+        """Apply the plan; returns (cleaned frame, report). The input frame is not modified."""
+        report: Dict[str, Any] = {"rows_in": len(df), "steps": []}
+        for stage in self.stages():
+            if stage[0].kind in ROW_STEPS:
+                df = _run_row_stage(df, stage, report)
+            else:
+                df = _run_value_stage(df, stage, report)
+        report["rows_out"] = len(df)
+        return df, report
+
+
+def _run_row_stage(df: pd.DataFrame, steps: List[Step], report: Dict[str, Any]) -> pd.DataFrame:
+    keep = np.ones(len(df), dtype=bool)
+    for step in steps:
+        before = int(keep.sum())
+        if step.kind == "dedupe":
+            dedup = Deduplicator(step.params["subset"], step.params["bits"])
+            # Only rows surviving the earlier steps take part (first occurrence wins)
+            rows = np.flatnonzero(keep)
+            keep[rows] = dedup.keep_mask(df if len(rows) == len(df) else df.iloc[rows])
+            report["duplicates"] = dedup.stats()
+        elif step.kind == "drop_missing":
+            cols = step.params["columns"]
+            missing = (df if cols is None else df[list(cols)]).isna()
+            keep &= ~(missing.any(axis=1) if step.params["how"] == "any" else missing.all(axis=1)).to_numpy()
+        else:
+            condition = step.params["condition"]
+            mask = df.eval(condition) if isinstance(condition, str) else condition(df)
+            keep &= np.asarray(mask, dtype=bool)
+        report["steps"].append({"step": step.kind, "rows_removed": before - int(keep.sum())})
+    return df if keep.all() else df[keep]
+
+
+def _fill_values(df: pd.DataFrame, step: Step, missing: pd.Series):
+    """({column: fill value}, [columns to forward/backward fill]) for one impute step."""
+    cols = [c for c in (step.params["columns"] or df.columns) if missing.get(c, 0) > 0]
+    strategy, fallback = step.params["strategy"], step.params["fallback"]
+    if strategy == "value":
+        return {c: step.params["value"] for c in cols}, []
+    if strategy == "ffill":
+        return {}, cols
+    if strategy == "mode":
+        # One DataFrame.mode call covers every column; row 0 is each column's first mode
+        modes = df[cols].mode(dropna=True).iloc[0] if cols else pd.Series(dtype=object)
+        return {c: ("" if pd.isna(modes.get(c)) else modes[c]) for c in cols}, []
+    numeric = [c for c in cols if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+    stats = getattr(df[numeric], strategy)() if numeric else pd.Series(dtype=float)
+    values = {c: stats[c] for c in numeric if pd.notna(stats[c])}
+    rest = [c for c in cols if c not in values]
+    return values, (rest if fallback == "ffill" else [])
+
+
+def _run_value_stage(df: pd.DataFrame, steps: List[Step], report: Dict[str, Any]) -> pd.DataFrame:
+    for step in steps:
+        if step.kind == "cast":
+            df = df.astype(step.params["dtypes"])
+            report["steps"].append({"step": "cast", "columns": list(step.params["dtypes"])})
+            continue
+        # One isna pass gives the missing counts and, for numeric fills, the fill mask
+        isna = df.isna()
+        missing = isna.sum()
+        values, chain_fill = _fill_values(df, step, missing)
+        other = pd.Series(values)
+        if values and pd.api.types.is_numeric_dtype(other):
+            # Block-wise mask instead of fillna's column-by-column dict path
+            cols = list(values)
+            df = _replace_columns(df, df[cols].mask(isna[cols], other, axis=1))
+        elif values:
+            df = df.fillna(values)
+        if chain_fill:
+            df = _replace_columns(df, df[chain_fill].ffill().bfill())
+        report["steps"].append({
+            "step": "impute",
+            "strategy": step.params["strategy"],
+            "values_filled": int(sum(missing[c] for c in list(values) + chain_fill)),
+        })
+    return df
+
+
+def _replace_columns(df: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy(deep=False)
+    out[list(new.columns)] = new
+    return out
+
+
+def plan_from_options(drop_duplicates: bool = True, missing: Optional[str] = None,
+                      fill_na_method: Optional[str] = None) -> CleaningPlan:
+    """
+    The plan behind the pipeline's cleaning options: drop_duplicates, missing
+    ('drop' | 'keep') and fill_na_method ('mean' | 'median' | 'mode' | None).
+    """
+    plan = CleaningPlan()
+    if drop_duplicates:
+        plan.dedupe()
+    if missing == "drop":
+        plan.drop_missing()
+    if fill_na_method is not None:
+        strategy = fill_na_method if fill_na_method in ("mean", "median", "mode") else "ffill"
+        plan.impute(strategy)
+    return plan
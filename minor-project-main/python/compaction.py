@@ -0,0 +1,63 @@
+# compaction.py
+"""
+Memory-optimizing dtype compaction for freshly loaded frames:
+- low-cardinality string columns become pandas categoricals
+- integer columns are downcast to the smallest integer type holding their range
+Each conversion is lossless; the per-column bytes saved are reported. Floats
+stay float64: float32 values round-trip, but sums over them (cube measures,
+KPIs) would accumulate in float32 and drift from the chunked path.
+"""
+
+from typing import Any, Dict, Tuple
+import pandas as pd
+
+# String columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+
+def _compact_column(ser: pd.Series, max_category_ratio: float) -> pd.Series:
+    if pd.api.types.is_bool_dtype(ser) or isinstance(ser.dtype, pd.CategoricalDtype):
+        return ser
+    if pd.api.types.is_integer_dtype(ser):
+        return pd.to_numeric(ser, downcast="integer")
+    if pd.api.types.is_string_dtype(ser):
+        n = len(ser)
+        nunique = ser.nunique(dropna=True)
+        # All-null columns stay as they are so later fills with new values still work
+        if 0 < nunique <= max_category_ratio * n:
+            return ser.astype("category")
+    return ser
+
+
+def compact_dtypes(df: pd.DataFrame,
+                   max_category_ratio: float = CATEGORY_MAX_RATIO) -> Tuple[pd.DataFrame, Dict[str, Dict[str, Any]]]:
+    """
+    Return (compacted copy of df, report). The report maps every converted column to
+    its old and new dtype and its memory use in bytes before/after and saved.
+    The input frame is not modified.
+    """
+    out = df.copy(deep=False)
+    report: Dict[str, Dict[str, Any]] = {}
+    for col in df.columns:
+        ser = df[col]
+        compact = _compact_column(ser, max_category_ratio)
+        if compact is ser or compact.dtype == ser.dtype:
+            continue
+        before = int(ser.memory_usage(index=False, deep=True))
+        after = int(compact.memory_usage(index=False, deep=True))
+        if after >= before:
+            continue
+        out[col] = compact
+        report[str(col)] = {
+            "from": str(ser.dtype),
+            "to": str(compact.dtype),
+            "bytes_before": before,
+            "bytes_after": after,
+            "bytes_saved": before - after,
+        }
+    return out, report
+
+
+def bytes_saved(report: Dict[str, Dict[str, Any]]) -> int:
+    """Total bytes saved across the columns of a compact_dtypes report."""
+    return sum(entry["bytes_saved"] for entry in report.values())
@@ -0,0 +1,202 @@
+# correlations.py
+"""
+Correlation engine for wide numeric data:
+- Pearson on standardized float arrays, computed tile by tile (BLOCK_COLUMNS
+  columns per side) with matrix products, tiles spread over worker threads
+  (NumPy releases the GIL inside matmul)
+- missing values handled pairwise like DataFrame.corr, via masked products
+- Spearman = Pearson on ranks, with each column ranked once up front
+- top-k mode: keep only the k strongest pairs per tile, never the full matrix
+- heatmap matrix: the most correlated columns, truncated and ordered by
+  hierarchical clustering so related columns sit next to each other
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+import os
+import numpy as np
+import pandas as pd
+
+CORR_METHODS = ("pearson", "spearman")
+BLOCK_COLUMNS = int(os.getenv("DASHBOARD_CORR_BLOCK", "256"))
+CORR_WORKERS = int(os.getenv("DASHBOARD_CORR_WORKERS", str(os.cpu_count() or 1)))
+# The dashboard heatmap shows at most this many columns; cell labels only up to ANNOTATE_MAX
+HEATMAP_MAX_COLUMNS = int(os.getenv("DASHBOARD_HEATMAP_COLUMNS", "25"))
+ANNOTATE_MAX = 12
+TOP_PAIRS = 20
+
+Tile = Tuple[int, int, np.ndarray]
+
+
+class Standardized:
+    """
+    Column-standardized float64 copy of the numeric columns. Without missing
+    values z has unit-norm columns, so a tile is one product z_i.T @ z_j; with
+    missing values the masked sums give exact pairwise-complete correlations.
+    """
+
+    def __init__(self, df: pd.DataFrame, method: str = "pearson"):
+        if method not in CORR_METHODS:
+            raise ValueError(f"method must be one of {CORR_METHODS}")
+        self.columns = list(df.columns)
+        if method == "spearman":
+            # One rank transform per column; ranks of rows missing in the other
+            # column of a pair are not recomputed (pandas re-ranks each pair)
+            df = df.rank(method="average")
+        arr = df.to_numpy(dtype="float64", na_value=np.nan)
+        self.valid = ~np.isnan(arr)
+        self.has_missing = not self.valid.all()
+        counts = self.valid.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Centering first keeps the masked sums small (no catastrophic cancellation)
+            mean = np.where(counts > 0, np.nansum(arr, axis=0) / np.maximum(counts, 1), 0.0)
+            z = np.where(self.valid, arr - mean, 0.0)
+            norm = np.sqrt((z * z).sum(axis=0))
+            self.z = z / np.where(norm > 0, norm, np.nan)
+        if self.has_missing:
+            self.z = np.nan_to_num(self.z)
+            self.mask = self.valid.astype("float64")
+
+    def tile(self, i0: int, i1: int, j0: int, j1: int) -> np.ndarray:
+        a, b = self.z[:, i0:i1], self.z[:, j0:j1]
+        if not self.has_missing:
+            corr = a.T @ b
+        else:
+            ma, mb = self.mask[:, i0:i1], self.mask[:, j0:j1]
+            n = ma.T @ mb
+            sa, sb = a.T @ mb, (b.T @ ma).T
+            with np.errstate(invalid="ignore", divide="ignore"):
+                cov = a.T @ b - sa * sb / n
+                var_a = (a * a).T @ mb - sa * sa / n
+                var_b = ((b * b).T @ ma).T - sb * sb / n
+                corr = cov / np.sqrt(var_a * var_b)
+                corr[n < 2] = np.nan
+        # Constant columns have no correlation (NaN, as in pandas); clip rounding error
+        return np.clip(corr, -1.0, 1.0)
+
+
+def _blocks(n: int, block: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + block, n)) for start in range(0, n, block)]
+
+
+def iter_tiles(std: Standardized, block: int = BLOCK_COLUMNS, workers: int = CORR_WORKERS) -> Iterator[Tile]:
+    """Upper-triangle tiles (i0, j0, matrix) of the correlation matrix, computed in parallel."""
+    blocks = _blocks(len(std.columns), max(1, block))
+    jobs = [(bi, bj) for k, bi in enumerate(blocks) for bj in blocks[k:]]
+
+    def run(job):
+        (i0, i1), (j0, j1) = job
+        return i0, j0, std.tile(i0, i1, j0, j1)
+
+    if workers <= 1 or len(jobs) == 1:
+        yield from map(run, jobs)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(run, jobs)
+
+
+def correlation_matrix(df: pd.DataFrame, method: str = "pearson", block: int = BLOCK_COLUMNS,
+                       workers: int = CORR_WORKERS) -> pd.DataFrame:
+    """Full correlation matrix of df's columns (numeric), like DataFrame.corr(method)."""
+    std = Standardized(df, method)
+    n = len(std.columns)
+    out = np.empty((n, n))
+    for i0, j0, tile in iter_tiles(std, block, workers):
+        out[i0:i0 + tile.shape[0], j0:j0 + tile.shape[1]] = tile
+        out[j0:j0 + tile.shape[1], i0:i0 + tile.shape[0]] = tile.T
+    # Diagonal: 1 for columns with any variance, NaN otherwise
+    np.fill_diagonal(out, np.where(np.isnan(np.diag(out)), np.nan, 1.0))
+    return pd.DataFrame(out, index=std.columns, columns=std.columns)
+
+
+def _strongest(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, k: int):
+    if len(values) > k:
+        keep = np.argpartition(-np.abs(values), k - 1)[:k]
+        rows, cols, values = rows[keep], cols[keep], values[keep]
+    return rows, cols, values
+
+
+def _pairs_frame(columns: List[Any], rows, cols, values, k: int) -> pd.DataFrame:
+    order = np.argsort(-np.abs(values), kind="stable")[:k]
+    return pd.DataFrame({
+        "left": [columns[i] for i in rows[order]],
+        "right": [columns[j] for j in cols[order]],
+        "corr": values[order],
+    })
+
+
+def top_pairs(df: pd.DataFrame, k: int = TOP_PAIRS, method: str = "pearson", min_abs: float = 0.0,
+              block: int = BLOCK_COLUMNS, workers: int = CORR_WORKERS) -> pd.DataFrame:
+    """
+    The k column pairs with the largest |correlation| (columns left, right, corr),
+    keeping only k candidates per tile so memory stays O(block² + k).
+    """
+    std = Standardized(df, method)
+    found = [np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)]
+    for i0, j0, tile in iter_tiles(std, block, workers):
+        rows, cols = np.nonzero(np.abs(np.nan_to_num(tile)) >= min_abs)
+        rows, cols = rows + i0, cols + j0
+        upper = rows < cols
+        rows, cols = rows[upper], cols[upper]
+        values = tile[rows - i0, cols - j0]
+        merged = [np.concatenate([found[0], rows]), np.concatenate([found[1], cols]),
+                  np.concatenate([found[2], values])]
+        found = list(_strongest(*merged, k))
+    return _pairs_frame(std.columns, *found, k)
+
+
+def pairs_from_matrix(corr: pd.DataFrame, k: int = TOP_PAIRS, min_abs: float = 0.0) -> pd.DataFrame:
+    """top_pairs for an already computed matrix (e.g. CovarianceSketch.correlation())."""
+    values = corr.to_numpy()
+    rows, cols = np.triu_indices(len(values), k=1)
+    vals = values[rows, cols]
+    keep = ~np.isnan(vals) & (np.abs(vals) >= min_abs)
+    return _pairs_frame(list(corr.columns), *_strongest(rows[keep], cols[keep], vals[keep], k), k)
+
+
+def cluster_order(corr: np.ndarray) -> List[int]:
+    """
+    Leaf order of an average-linkage clustering on 1 - |corr| (small matrices only:
+    O(n³)), so blocks of mutually correlated columns end up adjacent.
+    """
+    n = len(corr)
+    dist = 1.0 - np.abs(np.nan_to_num(corr))
+    np.fill_diagonal(dist, np.inf)
+    clusters = {i: [i] for i in range(n)}
+    while len(clusters) > 1:
+        keys = list(clusters)
+        sub = dist[np.ix_(keys, keys)]
+        a, b = np.unravel_index(np.argmin(sub), sub.shape)
+        ka, kb = keys[a], keys[b]
+        size_a, size_b = len(clusters[ka]), len(clusters[kb])
+        # Average linkage update: merged cluster keeps ka's slot
+        dist[ka, :] = (dist[ka, :] * size_a + dist[kb, :] * size_b) / (size_a + size_b)
+        dist[:, ka] = dist[ka, :]
+        dist[ka, ka] = np.inf
+        clusters[ka] = clusters[ka] + clusters.pop(kb)
+    return next(iter(clusters.values())) if clusters else []
+
+
+def heatmap_matrix(corr: pd.DataFrame, max_columns: int = HEATMAP_MAX_COLUMNS) -> pd.DataFrame:
+    """
+    The part of the matrix worth drawing: the max_columns columns with the
+    strongest correlations to any other column, in clustered order.
+    """
+    if corr.empty:
+        return corr
+    values = np.abs(np.nan_to_num(corr.to_numpy()))
+    np.fill_diagonal(values, 0.0)
+    keep = np.arange(len(values))
+    if len(keep) > max_columns:
+        keep = np.sort(np.argsort(-values.max(axis=1), kind="stable")[:max_columns])
+    sub = corr.iloc[keep, keep]
+    order = cluster_order(sub.to_numpy())
+    return sub.iloc[order, order]
+
+
+def summarize(corr: pd.DataFrame, k: int = TOP_PAIRS) -> Dict[str, Any]:
+    """Heatmap matrix plus the strongest pairs as records, for the dashboard and its summary."""
+    return {
+        "heatmap": heatmap_matrix(corr),
+        "top_pairs": pairs_from_matrix(corr, k).to_dict(orient="records"),
+    }
@@ -0,0 +1,175 @@
+# cube.py
+"""
+Small OLAP-style aggregation cube, built once per dataset:
+- measures: the numeric columns (sum and non-null count stored; mean = sum / count)
+- dimensions: low-cardinality categorical columns plus an optional time bucket
+  (resampled with pd.Grouper at a granularity from resampling.choose_granularity)
+- one cuboid per single dimension, plus any requested dimension pairs
+Dashboard charts and KPIs are drawn from the cube instead of rescanning the rows.
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+import pandas as pd
+
+from resampling import choose_granularity
+
+# Categorical columns with more distinct values than this are not used as dimensions
+MAX_DIMENSION_LEVELS = 50
+TIME_DIM = "__time__"
+ROWS = "__rows__"
+AGGREGATIONS = ("sum", "count", "mean")
+
+
+def pick_dimensions(df: pd.DataFrame, categorical_cols: Sequence[str],
+                    max_levels: int = MAX_DIMENSION_LEVELS) -> List[str]:
+    """Categorical columns with few enough distinct values to be cube dimensions."""
+    return [c for c in categorical_cols if df[c].nunique(dropna=False) <= max_levels]
+
+
+class AggregationCube:
+    """
+    Pre-aggregated sums / counts of every measure per cuboid. A cuboid is a
+    DataFrame indexed by its dimension values with columns
+    '<measure>__sum', '<measure>__count' and ROWS.
+    """
+
+    def __init__(self, n_rows: int, n_columns: int, measures: List[str], dimensions: List[str],
+                 time_col: Optional[str], time_freq: Optional[str],
+                 cuboids: Dict[FrozenSet[str], pd.DataFrame], totals: pd.Series):
+        self.n_rows = n_rows
+        self.n_columns = n_columns
+        self.measures = measures
+        self.dimensions = dimensions
+        self.time_col = time_col
+        self.time_freq = time_freq
+        self.cuboids = cuboids
+        self._totals = totals
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, measures: Sequence[str], dimensions: Sequence[str],
+              time_col: Optional[str] = None, time_freq: Optional[str] = None,
+              pairs: Iterable[Tuple[str, str]] = ()) -> "AggregationCube":
+        """
+        Aggregate df once. pairs lists extra two-dimension cuboids to build
+        (e.g. the stacked chart's x/color columns); TIME_DIM may appear in pairs.
+        time_freq defaults to a granularity picked from the span and density of time_col.
+        """
+        measures = list(measures)
+        dimensions = [d for d in dict.fromkeys(dimensions) if d in df.columns]
+        keyed = df[measures].copy(deep=False)
+        for d in dimensions:
+            keyed[d] = df[d]
+        if time_col:
+            time_freq = time_freq or choose_granularity(df[time_col])[0]
+            keyed[TIME_DIM] = df[time_col]
+            all_dims = dimensions + [TIME_DIM]
+        else:
+            time_freq = None
+            all_dims = list(dimensions)
+
+        wanted = [frozenset([d]) for d in all_dims]
+        wanted += [frozenset(p) for p in pairs if len(set(p)) == 2 and set(p) <= set(all_dims)]
+        cuboids = {}
+        for dims in dict.fromkeys(wanted):
+            cuboids[dims] = cls._aggregate(keyed, sorted(dims, key=all_dims.index), measures, time_freq)
+
+        # Grand totals roll up from a categorical cuboid (the time one drops NaT rows)
+        rollup = next((c for dims, c in cuboids.items() if TIME_DIM not in dims), None)
+        if rollup is not None:
+            totals = rollup.sum()
+        else:
+            totals = pd.concat([keyed[measures].sum().add_suffix("__sum"),
+                                keyed[measures].count().add_suffix("__count"),
+                                pd.Series({ROWS: len(df)})])
+        return cls(len(df), df.shape[1], measures, all_dims, time_col, time_freq, cuboids, totals)
+
+    @staticmethod
+    def _aggregate(keyed: pd.DataFrame, dims: List[str], measures: List[str],
+                   time_freq: Optional[str]) -> pd.DataFrame:
+        # The time dimension is resampled; alone it yields every bucket, empty ones included
+        keys = [pd.Grouper(key=TIME_DIM, freq=time_freq) if d == TIME_DIM else d for d in dims]
+        grouped = keyed.groupby(keys, observed=True, sort=False, dropna=False)
+        parts = []
+        if measures:
+            parts.append(grouped[measures].sum().add_suffix("__sum"))
+            parts.append(grouped[measures].count().add_suffix("__count"))
+        parts.append(grouped.size().rename(ROWS))
+        return pd.concat(parts, axis=1)
+
+    def merge(self, other: "AggregationCube") -> "AggregationCube":
+        """
+        Combine with a cube built over other rows (same measures, dimensions and
+        time_freq): sums, counts and row counts are additive, so this is exact.
+        """
+        if other.time_freq != self.time_freq:
+            raise ValueError("Cannot merge cubes with different time granularity")
+        for key, cuboid in other.cuboids.items():
+            if key not in self.cuboids:
+                self.cuboids[key] = cuboid
+                continue
+            both = pd.concat([self.cuboids[key], cuboid])
+            levels = list(range(both.index.nlevels))
+            self.cuboids[key] = both.groupby(level=levels, sort=False, dropna=False).sum()
+        self.n_rows += other.n_rows
+        self._totals = self._totals.add(other._totals, fill_value=0)
+        return self
+
+    def copy(self) -> "AggregationCube":
+        """Copy with its own cuboid mapping (merge and rollup_time replace cuboids, never mutate them)."""
+        return AggregationCube(self.n_rows, self.n_columns, list(self.measures), list(self.dimensions),
+                               self.time_col, self.time_freq, dict(self.cuboids), self._totals)
+
+    def rollup_time(self, time_freq: str) -> "AggregationCube":
+        """Re-bucket the time dimension to a coarser time_freq (e.g. hourly cube -> daily)."""
+        if self.time_col is None or time_freq == self.time_freq:
+            return self
+        for key, cuboid in list(self.cuboids.items()):
+            if TIME_DIM not in key:
+                continue
+            flat = cuboid.reset_index()
+            dims = [d for d in flat.columns if d in key]
+            self.cuboids[key] = self._aggregate_sums(flat, dims, time_freq)
+        self.time_freq = time_freq
+        return self
+
+    @staticmethod
+    def _aggregate_sums(flat: pd.DataFrame, dims: List[str], time_freq: str) -> pd.DataFrame:
+        keys = [pd.Grouper(key=TIME_DIM, freq=time_freq) if d == TIME_DIM else d for d in dims]
+        values = [c for c in flat.columns if c not in dims]
+        return flat.groupby(keys, observed=True, sort=False, dropna=False)[values].sum()
+
+    def has(self, dims: Sequence[str]) -> bool:
+        return frozenset(dims) in self.cuboids
+
+    def aggregate(self, dims: Sequence[str], measure: Optional[str] = None, agg: str = "sum") -> pd.DataFrame:
+        """
+        Flat frame with the dims columns plus 'value': sum / count / mean of
+        measure per group, or the row count per group when measure is None.
+        """
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"agg must be one of {AGGREGATIONS}")
+        key = frozenset(dims)
+        if key not in self.cuboids:
+            raise KeyError(f"No cuboid for dimensions {sorted(key)}; available: {[sorted(k) for k in self.cuboids]}")
+        cuboid = self.cuboids[key]
+        if measure is None:
+            value = cuboid[ROWS]
+        elif agg == "mean":
+            value = cuboid[f"{measure}__sum"] / cuboid[f"{measure}__count"]
+        else:
+            value = cuboid[f"{measure}__{agg}"]
+        out = value.rename("value").reset_index()
+        return out[list(dims) + ["value"]]
+
+    def time_series(self, measure: Optional[str] = None, agg: str = "sum") -> pd.DataFrame:
+        """Per-time-bucket aggregate, sorted by time; columns time_col and 'value'."""
+        series = self.aggregate([TIME_DIM], measure, agg).dropna(subset=[TIME_DIM]).sort_values(TIME_DIM)
+        return series.rename(columns={TIME_DIM: self.time_col}).reset_index(drop=True)
+
+    def total(self, measure: Optional[str] = None, agg: str = "sum") -> float:
+        """Grand total over all rows (row count when measure is None)."""
+        if measure is None:
+            return int(self._totals[ROWS])
+        if agg == "mean":
+            return self._totals[f"{measure}__sum"] / self._totals[f"{measure}__count"]
+        return self._totals[f"{measure}__{agg}"]
@@ -1,116 +1,91 @@
 # data_processor.py
 """
 Data processing utilities:
-- parse uploaded files (csv, xlsx, json)
+- parse uploaded files (csv, xlsx, json, json lines) and compact their dtypes
 - infer column types
 - basic cleaning (drop duplicates, simple imputation options)
 - produce summary metadata for frontend
 """
 
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, Iterable, Tuple, Optional
 import pandas as pd
 import numpy as np
 import io
 
-SUPPORTED_FILE_TYPES = (".csv", ".xlsx", ".xls", ".json")
+from compaction import compact_dtypes
+from cleaning_plan import plan_from_options
+from dialect import read_with_fallback, sniff_bytes
+from excel import EXCEL_SUFFIXES, read_sheet
+from json_lines import JSON_LINES_SUFFIXES, read_json_bytes
+from profiler import profile_columns
+from schema import Schema, infer_schema, apply_schema
+from sketches import StreamingProfile, ERROR_BOUNDS
+
+SUPPORTED_FILE_TYPES = (".csv", ".xlsx", ".xls", ".json") + JSON_LINES_SUFFIXES
+# "exact": batch profiler over the whole frame; "sketch": mergeable streaming sketches
+PROFILE_MODES = ("exact", "sketch")
+SKETCH_CHUNK_ROWS = 200_000
 
 
 def read_file_bytes(file_bytes: bytes, filename: str) -> pd.DataFrame:
     """Read bytes upload into a pandas DataFrame based on filename extension."""
     lower = filename.lower()
     if lower.endswith(".csv"):
-        return pd.read_csv(io.BytesIO(file_bytes))
-    if lower.endswith((".xlsx", ".xls")):
-        return pd.read_excel(io.BytesIO(file_bytes))
-    if lower.endswith(".json"):
-        return pd.read_json(io.BytesIO(file_bytes), orient="records")
+        return read_with_fallback(lambda d: pd.read_csv(io.BytesIO(file_bytes), **d.read_kwargs()),
+                                  sniff_bytes(file_bytes))
+    if lower.endswith(EXCEL_SUFFIXES):
+        return read_sheet(io.BytesIO(file_bytes), lower)
+    if lower.endswith((".json",) + JSON_LINES_SUFFIXES):
+        return read_json_bytes(file_bytes, lower)
     raise ValueError(f"Unsupported file type for {filename}")
 
 
 def infer_column_types(df: pd.DataFrame) -> Dict[str, str]:
     """Return a map column -> inferred type (numeric/categorical/datetime/text)."""
-    types = {}
-    for col in df.columns:
-        series = df[col]
-        if pd.api.types.is_datetime64_any_dtype(series):
-            types[col] = "datetime"
-            continue
-        # Try to parse to datetime if many values parse
-        if series.dropna().shape[0] > 0:
-            sample = series.dropna().iloc[:min(50, series.dropna().shape[0])]
-            try_parsed = pd.to_datetime(sample, errors="coerce")
-            if try_parsed.notna().sum() / len(sample) > 0.8:
-                types[col] = "datetime"
-                continue
-        if pd.api.types.is_numeric_dtype(series):
-            types[col] = "numeric"
-        else:
-            # If low unique values relative to rows => categorical
-            nunique = series.nunique(dropna=True)
-            if nunique <= 20 or (nunique / max(1, len(series)) < 0.05):
-                types[col] = "categorical"
-            else:
-                types[col] = "text"
-    return types
+    return infer_schema(df).types()
 
 
 def basic_clean(
     df: pd.DataFrame,
     drop_duplicates: bool = True,
     fill_na_method: Optional[str] = None,
+    report: Optional[Dict[str, Any]] = None,
 ) -> pd.DataFrame:
     """
     Basic cleaning:
-    - drop duplicates by default
-    - fill_na_method can be 'mean', 'median', 'mode' or None
+    - drop duplicates by default (hash-based, see dedupe); when a report dict is
+      given, report["duplicates"] receives the duplicate counts
+    - fill_na_method can be 'mean', 'median', 'mode' or None; columns the method
+      does not apply to are forward then backward filled
+    Runs as one fused cleaning plan (see cleaning_plan): fill values for all
+    columns come from a single reduction and the input frame is not copied.
     """
-    df = df.copy()
-    if drop_duplicates:
-        df = df.drop_duplicates()
-
-    if fill_na_method is not None:
-        for col in df.columns:
-            if df[col].isna().sum() == 0:
-                continue
-            if fill_na_method == "mean" and pd.api.types.is_numeric_dtype(df[col]):
-                df[col] = df[col].fillna(df[col].mean())
-            elif fill_na_method == "median" and pd.api.types.is_numeric_dtype(df[col]):
-                df[col] = df[col].fillna(df[col].median())
-            elif fill_na_method == "mode":
-                mode = df[col].mode()
-                if len(mode) > 0:
-                    df[col] = df[col].fillna(mode.iloc[0])
-                else:
-                    df[col] = df[col].fillna("")
-            else:
-                # fallback: forward fill then backfill
-                df[col] = df[col].fillna(method="ffill").fillna(method="bfill")
+    df, plan_report = plan_from_options(drop_duplicates, fill_na_method=fill_na_method).run(df)
+    if report is not None and "duplicates" in plan_report:
+        report["duplicates"] = plan_report["duplicates"]
     return df
 
 
-def compute_summary(df: pd.DataFrame) -> Dict[str, Any]:
-    """Return summary statistics & metadata for each column and dataset-level info."""
-    col_types = infer_column_types(df)
+def compute_summary(df: pd.DataFrame, schema: Optional[Schema] = None, mode: str = "exact") -> Dict[str, Any]:
+    """
+    Return summary statistics & metadata for each column and dataset-level info.
+    Pass the dataset's Schema to reuse it instead of re-inferring column types.
+    mode="sketch" profiles the frame chunk by chunk with bounded-memory sketches
+    (approximate median / n_unique, see sketches.ERROR_BOUNDS).
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"mode must be one of {PROFILE_MODES}")
+    schema = schema or infer_schema(df)
+    if mode == "sketch":
+        chunks = (df.iloc[i:i + SKETCH_CHUNK_ROWS] for i in range(0, max(len(df), 1), SKETCH_CHUNK_ROWS))
+        return compute_summary_from_chunks(chunks, schema)
+    col_types = schema.types()
+    # Numeric stats, missing counts and cardinality are computed in batch by the profiler
+    profile = profile_columns(df)
     summary = {}
-    for col in df.columns:
-        ser = df[col]
-        info = {
-            "dtype": str(ser.dtype),
-            "inferred_type": col_types.get(col, "unknown"),
-            "n_missing": int(ser.isna().sum()),
-            "n_unique": int(ser.nunique(dropna=True)),
-            "sample_values": ser.dropna().astype(str).unique()[:5].tolist(),
-        }
-        if pd.api.types.is_numeric_dtype(ser):
-            info.update(
-                {
-                    "mean": None if ser.dropna().empty else float(ser.mean()),
-                    "median": None if ser.dropna().empty else float(ser.median()),
-                    "min": None if ser.dropna().empty else float(ser.min()),
-                    "max": None if ser.dropna().empty else float(ser.max()),
-                    "std": None if ser.dropna().empty else float(ser.std()),
-                }
-            )
+    for col, prof in profile.items():
+        info = {"dtype": prof.pop("dtype"), "inferred_type": col_types.get(col, "unknown")}
+        info.update(prof)
         summary[col] = info
 
     dataset_info = {
@@ -122,6 +97,38 @@ def compute_summary(df: pd.DataFrame) -> Dict[str, Any]:
     return {"dataset_info": dataset_info, "columns": summary}
 
 
+def summary_from_profile(profile: StreamingProfile, schema: Schema) -> Dict[str, Any]:
+    """compute_summary-shaped metadata from a (possibly merged) StreamingProfile."""
+    col_types = schema.types()
+    summary = {}
+    for col in profile.columns:
+        prof = profile.column_summary(col)
+        info = {"dtype": prof.pop("dtype"), "inferred_type": col_types.get(col, "unknown")}
+        info.update(prof)
+        summary[col] = info
+
+    dataset_info = {
+        "n_rows": int(profile.n_rows),
+        "n_columns": len(profile.columns),
+        "columns": list(profile.columns),
+        "approximate": True,
+        "error_bounds": ERROR_BOUNDS,
+    }
+    return {"dataset_info": dataset_info, "columns": summary}
+
+
+def compute_summary_from_chunks(chunks: Iterable[pd.DataFrame], schema: Optional[Schema] = None) -> Dict[str, Any]:
+    """
+    Profile a stream of DataFrame chunks without holding the dataset in memory.
+    The schema is inferred from the first chunk when not given.
+    """
+    profile = StreamingProfile()
+    for chunk in chunks:
+        schema = schema or infer_schema(chunk)
+        profile.update(apply_schema(chunk, schema))
+    return summary_from_profile(profile, schema or Schema([]))
+
+
 # Convenience end-to-end function
 def process_uploaded_file(
     file_bytes: bytes,
@@ -131,11 +138,19 @@ def process_uploaded_file(
 ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
     """
     Read file bytes, clean, and return (clean_df, summary_metadata).
+    summary_metadata["compaction"] reports the bytes saved per compacted column.
     Raises ValueError on unsupported type.
     """
-    df = read_file_bytes(file_bytes, filename)
-    df_clean = basic_clean(df, drop_duplicates=drop_duplicates, fill_na_method=fill_na_method)
-    metadata = compute_summary(df_clean)
+    df, compaction = compact_dtypes(read_file_bytes(file_bytes, filename))
+    cleaning_report: Dict[str, Any] = {}
+    df_clean = basic_clean(df, drop_duplicates=drop_duplicates, fill_na_method=fill_na_method,
+                           report=cleaning_report)
+    schema = infer_schema(df_clean)
+    df_clean = apply_schema(df_clean, schema)
+    metadata = compute_summary(df_clean, schema)
+    metadata["compaction"] = compaction
+    if "duplicates" in cleaning_report:
+        metadata["dataset_info"]["duplicates"] = cleaning_report["duplicates"]
     return df_clean, metadata
 
 
@@ -0,0 +1,119 @@
+# dataset_profile.py
+"""
+Shared dataset profile: one object over the compute_summary metadata that the
+insight generator (and anything else describing a dataset) reads instead of
+the rows:
+- column statistics, top-k levels (profiler / sketches), duplicates removed,
+  strongest correlation pairs and per-period trends
+- derived measures (missing share, skew, concentration) computed from the
+  stored statistics, so every question costs O(columns), not O(rows)
+- trend_summary / cube_trends: slope and overall change of a per-period series,
+  e.g. an AggregationCube's time_series
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+# A fitted change smaller than this share of the average level reads as flat
+TREND_MIN_CHANGE = 0.05
+
+
+def trend_summary(values: Sequence[float], column: str, time_col: Optional[str] = None,
+                  period: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Least-squares line through a per-period series (one value per period, in
+    time order). change is the fitted first-to-last change relative to the mean
+    level; r2 how well a straight line explains the series. None when fewer
+    than three periods have values.
+    """
+    y = np.asarray(values, dtype="float64")
+    x = np.arange(len(y), dtype="float64")
+    valid = ~np.isnan(y)
+    x, y = x[valid], y[valid]
+    if len(y) < 3:
+        return None
+    slope, intercept = np.polyfit(x, y, 1)
+    fitted = slope * x + intercept
+    total = float(((y - y.mean()) ** 2).sum())
+    r2 = 1.0 - float(((y - fitted) ** 2).sum()) / total if total > 0 else 0.0
+    level = abs(float(y.mean()))
+    change = float(fitted[-1] - fitted[0]) / level if level > 0 else 0.0
+    direction = "flat" if abs(change) < TREND_MIN_CHANGE else ("up" if change > 0 else "down")
+    return {
+        "column": column, "time_col": time_col, "period": period, "periods": int(len(y)),
+        "slope": float(slope), "change": change, "r2": r2, "direction": direction,
+    }
+
+
+def cube_trends(cube, measures: Sequence[str], period: Optional[str] = None) -> List[Dict[str, Any]]:
+    """trend_summary of each measure's per-period sum in an AggregationCube with a time dimension."""
+    if cube is None or not cube.time_col:
+        return []
+    trends = []
+    for measure in measures:
+        series = cube.time_series(measure, "sum")
+        trend = trend_summary(series["value"].to_numpy(dtype="float64", na_value=np.nan),
+                              measure, cube.time_col, period)
+        if trend is not None:
+            trends.append(trend)
+    return trends
+
+
+class DatasetProfile:
+    """
+    Read-only view of a compute_summary / summary_from_profile dict. Optional
+    keys (top_values, duplicates, top_correlations, trends) may be absent, e.g.
+    in summaries cached before they were recorded; accessors then return empty.
+    """
+
+    def __init__(self, summary: Dict[str, Any], column_types: Optional[Dict[str, str]] = None):
+        self.summary = summary
+        info = summary.get("dataset_info", {})
+        self.columns: Dict[str, Dict[str, Any]] = summary.get("columns", {})
+        self.n_rows = int(info.get("n_rows") or 0)
+        self.n_columns = int(info.get("n_columns") or len(self.columns))
+        self.duplicates: Optional[Dict[str, Any]] = info.get("duplicates")
+        self.correlations: List[Dict[str, Any]] = summary.get("top_correlations") or []
+        self.trends: List[Dict[str, Any]] = summary.get("trends") or []
+        # Schema types override the ones recorded in the summary
+        self.types = column_types or {col: c.get("inferred_type", "unknown") for col, c in self.columns.items()}
+
+    @classmethod
+    def of(cls, profile, column_types: Optional[Dict[str, str]] = None) -> "DatasetProfile":
+        """Accept either a DatasetProfile or a summary dict."""
+        if isinstance(profile, DatasetProfile):
+            return profile
+        return cls(profile, column_types)
+
+    def columns_of(self, kind: str) -> List[str]:
+        return [col for col, t in self.types.items() if t == kind and col in self.columns]
+
+    def missing(self) -> List[Tuple[str, int, float]]:
+        """(column, n_missing, share of rows) for columns with missing values, most missing first."""
+        rows = [(col, int(c.get("n_missing") or 0)) for col, c in self.columns.items()]
+        rows = sorted((r for r in rows if r[1] > 0), key=lambda r: r[1], reverse=True)
+        return [(col, n, n / self.n_rows if self.n_rows else 0.0) for col, n in rows]
+
+    def stat(self, column: str, name: str) -> Optional[float]:
+        value = self.columns.get(column, {}).get(name)
+        return None if value is None or pd.isna(value) else float(value)
+
+    def skew(self, column: str) -> Optional[float]:
+        """Pearson's median skewness 3 (mean - median) / std; None without a spread."""
+        mean, median, std = (self.stat(column, s) for s in ("mean", "median", "std"))
+        if mean is None or median is None or not std:
+            return None
+        return 3.0 * (mean - median) / std
+
+    def top_values(self, column: str, k: Optional[int] = None) -> List[Tuple[Any, int]]:
+        levels = [(value, int(count)) for value, count in self.columns.get(column, {}).get("top_values") or []]
+        return levels[:k] if k else levels
+
+    def concentration(self, column: str, k: int = 1) -> Optional[float]:
+        """Share of the non-missing values taken by the k most frequent levels."""
+        levels = self.top_values(column, k)
+        present = self.n_rows - int(self.columns.get(column, {}).get("n_missing") or 0)
+        if not levels or present <= 0:
+            return None
+        return min(1.0, sum(count for _, count in levels) / present)
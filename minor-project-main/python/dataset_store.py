@@ -0,0 +1,148 @@
+# dataset_store.py
+"""
+Columnar dataset store:
+- an upload is converted once to an Arrow IPC file (uncompressed, strings
+  dictionary-encoded) keyed by its content hash
+- later reads memory-map the file and materialize only the requested columns,
+  so re-analysis never re-parses CSV / Excel text
+Requires pyarrow; without it the store reports itself unavailable and callers
+fall back to parsing the original file.
+"""
+
+from typing import List, Optional, Sequence
+import os
+import uuid
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # optional dependency
+    pa = None
+    pc = None
+
+STORE_DIR = os.getenv("DASHBOARD_STORE_DIR", "datasets")
+STORE_MAX_BYTES = int(os.getenv("DASHBOARD_STORE_MAX_BYTES", str(4 * 1024 * 1024 * 1024)))
+ARROW_SUFFIXES = (".arrow", ".feather")
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the columnar dataset store (pip install pyarrow)")
+
+
+def to_arrow_table(df: pd.DataFrame) -> "pa.Table":
+    """Arrow table for df with every string column dictionary-encoded."""
+    _require_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, pc.dictionary_encode(table.column(i)))
+    return table
+
+
+def write_arrow(df: pd.DataFrame, path: str) -> str:
+    """Write df as an uncompressed Arrow IPC file (memory-mappable); atomic via rename."""
+    table = to_arrow_table(df)
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+class StoredDataset:
+    """Handle on one Arrow IPC file; every read is memory-mapped and column-projected."""
+
+    def __init__(self, path: str):
+        _require_pyarrow()
+        self.path = path
+        with pa.memory_map(path, "r") as source:
+            self.schema = pa.ipc.open_file(source).schema
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.schema.names)
+
+    def numeric_columns(self) -> List[str]:
+        return [f.name for f in self.schema
+                if pa.types.is_integer(f.type) or pa.types.is_floating(f.type)]
+
+    def read(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Materialize only `columns` (all when None); dictionary columns become categoricals."""
+        with pa.memory_map(self.path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select(list(columns))
+            return table.to_pandas()
+
+    def __len__(self) -> int:
+        with pa.memory_map(self.path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+class DatasetStore:
+    """Directory of Arrow IPC files keyed by dataset ID, with LRU eviction by size."""
+
+    def __init__(self, root: str = STORE_DIR, max_bytes: int = STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, dataset_id: str) -> str:
+        return os.path.join(self.root, f"{dataset_id}.arrow")
+
+    def has(self, dataset_id: str) -> bool:
+        return available() and os.path.exists(self.path_for(dataset_id))
+
+    def put(self, dataset_id: str, df: pd.DataFrame) -> Optional[str]:
+        """Convert df once into the store. Returns the path, or None if it cannot be stored."""
+        if not available():
+            return None
+        path = self.path_for(dataset_id)
+        if not os.path.exists(path):
+            try:
+                write_arrow(df, path)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError) as e:
+                # e.g. object columns mixing numbers and strings
+                print(f"⚠️ Could not store dataset {dataset_id} as Arrow: {e}")
+                return None
+            self.evict()
+        return path
+
+    def open(self, dataset_id: str) -> Optional[StoredDataset]:
+        if not self.has(dataset_id):
+            return None
+        path = self.path_for(dataset_id)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return StoredDataset(path)
+
+    def evict(self):
+        """Remove least-recently-used files until the store fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".arrow"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,272 @@
+# dedupe.py
+"""
+Hash-based duplicate removal:
+- fingerprint each row once with a vectorized 64-bit (or 128-bit) hash
+- keep the fingerprints of rows already seen in a compact set of sorted runs
+  (8 or 16 bytes per distinct row), so files can be deduplicated chunk by chunk
+- with a memory cap, runs past it are spilled to immutable segment files on disk
+  and looked up memory-mapped, so resident memory stays bounded
+- optional key columns: rows count as duplicates when those columns match
+- report how many rows were checked and dropped for the summary and insights
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+import numpy as np
+import pandas as pd
+
+HASH_BITS = (64, 128)
+# Keys for the two independent 64-bit hashes (pandas needs 16-byte keys)
+HASH_KEYS = ("0123456789abcdef", "fedcba9876543210")
+_MIX = np.uint64(1_000_003)
+# Integral floats hash like the equal integer, so 1 and 1.0 (e.g. an int column
+# in one chunk, a float column with NaN in the next) collide as they should
+_INT_LIMIT = 2.0 ** 63
+# String columns whose first CATEGORIZE_PROBE_ROWS values are less than this
+# share distinct are hashed per distinct value
+CATEGORIZE_PROBE_ROWS = 1000
+CATEGORIZE_MAX_RATIO = 0.5
+NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+# In-memory fingerprints a streaming Deduplicator keeps before spilling them to disk
+FINGERPRINT_MEMORY_BYTES = int(os.getenv("DASHBOARD_FINGERPRINT_MEMORY_MB", "64")) * 1024 * 1024
+SEGMENT_PREFIX = "fingerprints-"
+
+
+def _column_hash(ser: pd.Series, hash_key: str) -> np.ndarray:
+    if (pd.api.types.is_bool_dtype(ser) or pd.api.types.is_integer_dtype(ser)) and not ser.hasnans:
+        return pd.util.hash_array(ser.to_numpy(dtype=np.int64), hash_key=hash_key)
+    if pd.api.types.is_numeric_dtype(ser) and not isinstance(ser.dtype, pd.CategoricalDtype):
+        values = ser.to_numpy(dtype=np.float64, na_value=np.nan)
+        hashes = pd.util.hash_array(values, hash_key=hash_key, categorize=False)
+        with np.errstate(invalid="ignore"):
+            integral = np.isfinite(values) & (np.floor(values) == values) & (np.abs(values) < _INT_LIMIT)
+        if integral.any():
+            hashes[integral] = pd.util.hash_array(values[integral].astype(np.int64), hash_key=hash_key)
+    else:
+        hashes = None
+        if not isinstance(ser.dtype, pd.CategoricalDtype):
+            # Factorizing first pays off for repetitive strings, not for mostly-unique ones
+            probe = ser.iloc[:CATEGORIZE_PROBE_ROWS]
+            if probe.nunique(dropna=False) < CATEGORIZE_MAX_RATIO * len(probe):
+                codes, uniques = pd.factorize(ser, use_na_sentinel=False)
+                hashes = pd.util.hash_array(np.asarray(uniques, dtype=object), hash_key=hash_key,
+                                            categorize=False)[codes]
+        if hashes is None:
+            hashes = pd.util.hash_pandas_object(ser, index=False, hash_key=hash_key, categorize=False).to_numpy()
+    # Missing values hash differently per dtype (NaN, None, NA, category -1); unify them
+    missing = ser.isna().to_numpy()
+    if missing.any():
+        hashes = hashes if hashes.flags.writeable else hashes.copy()
+        hashes[missing] = NULL_HASH
+    return hashes
+
+
+def row_hashes(df: pd.DataFrame, columns: Optional[Sequence[str]] = None, hash_key: str = HASH_KEYS[0]) -> np.ndarray:
+    """One uint64 fingerprint per row of df[columns] (all columns when None)."""
+    columns = list(df.columns) if columns is None else list(columns)
+    acc = np.zeros(len(df), dtype=np.uint64)
+    for col in columns:
+        # Position-dependent mixing, so equal values in swapped columns differ
+        acc = (acc * _MIX) ^ _column_hash(df[col], hash_key)
+    return acc
+
+
+class HashSet:
+    """
+    Set of 64-bit (hi only) or 128-bit (hi, lo) fingerprints stored as sorted runs.
+    A new run is merged into the previous one while it is at least half its size,
+    so there are O(log n) runs and each lookup is a searchsorted per run.
+    With max_bytes, once the in-memory runs exceed it they are merged into one
+    segment file in spill_dir (a temporary directory, removed with the set, when
+    None). Segments are never rewritten and are read memory-mapped; a pickled set
+    refers to them by file name. Small trailing segments (e.g. one per lineage
+    append) are merged into a new file while the result stays within max_bytes;
+    a replaced file is deleted only if this object wrote it (a pickled copy, e.g.
+    a lineage's previous version, may still refer to the others).
+    """
+
+    def __init__(self, bits: int = 64, max_bytes: Optional[int] = None, spill_dir: Optional[str] = None):
+        if bits not in HASH_BITS:
+            raise ValueError(f"bits must be one of {HASH_BITS}")
+        self.bits = bits
+        self.runs: List[Tuple[np.ndarray, Optional[np.ndarray]]] = []
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        # (file stem, length) of the spilled segments, oldest first
+        self.segments: List[Tuple[str, int]] = []
+        self._mapped: List[Tuple[np.ndarray, Optional[np.ndarray]]] = []
+        self._written = set()
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k not in ("_mapped", "_cleanup", "_written")}
+
+    def __setstate__(self, state):
+        # Sets pickled before spilling existed keep everything in memory
+        self.__dict__.update({"max_bytes": None, "spill_dir": None, "segments": [], **state})
+        self._mapped = []
+        self._written = set()
+
+    def __len__(self) -> int:
+        return sum(len(hi) for hi, _ in self.runs) + sum(n for _, n in self.segments)
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(hi.nbytes + (lo.nbytes if lo is not None else 0) for hi, lo in self.runs)
+
+    @property
+    def nbytes(self) -> int:
+        """Fingerprint bytes in memory and in spilled segments."""
+        return self.memory_bytes + sum(n for _, n in self.segments) * self.bits // 8
+
+    def _segment_path(self, stem: str, part: str) -> str:
+        return os.path.join(self.spill_dir, f"{stem}.{part}.npy")
+
+    def segment_files(self) -> List[str]:
+        """File names of the spilled segments (relative to spill_dir)."""
+        parts = ("hi",) if self.bits == 64 else ("hi", "lo")
+        return [f"{stem}.{part}.npy" for stem, _ in self.segments for part in parts]
+
+    def _all_runs(self) -> List[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        for stem, _ in self.segments[len(self._mapped):]:
+            lo = np.load(self._segment_path(stem, "lo"), mmap_mode="r") if self.bits == 128 else None
+            self._mapped.append((np.load(self._segment_path(stem, "hi"), mmap_mode="r"), lo))
+        return self._mapped + self.runs
+
+    def spill(self):
+        """Write the in-memory runs as one new segment file and drop them from memory."""
+        if not self.runs:
+            return
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="dashboard-fingerprints-")
+            self._cleanup = weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+        os.makedirs(self.spill_dir, exist_ok=True)
+        hi, lo = self.runs[0] if len(self.runs) == 1 else self._sorted(
+            np.concatenate([h for h, _ in self.runs]),
+            None if self.bits == 64 else np.concatenate([l for _, l in self.runs]))
+        self.segments.append((self._write_segment(hi, lo), len(hi)))
+        self.runs = []
+        self._merge_segments()
+
+    def _write_segment(self, hi: np.ndarray, lo: Optional[np.ndarray]) -> str:
+        stem = f"{SEGMENT_PREFIX}{uuid.uuid4().hex}"
+        np.save(self._segment_path(stem, "hi"), hi)
+        if lo is not None:
+            np.save(self._segment_path(stem, "lo"), lo)
+        self._written.add(stem)
+        return stem
+
+    def _merge_segments(self):
+        cap = (self.max_bytes or 0) // (self.bits // 8)
+        while len(self.segments) > 1 and self.segments[-1][1] * 2 >= self.segments[-2][1] and \
+                self.segments[-1][1] + self.segments[-2][1] <= cap:
+            merged = self.segments[-2:]
+            runs = self._all_runs()[len(self.segments) - 2:len(self.segments)]
+            hi, lo = self._sorted(np.concatenate([h for h, _ in runs]),
+                                  None if self.bits == 64 else np.concatenate([l for _, l in runs]))
+            self.segments[-2:] = [(self._write_segment(hi, lo), len(hi))]
+            self._mapped = []
+            for old, _ in merged:
+                if old in self._written:
+                    self._written.discard(old)
+                    for part in ("hi", "lo"):
+                        if os.path.exists(self._segment_path(old, part)):
+                            os.remove(self._segment_path(old, part))
+
+    def contains(self, hi: np.ndarray, lo: Optional[np.ndarray] = None) -> np.ndarray:
+        found = np.zeros(len(hi), dtype=bool)
+        for run_hi, run_lo in self._all_runs():
+            left = np.searchsorted(run_hi, hi, side="left")
+            right = np.searchsorted(run_hi, hi, side="right")
+            match = right > left
+            if run_lo is None:
+                found |= match
+                continue
+            # The run is sorted by (hi, lo): search lo within each equal-hi range
+            for i in np.flatnonzero(match & ~found):
+                j = left[i] + np.searchsorted(run_lo[left[i]:right[i]], lo[i])
+                found[i] = j < right[i] and run_lo[j] == lo[i]
+        return found
+
+    def add(self, hi: np.ndarray, lo: Optional[np.ndarray] = None):
+        """Add fingerprints known to be distinct and not yet in the set."""
+        if len(hi) == 0:
+            return
+        self.runs.append(self._sorted(hi, lo))
+        while len(self.runs) > 1 and 2 * len(self.runs[-1][0]) >= len(self.runs[-2][0]):
+            (hi_b, lo_b), (hi_a, lo_a) = self.runs.pop(), self.runs.pop()
+            merged_lo = None if lo_a is None else np.concatenate([lo_a, lo_b])
+            self.runs.append(self._sorted(np.concatenate([hi_a, hi_b]), merged_lo))
+        if self.max_bytes is not None and self.memory_bytes > self.max_bytes:
+            self.spill()
+
+    @staticmethod
+    def _sorted(hi, lo):
+        if lo is None:
+            return np.sort(hi), None
+        order = np.lexsort((lo, hi))
+        return hi[order], lo[order]
+
+
+class Deduplicator:
+    """
+    Streaming duplicate filter: filter() drops rows whose fingerprint was seen
+    earlier in the same chunk or in any previous chunk (keeping the first).
+    subset restricts the comparison to key columns; max_bytes and spill_dir cap
+    the fingerprints kept in memory (see HashSet).
+    """
+
+    def __init__(self, subset: Optional[Sequence[str]] = None, bits: int = 64,
+                 max_bytes: Optional[int] = None, spill_dir: Optional[str] = None):
+        self.subset = list(subset) if subset is not None else None
+        self.seen = HashSet(bits, max_bytes, spill_dir)
+        self.rows_checked = 0
+        self.duplicates = 0
+
+    def fingerprints(self, chunk: pd.DataFrame) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        hi = row_hashes(chunk, self.subset, HASH_KEYS[0])
+        lo = row_hashes(chunk, self.subset, HASH_KEYS[1]) if self.seen.bits == 128 else None
+        return hi, lo
+
+    def keep_mask(self, chunk: pd.DataFrame) -> np.ndarray:
+        """Boolean mask of the chunk's rows not seen before; records them as seen."""
+        if chunk.empty:
+            return np.ones(0, dtype=bool)
+        hi, lo = self.fingerprints(chunk)
+        if lo is None:
+            keep = ~pd.Series(hi).duplicated().to_numpy()
+        else:
+            keep = ~pd.DataFrame({"hi": hi, "lo": lo}).duplicated().to_numpy()
+        if len(self.seen):
+            keep &= ~self.seen.contains(hi, lo)
+        self.seen.add(hi[keep], None if lo is None else lo[keep])
+        self.rows_checked += len(chunk)
+        self.duplicates += int(len(chunk) - keep.sum())
+        return keep
+
+    def filter(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        if chunk.empty:
+            return chunk
+        keep = self.keep_mask(chunk)
+        return chunk if keep.all() else chunk[keep]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows_checked": self.rows_checked,
+            "duplicates": self.duplicates,
+            "duplicate_ratio": self.duplicates / self.rows_checked if self.rows_checked else 0.0,
+            "key_columns": self.subset,
+            "hash_bits": self.seen.bits,
+            "fingerprint_bytes": self.seen.nbytes,
+            "fingerprint_segments": len(self.seen.segments),
+        }
+
+
+def drop_duplicates(df: pd.DataFrame, subset: Optional[Sequence[str]] = None,
+                    bits: int = 64) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Deduplicate an in-memory frame (keep first); returns (frame, Deduplicator.stats())."""
+    dedup = Deduplicator(subset, bits)
+    return dedup.filter(df), dedup.stats()
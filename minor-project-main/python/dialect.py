@@ -0,0 +1,205 @@
+# dialect.py
+"""
+CSV encoding and dialect sniffing:
+- inspect a bounded prefix plus a few blocks spread through the file (never a full parse)
+- detect BOM, text encoding, delimiter, quote character and decimal separator
+- hand pandas one parse configuration up front, cached per dataset
+- decoding is strict: bytes outside the sampled blocks that do not decode make
+  read_with_fallback retry the read with the next fallback encoding
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+import codecs
+import csv
+import os
+import re
+
+PREFIX_BYTES = 64 * 1024
+BLOCK_BYTES = 16 * 1024
+# Extra blocks checked for encoding errors, evenly spaced after the prefix
+SAMPLE_BLOCKS = 8
+DELIMITERS = ",;\t|"
+# Leading lines given to csv.Sniffer
+SNIFF_LINES = 100
+# Fallback when the bytes are not UTF-8; cp1252 is a superset of Latin-1's printable range
+FALLBACK_ENCODINGS = ("cp1252", "latin-1")
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# Entries kept in the per-process dialect cache
+CACHE_SIZE = 256
+
+_DECIMAL_COMMA = re.compile(r"^-?\d+,\d+$")
+_cache: Dict[Any, "CsvDialect"] = {}
+
+T = TypeVar("T")
+
+
+class CsvDialect:
+    """One parse configuration for a CSV file."""
+
+    def __init__(self, encoding: str = "utf-8", delimiter: str = ",", quotechar: str = '"',
+                 decimal: str = "."):
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.decimal = decimal
+
+    def read_kwargs(self) -> Dict[str, Any]:
+        """
+        Keyword arguments for pd.read_csv. Decoding is strict: a byte sequence
+        the sampled blocks did not show raises UnicodeDecodeError (see read_with_fallback).
+        """
+        return {"encoding": self.encoding, "sep": self.delimiter,
+                "quotechar": self.quotechar, "decimal": self.decimal}
+
+    def fallback(self) -> Optional["CsvDialect"]:
+        """This dialect with the next encoding to try after a decode error (None after latin-1)."""
+        chain = ("utf-8",) + FALLBACK_ENCODINGS
+        encoding = "utf-8" if self.encoding == "utf-8-sig" else self.encoding
+        if encoding not in chain[:-1]:
+            return None
+        return CsvDialect(chain[chain.index(encoding) + 1], self.delimiter, self.quotechar, self.decimal)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"encoding": self.encoding, "delimiter": self.delimiter,
+                "quotechar": self.quotechar, "decimal": self.decimal}
+
+    def __repr__(self):
+        return f"CsvDialect({self.to_dict()})"
+
+
+def _decodes(blocks: List[bytes], encoding: str) -> bool:
+    for i, block in enumerate(blocks):
+        if i > 0 and encoding.startswith("utf-8"):
+            # A block cut mid-character starts with continuation bytes
+            block = block.lstrip(bytes(range(0x80, 0xC0)))
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            # final=False: a character cut at the end of the block is not an error
+            decoder.decode(block, final=False)
+        except UnicodeDecodeError:
+            return False
+    return True
+
+
+def detect_encoding(blocks: List[bytes]) -> str:
+    """Encoding of the sampled blocks (blocks[0] is the file prefix)."""
+    for bom, encoding in BOMS:
+        if blocks[0].startswith(bom):
+            return encoding
+    for encoding in ("utf-8",) + FALLBACK_ENCODINGS:
+        if _decodes(blocks, encoding):
+            return encoding
+    return FALLBACK_ENCODINGS[-1]
+
+
+def _complete_lines(text: str) -> List[str]:
+    lines = text.splitlines()
+    return lines[:-1] if len(lines) > 1 else lines
+
+
+def detect_decimal(lines: List[str], delimiter: str, quotechar: str) -> str:
+    """',' when the delimiter is not ',' and comma-decimal numbers outnumber dot-decimal ones."""
+    if delimiter == ",":
+        return "."
+    commas = dots = 0
+    for row in csv.reader(lines[1:], delimiter=delimiter, quotechar=quotechar):
+        for field in row:
+            field = field.strip()
+            if _DECIMAL_COMMA.match(field):
+                commas += 1
+            elif field.replace(".", "", 1).lstrip("-").isdigit() and "." in field:
+                dots += 1
+    return "," if commas > dots else "."
+
+
+def sniff_blocks(blocks: List[bytes]) -> CsvDialect:
+    """Dialect from the file prefix (blocks[0]) and sample blocks used to validate the encoding."""
+    encoding = detect_encoding(blocks)
+    text = blocks[0].decode(encoding, errors="ignore")
+    lines = _complete_lines(text.lstrip("\ufeff"))
+    delimiter, quotechar = ",", '"'
+    if lines:
+        try:
+            sniffed = csv.Sniffer().sniff("\n".join(lines[:SNIFF_LINES]), delimiters=DELIMITERS)
+            delimiter, quotechar = sniffed.delimiter, sniffed.quotechar or '"'
+        except csv.Error:
+            pass
+    return CsvDialect(encoding, delimiter, quotechar, detect_decimal(lines, delimiter, quotechar))
+
+
+def _block_offsets(size: int) -> List[int]:
+    if size <= PREFIX_BYTES:
+        return []
+    step = (size - PREFIX_BYTES) / SAMPLE_BLOCKS
+    return sorted({PREFIX_BYTES + int(i * step) for i in range(SAMPLE_BLOCKS)})
+
+
+def sniff_bytes(data: bytes) -> CsvDialect:
+    """sniff_blocks over an in-memory upload."""
+    blocks = [data[:PREFIX_BYTES]] + [data[o:o + BLOCK_BYTES] for o in _block_offsets(len(data))]
+    return sniff_blocks(blocks)
+
+
+def sniff_file(path: str) -> CsvDialect:
+    """sniff_blocks over a file on disk, reading at most PREFIX_BYTES + SAMPLE_BLOCKS * BLOCK_BYTES."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        blocks = [f.read(PREFIX_BYTES)]
+        for offset in _block_offsets(size):
+            f.seek(offset)
+            blocks.append(f.read(BLOCK_BYTES))
+    return sniff_blocks(blocks)
+
+
+def _cache_key(path: str, dataset_id: Optional[str]) -> Tuple:
+    if dataset_id:
+        return ("dataset", dataset_id)
+    st = os.stat(path)
+    return ("file", os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+
+def _remember(key: Tuple, dialect: CsvDialect):
+    if key not in _cache and len(_cache) >= CACHE_SIZE:
+        _cache.pop(next(iter(_cache)))
+    _cache[key] = dialect
+
+
+def sniff_dialect(path: str, dataset_id: Optional[str] = None) -> CsvDialect:
+    """
+    Dialect of the CSV at path, cached per dataset: by dataset_id (the upload's
+    content hash) when given, else by path, size and modification time.
+    """
+    key = _cache_key(path, dataset_id)
+    dialect = _cache.get(key)
+    if dialect is None:
+        dialect = sniff_file(path)
+        _remember(key, dialect)
+    return dialect
+
+
+def read_with_fallback(read: Callable[[CsvDialect], T], dialect: CsvDialect, path: Optional[str] = None,
+                       dataset_id: Optional[str] = None) -> T:
+    """
+    Return read(dialect). When the file holds bytes the sampled blocks did not
+    show and the read fails with UnicodeDecodeError, the whole read is retried
+    with the next fallback encoding (utf-8 -> cp1252 -> latin-1, which decodes
+    any byte). With a path, the dialect that worked replaces the cached one.
+    """
+    while True:
+        try:
+            result = read(dialect)
+            break
+        except UnicodeDecodeError as e:
+            retry = dialect.fallback()
+            if retry is None:
+                raise
+            print(f"⚠️ {dialect.encoding} decode failed past the sniffed sample ({e.reason}) — "
+                  f"retrying with {retry.encoding}")
+            dialect = retry
+    if path is not None:
+        _remember(_cache_key(path, dataset_id), dialect)
+    return result
@@ -0,0 +1,168 @@
+# excel.py
+"""
+Excel ingestion:
+- pick the fastest installed reader engine (calamine, else openpyxl / xlrd)
+- parse several sheets in parallel worker processes and stack them into one
+  dataset with a sheet column (the upload's sheets option)
+- stream rows of large .xlsx sheets in bounded chunks (openpyxl read-only mode)
+- convert a workbook sheet once into the columnar DatasetStore (per dataset_id),
+  so repeat analysis reads the memory-mapped copy and never reopens the file
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+import importlib.util
+import os
+import pandas as pd
+
+from dataset_store import DatasetStore
+
+EXCEL_SUFFIXES = (".xlsx", ".xls")
+# Engines in order of preference per file type, with the module each needs
+ENGINES = {
+    ".xlsx": ("calamine", "openpyxl"),
+    ".xls": ("calamine", "xlrd"),
+}
+ENGINE_MODULES = {"calamine": "python_calamine", "openpyxl": "openpyxl", "xlrd": "xlrd"}
+STREAM_CHUNK_ROWS = 50_000
+MAX_SHEET_WORKERS = int(os.getenv("DASHBOARD_EXCEL_WORKERS", str(min(4, os.cpu_count() or 1))))
+# sheets option value selecting every sheet of the workbook
+ALL_SHEETS = "all"
+# Column naming the sheet each row of a stacked workbook came from
+SHEET_COLUMN = "sheet"
+# .xlsx is zipped XML; the parsed sheet is this many times the file size (for memory budgeting)
+XLSX_EXPANSION = 8
+
+SheetName = Union[int, str]
+
+
+def _suffix(filename: str) -> str:
+    return os.path.splitext(filename or "")[1].lower()
+
+
+def engine_available(engine: str) -> bool:
+    return importlib.util.find_spec(ENGINE_MODULES[engine]) is not None
+
+
+def choose_engine(filename: str, engine: Optional[str] = None) -> Optional[str]:
+    """The requested engine, else the first installed one for the file type (None lets pandas decide)."""
+    if engine:
+        return engine
+    return next((e for e in ENGINES.get(_suffix(filename), ()) if engine_available(e)), None)
+
+
+def sheet_names(path: str, engine: Optional[str] = None) -> List[str]:
+    with pd.ExcelFile(path, engine=choose_engine(path, engine)) as book:
+        return list(book.sheet_names)
+
+
+def parse_sheets(spec: Optional[str]) -> Optional[List[str]]:
+    """Sheet names from a sheets option: "all" -> None (every sheet), else comma-separated names."""
+    if spec is None or spec.strip().lower() == ALL_SHEETS:
+        return None
+    names = [name.strip() for name in spec.split(",") if name.strip()]
+    if not names:
+        raise ValueError(f"sheets must be '{ALL_SHEETS}' or comma-separated sheet names")
+    return names
+
+
+def read_sheet(source, filename: str, sheet_name: SheetName = 0, engine: Optional[str] = None) -> pd.DataFrame:
+    """Parse one sheet from a path, bytes stream or file object."""
+    return pd.read_excel(source, sheet_name=sheet_name, engine=choose_engine(filename, engine))
+
+
+def read_workbook(path: str, sheets: Optional[Sequence[SheetName]] = None, engine: Optional[str] = None,
+                  max_workers: int = MAX_SHEET_WORKERS) -> Dict[str, pd.DataFrame]:
+    """
+    Parse several sheets (all when sheets is None) into {sheet name: DataFrame}.
+    Each sheet is parsed in its own worker process when there is more than one.
+    """
+    names = sheet_names(path, engine)
+    if sheets is not None:
+        missing = [s for s in sheets if not isinstance(s, int) and s not in names]
+        if missing:
+            raise ValueError(f"Unknown sheet(s) {missing}: the workbook has {names}")
+        names = [names[s] if isinstance(s, int) else s for s in sheets]
+    if len(names) <= 1 or max_workers <= 1:
+        return {name: read_sheet(path, path, name, engine) for name in names}
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(names))) as pool:
+        frames = pool.map(read_sheet, [path] * len(names), [path] * len(names), names, [engine] * len(names))
+        return dict(zip(names, frames))
+
+
+def _with_sheet(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    if SHEET_COLUMN in df.columns:
+        return df
+    return df.assign(**{SHEET_COLUMN: name})
+
+
+def read_sheets(path: str, sheets: Optional[Sequence[SheetName]] = None, engine: Optional[str] = None) -> pd.DataFrame:
+    """
+    The selected sheets (all when None), parsed in parallel by read_workbook and
+    stacked in workbook order; SHEET_COLUMN records each row's sheet.
+    """
+    frames = read_workbook(path, sheets, engine)
+    return pd.concat([_with_sheet(df, name) for name, df in frames.items()], ignore_index=True)
+
+
+def iter_sheets_chunks(path: str, sheets: Optional[Sequence[SheetName]] = None,
+                       chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Streaming counterpart of read_sheets for workbooks too large to parse whole: one sheet after another."""
+    names = sheet_names(path) if sheets is None else sheets
+    return chain.from_iterable((_with_sheet(chunk, name) for chunk in iter_sheet_chunks(path, name, chunk_rows))
+                               for name in names)
+
+
+def _header(row: Sequence[Any]) -> List[str]:
+    return [str(v) if v is not None else f"Unnamed: {i}" for i, v in enumerate(row)]
+
+
+def iter_sheet_chunks(path: str, sheet_name: SheetName = 0,
+                      chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Yield a sheet as DataFrame chunks of at most chunk_rows rows. .xlsx sheets are
+    streamed row by row (openpyxl read-only mode), so the whole workbook is never
+    held in memory; other formats are parsed whole and yielded as one chunk.
+    """
+    if _suffix(path) != ".xlsx" or not engine_available("openpyxl"):
+        yield read_sheet(path, path, sheet_name)
+        return
+    from openpyxl import load_workbook
+
+    book = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = book.worksheets[sheet_name] if isinstance(sheet_name, int) else book[sheet_name]
+        rows = sheet.iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        batch, n_chunks = [], 0
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            batch.append(row[:len(header)])
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=header).infer_objects()
+                batch, n_chunks = [], n_chunks + 1
+        if batch or n_chunks == 0:
+            yield pd.DataFrame(batch, columns=header).infer_objects()
+    finally:
+        book.close()
+
+
+def read_excel_columnar(path: str, sheet_name: SheetName = 0, engine: Optional[str] = None,
+                        store: Optional[DatasetStore] = None, dataset_id: Optional[str] = None) -> pd.DataFrame:
+    """
+    Read a sheet. With a dataset_id it goes through the DatasetStore: the first
+    call parses it and stores the columnar copy (keyed by dataset_id and sheet);
+    later calls memory-map that copy. Without one the sheet is just parsed.
+    """
+    if dataset_id is None:
+        return read_sheet(path, path, sheet_name, engine)
+    store = store or DatasetStore()
+    dataset_id = f"{dataset_id}-sheet-{sheet_name}"
+    stored = store.open(dataset_id)
+    if stored is not None:
+        return stored.read()
+    df = read_sheet(path, path, sheet_name, engine)
+    store.put(dataset_id, df)
+    return df
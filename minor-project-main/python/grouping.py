@@ -0,0 +1,219 @@
+# grouping.py
+"""
+Batched grouped statistics:
+- many key sets x metrics x aggregations in one call
+- each key column is factorized once (sort=False, observed groups only) and the
+  resulting GroupIndex is cached per dataset, so repeat calls skip factorization
+- all aggregations of a metric share one pass over the group index: sums and
+  counts via bincount, min / max via reduceat over the group-sorted rows,
+  median and percentiles ('p90') from one integer sort of (group, value rank),
+  with each metric's value ranks computed once and shared by all key sets
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import os
+import re
+import weakref
+import numpy as np
+import pandas as pd
+
+GROUP_AGGREGATIONS = ("count", "size", "sum", "mean", "std", "var", "min", "max", "median")
+# Percentiles are spelled p<number>, e.g. p90 or p99.9
+PERCENTILE = re.compile(r"^p(\d+(?:\.\d+)?)$")
+GROUP_CACHE_SIZE = int(os.getenv("DASHBOARD_GROUP_CACHE_SIZE", "32"))
+
+Keys = Union[str, Sequence[str]]
+
+
+def _quantile_of(agg: str) -> Optional[float]:
+    if agg == "median":
+        return 0.5
+    match = PERCENTILE.match(agg)
+    if match and float(match.group(1)) <= 100:
+        return float(match.group(1)) / 100
+    return None
+
+
+def check_aggregation(agg: str):
+    if agg not in GROUP_AGGREGATIONS and _quantile_of(agg) is None:
+        raise ValueError(f"Unsupported aggregation {agg!r}: use one of {GROUP_AGGREGATIONS} or p<percentile>")
+
+
+class GroupIndex:
+    """
+    Group codes for one key set: codes[i] is row i's group (-1 when a key is
+    missing, as groupby's dropna=True), groups numbered by first appearance.
+    order lists the grouped rows sorted by group (stable) and starts is each
+    group's first position in order.
+    """
+
+    def __init__(self, df: pd.DataFrame, keys: Sequence[str]):
+        self.keys = list(keys)
+        codes = np.zeros(len(df), dtype=np.int64)
+        missing = np.zeros(len(df), dtype=bool)
+        uniques = []
+        for key in self.keys:
+            key_codes, key_uniques = pd.factorize(df[key], sort=False)
+            missing |= key_codes < 0
+            radix = max(len(key_uniques), 1)
+            if codes.max(initial=0) >= np.iinfo(np.int64).max // radix:
+                # Re-compact before the combined code could overflow
+                codes = pd.factorize(codes)[0]
+            codes = codes * radix + np.maximum(key_codes, 0)
+            uniques.append((key_codes, key_uniques))
+        # Compact combined codes to 0..n_groups-1 in order of first appearance
+        self.codes = np.full(len(df), -1, dtype=np.int64)
+        self.codes[~missing] = pd.factorize(codes[~missing], sort=False)[0]
+        self.n_groups = int(self.codes.max(initial=-1)) + 1
+        grouped = np.flatnonzero(self.codes >= 0)
+        self.order = grouped[np.argsort(self.codes[grouped], kind="stable")]
+        self.sizes = np.bincount(self.codes[grouped], minlength=self.n_groups)
+        self.starts = np.concatenate([[0], np.cumsum(self.sizes)[:-1]]).astype(np.int64)
+        first_rows = self.order[self.starts] if self.n_groups else np.empty(0, dtype=np.int64)
+        self.key_frame = pd.DataFrame({
+            key: key_uniques.take(key_codes[first_rows]) for key, (key_codes, key_uniques) in zip(self.keys, uniques)
+        })
+
+    def aggregate(self, values: np.ndarray, aggs: Sequence[str],
+                  value_order: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Every aggregation in aggs of one metric (float64, NaN = missing) per group.
+        value_order, the argsort of values, can be shared across key sets for percentiles.
+        """
+        out: Dict[str, np.ndarray] = {}
+        valid = (self.codes >= 0) & ~np.isnan(values)
+        codes = self.codes[valid]
+        count = np.bincount(codes, minlength=self.n_groups)
+        total = np.bincount(codes, weights=values[valid], minlength=self.n_groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            if {"std", "var"} & set(aggs):
+                dev = values[valid] - mean[codes]
+                var = np.bincount(codes, weights=dev * dev, minlength=self.n_groups) / (count - 1)
+                var[count < 2] = np.nan
+        if {"min", "max"} & set(aggs) and self.n_groups:
+            # fmin / fmax skip NaN; groups with no valid value stay NaN
+            sorted_values = values[self.order]
+            if "min" in aggs:
+                out["min"] = np.fmin.reduceat(sorted_values, self.starts)
+            if "max" in aggs:
+                out["max"] = np.fmax.reduceat(sorted_values, self.starts)
+        quantiles = [a for a in aggs if _quantile_of(a) is not None]
+        if quantiles:
+            # One int64 sort of group * n + rank orders values by (group, value);
+            # each quantile then interpolates inside the group's run
+            n = len(values)
+            value_order = np.argsort(values) if value_order is None else value_order
+            ranks = np.empty(n, dtype=np.int64)
+            ranks[value_order] = np.arange(n)
+            sort_key = codes * n + ranks[valid]
+            sort_key.sort()
+            ranked = values[value_order[sort_key % n]]
+            first = np.concatenate([[0], np.cumsum(count)[:-1]])
+            for agg in quantiles:
+                pos = first + (count - 1) * _quantile_of(agg)
+                lo = np.floor(pos).astype(np.int64)
+                hi = np.minimum(lo + 1, first + count - 1)
+                frac = pos - lo
+                result = np.full(self.n_groups, np.nan)
+                has = count > 0
+                result[has] = ranked[lo[has]] * (1 - frac[has]) + ranked[hi[has]] * frac[has]
+                out[agg] = result
+        simple = {"count": count, "size": self.sizes, "sum": total, "mean": mean}
+        for agg in aggs:
+            if agg in simple:
+                out[agg] = simple[agg]
+            elif agg == "var":
+                out[agg] = var
+            elif agg == "std":
+                out[agg] = np.sqrt(var)
+        return out
+
+
+class GroupIndexCache:
+    """
+    LRU of GroupIndex objects keyed by (dataset, key set). DataFrames are
+    identified by object identity (entries are dropped when the frame is
+    garbage-collected), stored datasets by path and modification time.
+    Frames are assumed not to be mutated in place between calls.
+    """
+
+    def __init__(self, max_entries: int = GROUP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple, GroupIndex]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Frames with a finalizer registered (one per frame, even after its entries were evicted)
+        self.tracked = set()
+
+    def _token(self, data) -> Tuple:
+        if isinstance(data, pd.DataFrame):
+            token = ("frame", id(data), len(data))
+            if token not in self.tracked:
+                self.tracked.add(token)
+                weakref.finalize(data, self._forget, token)
+            return token
+        return ("stored", data.path, os.path.getmtime(data.path))
+
+    def _forget(self, token: Tuple):
+        self.tracked.discard(token)
+        for key in [k for k in self.entries if k[0] == token]:
+            del self.entries[key]
+
+    def get(self, data, frame: pd.DataFrame, keys: Sequence[str]) -> GroupIndex:
+        key = (self._token(data), tuple(keys))
+        index = self.entries.get(key)
+        if index is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return index
+        self.misses += 1
+        index = GroupIndex(frame, keys)
+        self.entries[key] = index
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return index
+
+    def clear(self):
+        self.entries.clear()
+
+
+group_cache = GroupIndexCache()
+
+
+def _key_sets(keys) -> List[Tuple[str, ...]]:
+    """'region' -> [('region',)]; ['region', ['region', 'month']] -> one tuple per key set."""
+    if isinstance(keys, str):
+        return [(keys,)]
+    return [(k,) if isinstance(k, str) else tuple(k) for k in keys]
+
+
+def grouped_aggregate(data, keys, metrics: Sequence[str], aggs: Sequence[str],
+                      cache: Optional[GroupIndexCache] = group_cache) -> Dict[Tuple[str, ...], pd.DataFrame]:
+    """
+    Aggregate every metric with every aggregation for each key set.
+    data is a DataFrame or a dataset_store.StoredDataset (only the needed
+    columns are read). Returns {key set: frame with the key columns plus one
+    '<metric>_<agg>' column per pair}, groups in order of first appearance.
+    """
+    metrics, aggs = list(metrics), list(aggs)
+    for agg in aggs:
+        check_aggregation(agg)
+    key_sets = _key_sets(keys)
+    needed = list(dict.fromkeys([k for ks in key_sets for k in ks] + metrics))
+    frame = data[needed] if isinstance(data, pd.DataFrame) else data.read(needed)
+    values = {m: frame[m].to_numpy(dtype="float64", na_value=np.nan) for m in metrics}
+    # Percentiles for every key set reuse one argsort per metric
+    value_orders = {m: np.argsort(v) for m, v in values.items()} \
+        if any(_quantile_of(a) is not None for a in aggs) else {}
+    results = {}
+    for key_set in key_sets:
+        index = cache.get(data, frame, key_set) if cache is not None else GroupIndex(frame, key_set)
+        out = index.key_frame.copy()
+        for metric in metrics:
+            for agg, column in index.aggregate(values[metric], aggs, value_orders.get(metric)).items():
+                out[f"{metric}_{agg}"] = column
+        # Columns in request order (aggregate() returns them grouped by kernel)
+        results[key_set] = out[list(key_set) + [f"{m}_{a}" for m in metrics for a in aggs]]
+    return results
@@ -0,0 +1,54 @@
+# ingestion.py
+"""
+Streaming ingestion for uploaded files:
+- parse the uploaded stream exactly once (chunk by chunk where the consumer
+  streams, in one read where it needs the whole frame)
+- hand the in-memory frame straight to the dashboard pipeline
+  (no temp-file round trip, no second parse)
+"""
+
+from typing import BinaryIO, Iterator, Optional
+import os
+import pandas as pd
+
+from data_processor import SUPPORTED_FILE_TYPES
+from excel import EXCEL_SUFFIXES, read_sheet
+from json_lines import JSON_LINES_SUFFIXES, is_json_lines_upload, read_json_lines
+
+# Rows parsed per CSV chunk; keeps the tokenizer's working set bounded.
+DEFAULT_CHUNK_ROWS = 200_000
+
+
+def iter_csv_chunks(stream: BinaryIO, chunk_rows: int = DEFAULT_CHUNK_ROWS, **read_kwargs) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame chunks parsed from a CSV stream in a single pass."""
+    with pd.read_csv(stream, chunksize=chunk_rows, **read_kwargs) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def read_upload(stream: BinaryIO, filename: str, **read_kwargs) -> pd.DataFrame:
+    """
+    Parse an uploaded file object once and return the resulting DataFrame.
+    CSV is parsed with a single read_csv call (read_kwargs, e.g. a sniffed
+    dialect, go to read_csv): the whole frame is needed, and collecting chunks
+    before concatenating them would hold the data twice. JSON Lines is parsed in
+    chunks (flattened, schema-stabilized); Excel and JSON record documents are
+    parsed directly from the stream.
+    Raises ValueError on unsupported type.
+    """
+    lower = (filename or "").lower()
+    if lower.endswith(".csv"):
+        return pd.read_csv(stream, **read_kwargs)
+    if lower.endswith(EXCEL_SUFFIXES):
+        return read_sheet(stream, lower)
+    if lower.endswith((".json",) + JSON_LINES_SUFFIXES):
+        if is_json_lines_upload(stream, lower):
+            return read_json_lines(stream)
+        return pd.read_json(stream, orient="records")
+    raise ValueError(f"Unsupported file type for {filename}. Expected one of {SUPPORTED_FILE_TYPES}")
+
+
+def dataset_name_from(filename: Optional[str]) -> str:
+    """Turn an upload filename into a human-readable dashboard title."""
+    base = os.path.splitext(os.path.basename(filename or "dataset"))[0]
+    return base.replace("_", " ").title()
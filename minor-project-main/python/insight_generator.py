@@ -1,45 +1,102 @@
 # insight_generator.py
 """
 Generate textual insights about the dataset.
-- Provides a rule-based summary always
-- If OPENAI_API_KEY is available, will call OpenAI to produce richer insights
+- Provides a rule-based summary always, read from the shared DatasetProfile
+  (dataset_profile): O(columns), the rows are never rescanned
+- If an LLM provider is configured (OPENAI_API_KEY, see insight_providers), asks it
+  for richer insights asynchronously: bounded by a deadline, limited in concurrency
+  and cached per prompt; a missed deadline or error leaves just the rule-based insights
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import asyncio
 import os
+import threading
 import pandas as pd
-import numpy as np
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", None)
+from dataset_profile import DatasetProfile
+from insight_providers import InsightService, default_provider
 
+# |Pearson median skewness| from which a numeric column is called skewed
+SKEW_THRESHOLD = 0.5
+# Top-level share of a categorical column's values from which it is called concentrated
+CONCENTRATION_SHARE = 0.5
+# |r| from which a column pair is highlighted
+STRONG_CORRELATION = 0.7
 
-def rule_based_insights(df: pd.DataFrame, column_types: Dict[str, str], top_n: int = 3) -> List[str]:
-    """Simple deterministic insights (safe fallback)."""
+# Shared by every request so the cache and the concurrency limit are process-wide
+insight_service = InsightService(default_provider())
+# (pid, loop) of the background event loop behind the blocking generate_insights
+_background = None
+_background_lock = threading.Lock()
+
+
+def rule_based_insights(profile, top_n: int = 3) -> List[str]:
+    """
+    Deterministic insights (safe fallback) read from a DatasetProfile or a
+    compute_summary dict: size, duplicates removed, missing values, means,
+    top levels, skew, concentration, strong correlations and time trends.
+    O(columns): the rows are never touched.
+    """
+    profile = DatasetProfile.of(profile)
     insights = []
     # dataset size
-    insights.append(f"The dataset has {df.shape[0]} rows and {df.shape[1]} columns.")
+    insights.append(f"The dataset has {profile.n_rows} rows and {profile.n_columns} columns.")
+
+    # duplicates removed during cleaning
+    duplicates = profile.duplicates
+    if duplicates and duplicates.get("duplicates"):
+        keys = duplicates.get("key_columns")
+        scope = f" (matching on {', '.join(keys)})" if keys else ""
+        insights.append(f"{duplicates['duplicates']} duplicate rows{scope} were removed "
+                        f"({duplicates['duplicate_ratio']:.1%} of {duplicates['rows_checked']}).")
 
     # missing values top columns
-    missing = df.isna().sum().sort_values(ascending=False)
-    if missing.iloc[0] > 0:
-        top_miss = missing[missing > 0].head(top_n)
-        for col, cnt in top_miss.items():
-            insights.append(f"Column '{col}' has {int(cnt)} missing values ({cnt/df.shape[0]:.1%}).")
-
-    # top numeric trends: highest mean
-    numeric_cols = [c for c, t in column_types.items() if t == "numeric"]
-    if numeric_cols:
-        means = df[numeric_cols].mean().sort_values(ascending=False)
-        top = means.head(top_n)
-        for col, val in top.items():
-            insights.append(f"Numeric column '{col}' has mean ≈ {val:.3g}.")
-
-    # categorical top levels
-    cat_cols = [c for c, t in column_types.items() if t == "categorical"]
-    if cat_cols:
-        for c in cat_cols[:top_n]:
-            top_levels = df[c].value_counts().head(3).to_dict()
-            insights.append(f"Top values for '{c}': {top_levels}.")
+    for col, cnt, share in profile.missing()[:top_n]:
+        insights.append(f"Column '{col}' has {cnt} missing values ({share:.1%}).")
+
+    # top numeric columns: highest mean
+    numeric_cols = profile.columns_of("numeric")
+    means = sorted(((c, profile.stat(c, "mean")) for c in numeric_cols if profile.stat(c, "mean") is not None),
+                   key=lambda cm: cm[1], reverse=True)
+    for col, val in means[:top_n]:
+        insights.append(f"Numeric column '{col}' has mean ≈ {val:.3g}.")
+
+    # skew: mean pulled away from the median
+    skewed = sorted(((c, profile.skew(c)) for c in numeric_cols if profile.skew(c) is not None),
+                    key=lambda cs: abs(cs[1]), reverse=True)
+    for col, skew in [cs for cs in skewed if abs(cs[1]) >= SKEW_THRESHOLD][:top_n]:
+        side = "right (a long tail of large values)" if skew > 0 else "left (a long tail of small values)"
+        insights.append(f"'{col}' is skewed to the {side}: mean {profile.stat(col, 'mean'):.3g} "
+                        f"vs median {profile.stat(col, 'median'):.3g}.")
+
+    # categorical top levels and concentration
+    cat_cols = profile.columns_of("categorical")
+    for c in cat_cols[:top_n]:
+        levels = profile.top_values(c, 3)
+        if levels:
+            insights.append(f"Top values for '{c}': {dict(levels)}.")
+    for c in cat_cols:
+        share = profile.concentration(c)
+        if share is not None and share >= CONCENTRATION_SHARE and (profile.columns[c].get("n_unique") or 0) > 1:
+            value = profile.top_values(c, 1)[0][0]
+            insights.append(f"'{c}' is concentrated: '{value}' accounts for {share:.0%} of its values.")
+
+    # strongest correlations (pairs are already ordered by |r|)
+    strong = [p for p in profile.correlations
+              if p.get("corr") is not None and abs(p["corr"]) >= STRONG_CORRELATION][:top_n]
+    for pair in strong:
+        sign = "positively" if pair["corr"] > 0 else "negatively"
+        insights.append(f"'{pair['left']}' and '{pair['right']}' are strongly {sign} correlated "
+                        f"(r = {pair['corr']:.2f}).")
+
+    # time trends (per-period sums, see dataset_profile.cube_trends)
+    for trend in profile.trends:
+        if trend["direction"] == "flat":
+            continue
+        per = f" per {trend['period']}" if trend.get("period") else ""
+        insights.append(f"'{trend['column']}'{per} trends {trend['direction']}: {trend['change']:+.0%} "
+                        f"over {trend['periods']} periods (fit R² {trend['r2']:.2f}).")
 
     return insights
 
@@ -50,64 +107,83 @@ def openai_insights_prompt(df_summary: Dict[str, Any]) -> str:
     parts = []
     ds = df_summary.get("dataset_info", {})
     parts.append(f"Dataset has {ds.get('n_rows')} rows and {ds.get('n_columns')} columns.")
+    if ds.get("duplicates"):
+        parts.append(f"{ds['duplicates']['duplicates']} duplicate rows were removed.")
     # add column summaries
     for col, info in list(df_summary.get("columns", {}).items())[:10]:  # limit to first 10 cols
         ci = df_summary["columns"][col]
         parts.append(
             f"Column '{col}': type={ci.get('inferred_type')}, missing={ci.get('n_missing')}, unique={ci.get('n_unique')}."
         )
+    for pair in df_summary.get("top_correlations", [])[:3]:
+        parts.append(f"Correlation '{pair['left']}' ~ '{pair['right']}': r={pair['corr']:.2f}.")
+    for trend in df_summary.get("trends", []):
+        parts.append(f"Trend of '{trend['column']}' per {trend.get('period') or 'period'}: "
+                     f"{trend['change']:+.0%} over {trend['periods']} periods.")
     prompt = "You are a helpful data analyst. Given the dataset summary below, produce 3 concise, prioritized business insights (1-2 sentences each) and suggest 2 charts to visualize them.\n\n"
     prompt += "\n".join(parts)
     return prompt
 
 
-def generate_insights(df: pd.DataFrame, df_summary: Dict[str, Any], max_insights: int = 5) -> Dict[str, Any]:
+def chart_suggestions(llm_text: Optional[str]) -> List[str]:
+    # Simple heuristic: the first lines of an answer that talks about charts
+    if "chart" not in (llm_text or "").lower():
+        return []
+    return [line.strip() for line in llm_text.splitlines()[:5] if line.strip()]
+
+
+async def generate_insights_async(df: Optional[pd.DataFrame], df_summary: Dict[str, Any], max_insights: int = 5,
+                                  schema=None, service: Optional[InsightService] = None,
+                                  deadline: Optional[float] = None) -> Dict[str, Any]:
     """
+    Insights come from df_summary alone (df is accepted for compatibility and
+    may be None). Column types come from the shared Schema when given, else
+    from df_summary (which compute_summary built from the same Schema). service defaults to the
+    process-wide insight_service; deadline overrides its per-call deadline.
     Return:
       {
         "rule_based": [...],
         "llm": "text or None",
-        "chart_suggestions": [...]
+        "llm_cached": bool,
+        "chart_suggestions": [...],
+        "llm_error": "only when the provider failed or missed the deadline"
       }
     """
+    service = service or insight_service
     result = {}
-    col_types = {col: info["inferred_type"] for col, info in df_summary["columns"].items()}
-    result["rule_based"] = rule_based_insights(df, col_types, top_n=3)
-
-    # If no API key, skip LLM and return
-    if not OPENAI_API_KEY:
-        result["llm"] = None
-        result["chart_suggestions"] = []  # frontend can use visualizer recommendations
-        return result
-
-    # Otherwise call OpenAI (ChatCompletion)
-    try:
-        import openai
-
-        openai.api_key = OPENAI_API_KEY
-        prompt = openai_insights_prompt(df_summary)
-        resp = openai.ChatCompletion.create(
-            model="gpt-4o-mini" if hasattr(openai, "ChatCompletion") else "gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=400,
-            temperature=0.2,
-        )
-        # Extract text (support API variations)
-        if isinstance(resp, dict):
-            llm_text = resp["choices"][0]["message"]["content"]
-        else:
-            # Some openai python versions return an object with .choices
-            llm_text = resp.choices[0].message.content
-        result["llm"] = llm_text
-        # Try to extract chart suggestions from LLM text (simple heuristic)
-        suggestions = []
-        if "chart" in (llm_text or "").lower():
-            # just send back the llm text for frontend to parse or show
-            suggestions = [line.strip() for line in (llm_text.splitlines()[:5]) if line.strip()]
-        result["chart_suggestions"] = suggestions
-    except Exception as e:
-        result["llm"] = None
-        result["chart_suggestions"] = []
-        result["llm_error"] = str(e)
-
+    profile = DatasetProfile(df_summary, schema.types() if schema is not None else None)
+    result["rule_based"] = rule_based_insights(profile, top_n=3)
+
+    # Without a provider, skip the LLM (frontend can use visualizer recommendations)
+    answer = await service.complete(openai_insights_prompt(df_summary), deadline)
+    result["llm"] = answer["text"]
+    result["llm_cached"] = answer["cached"]
+    result["chart_suggestions"] = chart_suggestions(answer["text"])
+    if answer["error"]:
+        print(f"⚠️ LLM insights unavailable ({answer['error']}); using rule-based insights")
+        result["llm_error"] = answer["error"]
     return result
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """This process's persistent event loop, running on a daemon thread (started on first use)."""
+    global _background
+    with _background_lock:
+        # A forked worker inherits the variable but not the thread running the loop
+        if _background is None or _background[0] != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="insight-loop", daemon=True).start()
+            _background = (os.getpid(), loop)
+        return _background[1]
+
+
+def generate_insights(df: Optional[pd.DataFrame], df_summary: Dict[str, Any], max_insights: int = 5,
+                      schema=None, service: Optional[InsightService] = None) -> Dict[str, Any]:
+    """
+    Blocking wrapper around generate_insights_async, for callers without an event
+    loop. It runs on a persistent background loop rather than asyncio.run, whose
+    loop shutdown would cancel a provider call that missed the deadline; the
+    shielded call keeps running there and its late answer reaches the cache.
+    """
+    coro = generate_insights_async(df, df_summary, max_insights, schema, service)
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
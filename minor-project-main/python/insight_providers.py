@@ -0,0 +1,155 @@
+# insight_providers.py
+"""
+Pluggable, asynchronous LLM providers for dataset insights:
+- InsightProvider: the interface (async complete(prompt) -> text)
+- OpenAIChatProvider: any OpenAI-compatible /chat/completions endpoint over plain
+  HTTP (base URL configurable, so tests can point it at a local stub server)
+- InsightService: per-call deadline, concurrency limit, and a response cache
+  keyed on a hash of the prompt (identical in-flight prompts share one call)
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import asyncio
+import hashlib
+import json
+import os
+import urllib.request
+import weakref
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", None)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+LLM_MODEL = os.getenv("DASHBOARD_LLM_MODEL", "gpt-4o-mini")
+LLM_DEADLINE_SECONDS = float(os.getenv("DASHBOARD_LLM_DEADLINE", "8"))
+LLM_MAX_CONCURRENCY = int(os.getenv("DASHBOARD_LLM_CONCURRENCY", "4"))
+LLM_CACHE_SIZE = int(os.getenv("DASHBOARD_LLM_CACHE_SIZE", "256"))
+
+
+class InsightProvider(ABC):
+    """Turns a prompt into insight text. Subclasses implement complete() (checked when instantiated)."""
+
+    name = "base"
+
+    @abstractmethod
+    async def complete(self, prompt: str) -> str:
+        """The provider's answer to prompt."""
+
+    def cache_scope(self) -> str:
+        """Part of the cache key, so different providers / models never share answers."""
+        return self.name
+
+
+class OpenAIChatProvider(InsightProvider):
+    """
+    OpenAI-compatible chat completions over HTTP (stdlib only). The blocking
+    request runs on a worker thread; its socket timeout matches the deadline,
+    so an abandoned call does not hold the thread for long.
+    """
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = OPENAI_API_KEY, base_url: str = OPENAI_BASE_URL,
+                 model: str = LLM_MODEL, max_tokens: int = 400, temperature: float = 0.2,
+                 timeout: float = LLM_DEADLINE_SECONDS):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.timeout = timeout
+
+    def cache_scope(self) -> str:
+        return f"{self.name}:{self.base_url}:{self.model}:{self.temperature}"
+
+    def _post(self, prompt: str) -> str:
+        body = json.dumps({
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+        }).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(f"{self.base_url}/chat/completions", data=body, headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+            payload = json.loads(resp.read().decode("utf-8"))
+        return payload["choices"][0]["message"]["content"]
+
+    async def complete(self, prompt: str) -> str:
+        return await asyncio.to_thread(self._post, prompt)
+
+
+def default_provider() -> Optional[InsightProvider]:
+    """The OpenAI provider when an API key (or a custom base URL) is configured, else None."""
+    if OPENAI_API_KEY or os.getenv("OPENAI_BASE_URL"):
+        return OpenAIChatProvider()
+    return None
+
+
+def prompt_key(prompt: str, scope: str = "") -> str:
+    return hashlib.sha256(f"{scope}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+class InsightService:
+    """
+    Wraps a provider with a deadline per call, a concurrency limit and an LRU
+    response cache. complete() never raises: it returns
+    {"text": str | None, "cached": bool, "error": str | None}.
+    """
+
+    def __init__(self, provider: Optional[InsightProvider], deadline: float = LLM_DEADLINE_SECONDS,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, cache_size: int = LLM_CACHE_SIZE):
+        self.provider = provider
+        self.deadline = deadline
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, str]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Semaphores bind to the running loop; created on first use per loop
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    async def _call(self, key: str, prompt: str) -> str:
+        async with self._semaphore():
+            text = await self.provider.complete(prompt)
+        self.cache[key] = text
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return text
+
+    def _finished(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve errors of calls whose callers already gave up (avoids "never retrieved" warnings)
+        if not task.cancelled():
+            task.exception()
+
+    async def complete(self, prompt: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        if self.provider is None:
+            return {"text": None, "cached": False, "error": None}
+        key = prompt_key(prompt, self.provider.cache_scope())
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return {"text": self.cache[key], "cached": True, "error": None}
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._call(key, prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._finished(key, t))
+        try:
+            # shield: a missed deadline abandons the wait, not the call, so a late
+            # answer still lands in the cache for the next identical prompt
+            text = await asyncio.wait_for(asyncio.shield(task), self.deadline if deadline is None else deadline)
+            return {"text": text, "cached": False, "error": None}
+        except asyncio.TimeoutError:
+            return {"text": None, "cached": False, "error": "deadline exceeded"}
+        except Exception as e:
+            return {"text": None, "cached": False, "error": str(e) or type(e).__name__}
@@ -0,0 +1,186 @@
+# jobs.py
+"""
+Background job engine for dashboard builds:
+- every upload becomes a job with its own ID-keyed input and output files
+- builds run in a bounded process pool, off the server's event loop
+- job status and results are looked up by job ID
+"""
+
+from typing import Any, Dict, Optional
+from concurrent.futures import Future, ProcessPoolExecutor
+import os
+import shutil
+import threading
+import time
+import uuid
+
+JOBS_DIR = os.getenv("DASHBOARD_JOBS_DIR", "jobs")
+MAX_WORKERS = int(os.getenv("DASHBOARD_WORKERS", str(os.cpu_count() or 1)))
+# Finished jobs kept on disk / in the registry before the oldest are evicted
+MAX_RETAINED_JOBS = int(os.getenv("DASHBOARD_MAX_JOBS", "200"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def build_dashboard_job(input_path: str, filename: str, output_path: str,
+                        key: Optional[str] = None, cleaning: Optional[Dict[str, Any]] = None,
+                        dataset_id: Optional[str] = None, lineage: Optional[str] = None,
+                        sheets: Optional[str] = None) -> str:
+    """
+    Worker entry point: parse the job's input once and render its dashboard
+    (in chunked passes when the file exceeds the memory budget).
+    When a cache key is given, the HTML and intermediates are stored in the dashboard cache;
+    dataset_id (the upload's content hash) keys its columnar copy in the dataset store.
+    With a lineage name the upload is processed in append mode (main.generate_dashboard_append).
+    sheets selects several Excel sheets to stack (see excel.read_sheets).
+    """
+    # Imported here so worker processes only pay for it when they run a job
+    from ingestion import dataset_name_from
+    from main import generate_dashboard_append, generate_dashboard_from_file
+    from cache import DashboardCache
+
+    artifacts: Dict[str, Any] = {}
+    options = dict(dataset_name=dataset_name_from(filename), output_file=output_path, open_browser=False,
+                   cleaning=cleaning, artifacts=artifacts, dataset_id=dataset_id)
+    if lineage:
+        generate_dashboard_append(input_path, filename, lineage, **options)
+    else:
+        generate_dashboard_from_file(input_path, filename, sheets=sheets, **options)
+    if key:
+        DashboardCache().put(key, output_path, artifacts)
+    return output_path
+
+
+class Job:
+    """A single dashboard build and its ID-keyed files."""
+
+    def __init__(self, job_id: str, filename: str, job_dir: str):
+        self.id = job_id
+        self.filename = filename
+        self.dir = job_dir
+        self.input_path = os.path.join(job_dir, "input" + os.path.splitext(filename)[1].lower())
+        self.output_path = os.path.join(job_dir, "dashboard.html")
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+        self.cache_key: Optional[str] = None
+        self.cached = False
+        # Content hash and cleaning options, for queries against the job's dataset
+        self.dataset_id: Optional[str] = None
+        self.cleaning: Optional[Dict[str, Any]] = None
+        # Lineage name for append-mode uploads
+        self.lineage: Optional[str] = None
+        # Excel sheets option ("all" or comma-separated names; None = first sheet)
+        self.sheets: Optional[str] = None
+
+    @property
+    def status(self) -> str:
+        if self.future is None:
+            return QUEUED
+        if self.future.done():
+            return FAILED if self.future.exception() is not None else DONE
+        return RUNNING if self.future.running() else QUEUED
+
+    @property
+    def error(self) -> Optional[str]:
+        if self.future is not None and self.future.done() and self.future.exception() is not None:
+            return str(self.future.exception())
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "cached": self.cached,
+            "lineage": self.lineage,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Registry of jobs backed by a lazily created, bounded process pool."""
+
+    def __init__(self, max_workers: int = MAX_WORKERS, jobs_dir: str = JOBS_DIR,
+                 max_retained: int = MAX_RETAINED_JOBS):
+        self.max_workers = max(1, max_workers)
+        self.jobs_dir = jobs_dir
+        self.max_retained = max_retained
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def create(self, filename: str) -> Job:
+        """Register a new job and create its private directory."""
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        job = Job(job_id, filename, job_dir)
+        with self._lock:
+            self._jobs[job_id] = job
+        self._evict()
+        return job
+
+    def submit(self, job: Job, key: Optional[str] = None, cleaning: Optional[Dict[str, Any]] = None,
+               dataset_id: Optional[str] = None, lineage: Optional[str] = None, sheets: Optional[str] = None) -> Job:
+        """Queue the job's dashboard build on the process pool."""
+        job.cache_key = key
+        job.cleaning, job.dataset_id, job.lineage, job.sheets = cleaning, dataset_id, lineage, sheets
+        future = self._get_pool().submit(build_dashboard_job, job.input_path, job.filename,
+                                         job.output_path, key, cleaning, dataset_id, lineage, sheets)
+
+        def _on_done(_f: Future, job=job):
+            job.finished_at = time.time()
+
+        future.add_done_callback(_on_done)
+        job.future = future
+        return job
+
+    def complete_cached(self, job: Job, key: str, cleaning: Optional[Dict[str, Any]] = None,
+                        dataset_id: Optional[str] = None, lineage: Optional[str] = None,
+                        sheets: Optional[str] = None) -> Job:
+        """Mark a job as served from the dashboard cache (its output is already in place)."""
+        future: Future = Future()
+        future.set_result(job.output_path)
+        job.cache_key = key
+        job.cleaning, job.dataset_id, job.lineage, job.sheets = cleaning, dataset_id, lineage, sheets
+        job.cached = True
+        job.finished_at = time.time()
+        job.future = future
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest_done(self) -> Optional[Job]:
+        """Most recently finished successful job, if any."""
+        with self._lock:
+            done = [j for j in self._jobs.values() if j.status == DONE]
+        return max(done, key=lambda j: j.finished_at or 0, default=None)
+
+    def _evict(self):
+        """Drop the oldest finished jobs (and their files) beyond max_retained."""
+        with self._lock:
+            excess = len(self._jobs) - self.max_retained
+            if excess <= 0:
+                return
+            finished = sorted((j for j in self._jobs.values() if j.status in (DONE, FAILED)),
+                              key=lambda j: j.created_at)
+            evicted = finished[:excess]
+            for job in evicted:
+                del self._jobs[job.id]
+        for job in evicted:
+            shutil.rmtree(job.dir, ignore_errors=True)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
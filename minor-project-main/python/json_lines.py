@@ -0,0 +1,152 @@
+# json_lines.py
+"""
+Streaming ingestion for newline-delimited JSON (JSON Lines / NDJSON):
+- read and parse a bounded number of lines at a time (never the whole document)
+- flatten nested objects into dotted columns ("user.address.city")
+- stabilize the schema across chunks: stable column order, missing fields as NaN,
+  and one dtype per column even when later records disagree
+"""
+
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+import io
+import json
+import pandas as pd
+
+JSON_LINES_SUFFIXES = (".jsonl", ".ndjson")
+DEFAULT_CHUNK_ROWS = 100_000
+# Separator between parent and child keys of flattened nested objects
+FLATTEN_SEP = "."
+SNIFF_BYTES = 64 * 1024
+
+
+def looks_like_json_lines(prefix: bytes) -> bool:
+    """Whether a .json file's first bytes are one JSON object per line rather than one document."""
+    lines = [l for l in prefix.lstrip(b"\xef\xbb\xbf").splitlines() if l.strip()]
+    if len(lines) < 2 or not lines[0].lstrip().startswith(b"{"):
+        return False
+    try:
+        json.loads(lines[0])
+    except ValueError:
+        return False
+    return True
+
+
+def _stringify_nested(value: Any) -> Any:
+    # Lists (and any dicts json_normalize left) become JSON text so columns stay hashable
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, sort_keys=True, default=str)
+    return value
+
+
+class SchemaStabilizer:
+    """
+    Keeps chunk schemas consistent. The first chunk fixes each column's kind
+    (numeric or string); later chunks are cast to it and report values that
+    could not be cast. New fields are appended unless frozen (the chunked
+    dashboard pass fixes its columns on the first chunk), then they are dropped.
+    """
+
+    def __init__(self, freeze_columns: bool = False):
+        self.columns: List[str] = []
+        self.kinds: Dict[str, str] = {}
+        self.freeze_columns = freeze_columns
+        self.coerced: Dict[str, int] = {}
+        self.dropped: List[str] = []
+
+    @staticmethod
+    def _kind(ser: pd.Series) -> Optional[str]:
+        if ser.isna().all():
+            return None
+        if pd.api.types.is_numeric_dtype(ser):
+            return "numeric"
+        return "string"
+
+    def _cast(self, col: str, ser: pd.Series) -> pd.Series:
+        kind = self.kinds.get(col)
+        if kind is None or self._kind(ser) in (None, kind):
+            return ser
+        if kind == "numeric":
+            cast = pd.to_numeric(ser, errors="coerce")
+            lost = int((cast.isna() & ser.notna()).sum())
+            if lost:
+                self.coerced[col] = self.coerced.get(col, 0) + lost
+            return cast
+        return ser.where(ser.isna(), ser.astype(str))
+
+    def apply(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        known = set(self.columns)
+        new = [c for c in chunk.columns if c not in known]
+        if new and self.freeze_columns and self.columns:
+            self.dropped.extend(c for c in new if c not in self.dropped)
+        else:
+            self.columns.extend(new)
+        chunk = chunk.reindex(columns=self.columns)
+        for col in self.columns:
+            chunk[col] = self._cast(col, chunk[col])
+            if col not in self.kinds:
+                kind = self._kind(chunk[col])
+                if kind is not None:
+                    self.kinds[col] = kind
+        return chunk
+
+    def report(self) -> Dict[str, Any]:
+        return {"columns": len(self.columns), "coerced_values": dict(self.coerced),
+                "dropped_fields": list(self.dropped)}
+
+
+def parse_records(lines: List[bytes]) -> pd.DataFrame:
+    """Parse JSON lines into a flat DataFrame (nested objects become dotted columns)."""
+    records = [json.loads(line) for line in lines if line.strip()]
+    df = pd.json_normalize(records, sep=FLATTEN_SEP)
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].map(_stringify_nested)
+    return df
+
+
+def iter_json_lines_chunks(stream: BinaryIO, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                           stabilizer: Optional[SchemaStabilizer] = None) -> Iterator[pd.DataFrame]:
+    """Yield flattened, schema-stabilized DataFrame chunks of at most chunk_rows records."""
+    stabilizer = stabilizer or SchemaStabilizer()
+    batch: List[bytes] = []
+    for i, line in enumerate(stream):
+        if i == 0:
+            line = line.lstrip(b"\xef\xbb\xbf")
+        batch.append(line)
+        if len(batch) >= chunk_rows:
+            yield stabilizer.apply(parse_records(batch))
+            batch = []
+    if batch:
+        yield stabilizer.apply(parse_records(batch))
+
+
+def read_json_lines(stream: BinaryIO, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> pd.DataFrame:
+    """Parse a whole JSON Lines stream chunk by chunk into one DataFrame."""
+    chunks = list(iter_json_lines_chunks(stream, chunk_rows))
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    # Fields first seen in later chunks are NaN in earlier ones
+    return pd.concat(chunks, ignore_index=True)
+
+
+def is_json_lines_upload(stream: BinaryIO, filename: str) -> bool:
+    """JSON Lines by extension, or a .json stream whose first lines are separate objects (stream is rewound)."""
+    lower = (filename or "").lower()
+    if lower.endswith(JSON_LINES_SUFFIXES):
+        return True
+    if not lower.endswith(".json"):
+        return False
+    pos = stream.tell()
+    prefix = stream.read(SNIFF_BYTES)
+    stream.seek(pos)
+    return looks_like_json_lines(prefix)
+
+
+def read_json_bytes(file_bytes: bytes, filename: str) -> pd.DataFrame:
+    """A JSON upload held in memory: JSON Lines are streamed, anything else is a records document."""
+    stream = io.BytesIO(file_bytes)
+    if is_json_lines_upload(stream, filename):
+        return read_json_lines(stream)
+    return pd.read_json(stream, orient="records")
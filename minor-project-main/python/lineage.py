@@ -0,0 +1,333 @@
+# lineage.py
+"""
+Incremental append mode for recurring uploads of a growing CSV export:
+- a lineage is a named series of uploads where each one is the previous upload
+  plus new rows appended at the end (e.g. a daily sales export)
+- per lineage, the store keeps the byte length and sha256 of the last ingested
+  upload, its CSV dialect and cleaning options, and the pickled chunked.ChunkedPass
+  state: profile sketches, hourly base cube and covariance sketch, all mergeable
+- dedupe fingerprints live next to the state as append-only segment files
+  (dedupe.HashSet), read memory-mapped: an append writes its new rows'
+  fingerprints as one more segment instead of re-pickling the whole set
+- a new upload extends the recorded one when its head, a fixed set of sampled
+  blocks and the bytes just before the recorded length all hash as recorded;
+  only its tail is then parsed, cleaned against the stored fingerprints and
+  merged into the state, so the cost of an append follows the new rows (the
+  upload itself is hashed once, while it is received)
+- anything else (edited history, other cleaning options) rebuilds the lineage
+- saves hold an exclusive lock file (O_CREAT | O_EXCL) around the version check
+  and the writes (state under a new version, then the metadata replaced), and
+  refuse to overwrite a version written by a concurrent append
+"""
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import hashlib
+import json
+import os
+import pickle
+import re
+import time
+import uuid
+import pandas as pd
+
+from dedupe import SEGMENT_PREFIX
+from dialect import CsvDialect
+from ingestion import iter_csv_chunks
+
+LINEAGE_DIR = os.getenv("DASHBOARD_LINEAGE_DIR", "lineages")
+# Uploads are matched to a lineage by a hash of (at most) their first HEAD_BYTES
+HEAD_BYTES = 64 * 1024
+# The recorded bytes are checked at the tail (TAIL_BYTES before the recorded
+# length) and in SAMPLE_BLOCKS evenly spaced blocks of SAMPLE_BLOCK_BYTES
+TAIL_BYTES = 64 * 1024
+SAMPLE_BLOCKS = 16
+SAMPLE_BLOCK_BYTES = 4096
+HASH_BLOCK_BYTES = 1024 * 1024
+META_FILE = "lineage.json"
+LOCK_FILE = ".lock"
+# Seconds a save waits for another one's lock, and after which a lock is taken as left by a crash
+LOCK_WAIT_SECONDS = float(os.getenv("DASHBOARD_LINEAGE_LOCK_WAIT", "10"))
+LOCK_STALE_SECONDS = float(os.getenv("DASHBOARD_LINEAGE_LOCK_STALE", "300"))
+LINEAGE_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+APPEND, CREATE, REBUILD = "append", "create", "rebuild"
+
+
+class LineageConflict(RuntimeError):
+    """Another append to the same lineage was saved first."""
+
+
+def check_name(name: str) -> str:
+    if not LINEAGE_NAME.match(name or ""):
+        raise ValueError("lineage names are 1-64 letters, digits, '_', '.' or '-' (starting with a letter or digit)")
+    return name
+
+
+def hash_prefix(path: str, n_bytes: int) -> str:
+    """sha256 of the first n_bytes of the file at path."""
+    return hash_range(path, 0, n_bytes)
+
+
+def hash_range(path: str, start: int, n_bytes: int) -> str:
+    """sha256 of n_bytes of the file at path from byte start on."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = n_bytes
+        while remaining > 0:
+            block = f.read(min(HASH_BLOCK_BYTES, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def hash_tail(path: str, n_bytes: int) -> str:
+    """sha256 of the (at most) TAIL_BYTES before byte n_bytes."""
+    start = max(0, n_bytes - TAIL_BYTES)
+    return hash_range(path, start, n_bytes - start)
+
+
+def hash_samples(path: str, n_bytes: int) -> str:
+    """sha256 of SAMPLE_BLOCKS blocks spread evenly over the first n_bytes (positions depend on n_bytes only)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for i in range(SAMPLE_BLOCKS):
+            f.seek(n_bytes * i // SAMPLE_BLOCKS)
+            digest.update(f.read(min(SAMPLE_BLOCK_BYTES, n_bytes - f.tell())))
+    return digest.hexdigest()
+
+
+def default_name(filename: str, content_hash: str) -> str:
+    """Name for a new lineage: the upload's file stem (slugged) plus a short content hash."""
+    stem = re.sub(r"[^A-Za-z0-9_.-]+", "-", os.path.splitext(os.path.basename(filename or ""))[0]).strip("-._")
+    return check_name(f"{stem[:48] or 'dataset'}-{content_hash[:8]}")
+
+
+def read_rows(path: str, dialect: CsvDialect, chunk_rows: int, offset: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    CSV chunks of the file at path from byte offset on (a row boundary). Past
+    offset 0 the column names come from the file's header line.
+    """
+    read_kwargs = dialect.read_kwargs()
+    if offset:
+        read_kwargs.update(header=None, names=list(pd.read_csv(path, nrows=0, **read_kwargs).columns))
+    with open(path, "rb") as f:
+        f.seek(offset)
+        yield from iter_csv_chunks(f, chunk_rows=chunk_rows, **read_kwargs)
+
+
+class Lineage:
+    """
+    One lineage's metadata (meta) and, on demand, its ChunkedPass state.
+    meta: name, version, n_bytes, sha256 (of the upload's n_bytes), head_bytes,
+    head_sha256, tail_sha256, sample_sha256, ends_with_newline, dialect,
+    cleaning, segments (fingerprint files) and versions (one record per
+    ingested upload).
+    """
+
+    def __init__(self, directory: str, meta: Dict[str, Any]):
+        self.dir = directory
+        self.meta = meta
+
+    @property
+    def name(self) -> str:
+        return self.meta["name"]
+
+    @property
+    def version(self) -> int:
+        return self.meta["version"]
+
+    def dialect(self) -> CsvDialect:
+        return CsvDialect(**self.meta["dialect"])
+
+    def state(self):
+        """The ChunkedPass after the last ingested upload (call finish() before rendering)."""
+        with open(os.path.join(self.dir, self.meta["state_file"]), "rb") as f:
+            return pickle.load(f)
+
+    def extends(self, path: str, cleaning: Dict[str, Any], sha256: Optional[str] = None) -> bool:
+        """
+        Whether the file at path is the recorded upload plus appended rows, under
+        the same cleaning. sha256 is the upload's hash when already known (an
+        unchanged upload then needs no reads). The recorded bytes are checked at
+        the head, the sampled blocks and the tail rather than hashed again in full.
+        """
+        n_bytes = self.meta["n_bytes"]
+        if cleaning != self.meta["cleaning"] or os.path.getsize(path) < n_bytes:
+            return False
+        if sha256 is not None and sha256 == self.meta["sha256"] and os.path.getsize(path) == n_bytes:
+            return True
+        if not self.meta["ends_with_newline"] and os.path.getsize(path) > n_bytes:
+            # The recorded last row had no line break: the upload must start a new row there
+            with open(path, "rb") as f:
+                f.seek(n_bytes)
+                if f.read(1) not in (b"\n", b"\r"):
+                    return False
+        if hash_prefix(path, self.meta["head_bytes"]) != self.meta["head_sha256"]:
+            return False
+        if "tail_sha256" not in self.meta:
+            # Recorded before tail and sample hashes were kept
+            return hash_prefix(path, n_bytes) == self.meta["sha256"]
+        return hash_tail(path, n_bytes) == self.meta["tail_sha256"] and \
+            hash_samples(path, n_bytes) == self.meta["sample_sha256"]
+
+    def new_rows(self, path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """Chunks of the rows after the recorded upload's bytes, parsed with its dialect."""
+        return read_rows(path, self.dialect(), chunk_rows, offset=self.meta["n_bytes"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in self.meta.items() if k != "state_file"}
+
+
+class LineageStore:
+    """
+    Directory of lineages: <root>/<name>/lineage.json plus state-<version>.pkl
+    and the fingerprint segment files the state refers to.
+    """
+
+    def __init__(self, root: str = LINEAGE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, name: str) -> str:
+        return os.path.join(self.root, check_name(name))
+
+    def path(self, name: str) -> str:
+        """The lineage's directory (where its state spills dedupe fingerprints)."""
+        return self._dir(name)
+
+    @contextmanager
+    def _locked(self, directory: str):
+        """Hold the lineage's lock file; raises LineageConflict when another save keeps it."""
+        path = os.path.join(directory, LOCK_FILE)
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS:
+                        os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise LineageConflict(f"Lineage {os.path.basename(directory)!r} is being updated; upload again")
+                time.sleep(0.05)
+        try:
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            yield
+        finally:
+            os.remove(path)
+
+    def load(self, name: str) -> Optional[Lineage]:
+        meta_path = os.path.join(self._dir(name), META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding="utf-8") as f:
+            return Lineage(self._dir(name), json.load(f))
+
+    def names(self) -> List[str]:
+        return sorted(n for n in os.listdir(self.root) if os.path.exists(os.path.join(self.root, n, META_FILE)))
+
+    def find(self, path: str) -> Optional[str]:
+        """
+        Name of a lineage whose recorded upload starts the file at path (checked
+        on the first HEAD_BYTES only; extends() verifies the whole prefix).
+        The lineage with the longest recorded upload wins.
+        """
+        size = os.path.getsize(path)
+        heads: Dict[int, str] = {}
+        best = None
+        for name in self.names():
+            lineage = self.load(name)
+            head_bytes = lineage.meta["head_bytes"]
+            if lineage.meta["n_bytes"] > size:
+                continue
+            if head_bytes not in heads:
+                heads[head_bytes] = hash_prefix(path, head_bytes)
+            if heads[head_bytes] == lineage.meta["head_sha256"] and \
+                    (best is None or lineage.meta["n_bytes"] > best.meta["n_bytes"]):
+                best = lineage
+        return best.name if best is not None else None
+
+    def save(self, name: str, state, path: str, sha256: str, dialect: CsvDialect,
+             cleaning: Dict[str, Any], mode: str, rows_added: int,
+             previous: Optional[Lineage] = None) -> Lineage:
+        """
+        Record the upload at path (sha256: hash of all its bytes) and the state
+        after ingesting it, as the version after previous (None for a new lineage).
+        The state's in-memory fingerprints are written as one more segment first,
+        so the pickle holds only the small mergeable state.
+        """
+        directory = self._dir(name)
+        os.makedirs(directory, exist_ok=True)
+        with self._locked(directory):
+            return self._save(directory, name, state, path, sha256, dialect, cleaning, mode, rows_added, previous)
+
+    def _save(self, directory: str, name: str, state, path: str, sha256: str, dialect: CsvDialect,
+              cleaning: Dict[str, Any], mode: str, rows_added: int, previous: Optional[Lineage]) -> Lineage:
+        current = self.load(name)
+        expected = previous.version if previous is not None else None
+        if (current.version if current is not None else None) != expected:
+            raise LineageConflict(f"Lineage {name!r} changed during this update; upload again")
+        version = (expected or 0) + 1
+        segments = state.flush()
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            f.seek(max(size - 1, 0))
+            last = f.read(1)
+        state_file = f"state-{version}.pkl"
+        tmp = os.path.join(directory, f".tmp-{uuid.uuid4().hex}")
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, os.path.join(directory, state_file))
+        head_bytes = min(size, HEAD_BYTES)
+        versions = (previous.meta["versions"] if previous is not None and mode == APPEND else [])
+        meta = {
+            "name": name, "version": version, "state_file": state_file,
+            "n_bytes": size, "sha256": sha256,
+            "head_bytes": head_bytes, "head_sha256": hash_prefix(path, head_bytes),
+            "tail_sha256": hash_tail(path, size), "sample_sha256": hash_samples(path, size),
+            "segments": segments,
+            "ends_with_newline": last in (b"\n", b"\r") or size == 0,
+            "dialect": dialect.to_dict(), "cleaning": cleaning,
+            "versions": versions + [{"version": version, "mode": mode, "n_bytes": size,
+                                     "rows_added": rows_added, "rows_total": state.rows_read,
+                                     "at": time.time()}],
+        }
+        tmp = os.path.join(directory, f".tmp-{uuid.uuid4().hex}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp, os.path.join(directory, META_FILE))
+        if current is not None and current.meta["state_file"] != state_file:
+            try:
+                os.remove(os.path.join(directory, current.meta["state_file"]))
+            except OSError:
+                pass
+        self._remove_segments(directory, current, set(segments))
+        return Lineage(directory, meta)
+
+    @staticmethod
+    def _remove_segments(directory: str, current: Optional[Lineage], keep: set):
+        """
+        Delete fingerprint segments the new version does not use: those of the
+        replaced version (merged or rebuilt away) and ones left by appends that
+        never saved, once older than LOCK_STALE_SECONDS (an append in progress
+        may still be writing its own).
+        """
+        replaced = set(current.meta.get("segments", [])) if current is not None else set()
+        for name in os.listdir(directory):
+            if not name.startswith(SEGMENT_PREFIX) or name in keep:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                if name in replaced or time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS:
+                    os.remove(path)
+            except OSError:
+                pass
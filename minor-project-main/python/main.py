@@ -5,14 +5,49 @@ import plotly.express as px
 import plotly.io as pio
 import webbrowser
 import os
+import shutil
+import asyncio
+from typing import Optional
 from upload import load_data_from_path
-from cleaning import remove_duplicates, handle_missing
+from ingestion import read_upload, iter_csv_chunks, dataset_name_from
+from dataset_store import DatasetStore
+from compaction import compact_dtypes, bytes_saved
+from projection import RestProfile, plan_projection, read_projected, strip_helpers
+from dialect import read_with_fallback, sniff_dialect
+from excel import EXCEL_SUFFIXES, XLSX_EXPANSION, iter_sheet_chunks, iter_sheets_chunks, parse_sheets, read_sheets
+from json_lines import SchemaStabilizer, is_json_lines_upload, iter_json_lines_chunks
+from chunked import ChunkedPass, MEMORY_BUDGET_BYTES, fits_in_memory, chunk_rows_for_budget
+from lineage import LineageStore, APPEND, CREATE, REBUILD, check_name, default_name, \
+    hash_prefix, read_rows
+from cleaning_plan import plan_from_options
 from analysis import correlation
-from fastapi import FastAPI, UploadFile, File
+from correlations import ANNOTATE_MAX, summarize as summarize_correlation
+from data_processor import compute_summary, summary_from_profile
+from dataset_profile import cube_trends
+from insight_generator import generate_insights_async
+from chart_data import budgets, downsample_line, histogram_bins, aggregate_bar, aggregate_pie
+from cube import AggregationCube, pick_dimensions
+from resampling import choose_granularity
+from schema import infer_schema, apply_schema, NUMERIC, CATEGORICAL, TEXT, DATETIME
+from cache import DashboardCache, cache_key, copy_and_hash
+from query_index import DatasetIndex, IndexRegistry, QueryError
+from jobs import JobManager, DONE, FAILED
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 
 app = FastAPI()
+job_manager = JobManager()
+dashboard_cache = DashboardCache()
+query_indexes = IndexRegistry()
+lineage_store = LineageStore()
+
+BASE_URL = "http://localhost:8000"
+# How long GET /jobs/{id}/result waits for a running build before answering 202
+RESULT_WAIT_SECONDS = 120
+# Numeric columns whose per-period trend is recorded in the summary (the ones charted)
+TREND_MEASURES = 2
 
 
 # Allow only your React app to access Python backend
@@ -32,37 +67,225 @@ app.add_middleware(
 def home():
     return {"message": "Python server connected with React ✔"}
 
-@app.post("/process")
-async def process_file(file: UploadFile = File(...)):
-    # 1️⃣ Read uploaded CSV
-    df = pd.read_csv(file.file)
-
-    # 2️⃣ Save uploaded file so dashboard generator can use it
-    temp_path = "uploaded.csv"
-    df.to_csv(temp_path, index=False)
+@app.on_event("shutdown")
+def shutdown_jobs():
+    job_manager.shutdown()
 
-    # 3️⃣ Update global DATA_FILE_PATH
-    global DATA_FILE_PATH
-    DATA_FILE_PATH = temp_path
 
-    # 4️⃣ Call your existing dashboard generator
-    generate_dashboard()
+@app.post("/process")
+async def process_file(file: UploadFile = File(...), drop_duplicates: bool = True, missing: str = "drop",
+                       append: bool = False, lineage: Optional[str] = None, sheets: Optional[str] = None):
+    """
+    append=true (or a lineage name) treats the upload as the latest version of a
+    growing CSV export: only rows past the lineage's last upload are processed
+    (see lineage.py). Without a name the lineage is recognised from the
+    upload's first bytes, or a new one is started.
+    sheets ("all" or comma-separated names) analyses several sheets of an Excel
+    upload, parsed in parallel and stacked with a sheet column; by default only
+    the first sheet is read.
+    """
+    # 1️⃣ Create a job with its own ID-keyed input/output files
+    filename = file.filename or "uploaded.csv"
+    if missing not in ("drop", "keep"):
+        raise HTTPException(status_code=400, detail="missing must be 'drop' or 'keep'")
+    append = append or lineage is not None
+    if append and not filename.lower().endswith(".csv"):
+        raise HTTPException(status_code=400, detail="append mode supports CSV uploads only")
+    if lineage is not None:
+        try:
+            check_name(lineage)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if sheets is not None:
+        if not filename.lower().endswith(EXCEL_SUFFIXES):
+            raise HTTPException(status_code=400, detail="sheets applies to Excel uploads only")
+        try:
+            parse_sheets(sheets)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    cleaning = {"drop_duplicates": drop_duplicates, "missing": missing}
+    job = job_manager.create(filename)
+
+    # 2️⃣ Spool the raw upload bytes into the job's input, hashing them on the way
+    content_hash = await run_in_threadpool(copy_and_hash, file.file, job.input_path)
+    # The dashboard title comes from the filename, so it is part of the key
+    options = {**cleaning, "dataset_name": dataset_name_from(filename)}
+    if append:
+        lineage = lineage or await run_in_threadpool(lineage_store.find, job.input_path) \
+            or default_name(filename, content_hash)
+        options["lineage"] = lineage
+    dataset_id = content_hash
+    if sheets is not None:
+        # The stacked sheets are a different dataset from the default first sheet
+        options["sheets"] = sheets
+        dataset_id = f"{content_hash}-sheets-{cache_key(content_hash, {'sheets': sheets})[:12]}"
+    key = cache_key(content_hash, options)
+
+    # 3️⃣ Serve a repeat upload straight from the cache; otherwise queue the build
+    cached_html = dashboard_cache.get(key)
+    if cached_html:
+        try:
+            await run_in_threadpool(shutil.copyfile, cached_html, job.output_path)
+        except FileNotFoundError:
+            # Evicted between the lookup and the copy: build it again
+            cached_html = None
+    if cached_html:
+        job_manager.complete_cached(job, key, cleaning=cleaning, dataset_id=dataset_id, lineage=lineage,
+                                    sheets=sheets)
+    else:
+        job_manager.submit(job, key=key, cleaning=cleaning, dataset_id=dataset_id, lineage=lineage, sheets=sheets)
 
-    # 5️⃣ Return the URL of the generated HTML file
+    # 4️⃣ Return the job ID plus status / result URLs
     return {
-        "html_url": "http://localhost:8000/dashboard"
+        "job_id": job.id,
+        "status": job.status,
+        "cached": job.cached,
+        "lineage": lineage,
+        "status_url": f"{BASE_URL}/jobs/{job.id}",
+        "html_url": f"{BASE_URL}/jobs/{job.id}/result",
     }
 
 
+@app.get("/lineages/{name}")
+def lineage_status(name: str):
+    try:
+        entry = lineage_store.load(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown lineage: {name}")
+    return entry.to_dict()
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
+
+
+async def _job_artifacts(job_id: str):
+    """(job, cached artifacts or None), waiting up to RESULT_WAIT_SECONDS for a running build."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if job.future is not None and not job.future.done():
+        await asyncio.wait({asyncio.wrap_future(job.future)}, timeout=RESULT_WAIT_SECONDS)
+    artifacts = dashboard_cache.load_artifacts(job.cache_key) if job.status == DONE and job.cache_key else None
+    return job, artifacts
+
+
+@app.get("/jobs/{job_id}/summary")
+async def job_summary(job_id: str):
+    job, artifacts = await _job_artifacts(job_id)
+    if not artifacts:
+        return JSONResponse(status_code=202 if job.status not in (DONE, FAILED) else 404, content=job.to_dict())
+    return {"summary": artifacts.get("summary"), "columns": artifacts.get("columns"),
+            "compaction": artifacts.get("compaction")}
+
+
+@app.get("/jobs/{job_id}/insights")
+async def job_insights(job_id: str):
+    """Insights from the cached summary profile; the dataset itself is not reloaded."""
+    job, artifacts = await _job_artifacts(job_id)
+    if not artifacts or not artifacts.get("summary"):
+        return JSONResponse(status_code=202 if job.status not in (DONE, FAILED) else 404, content=job.to_dict())
+    return await generate_insights_async(None, artifacts["summary"])
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+    # Wait (without blocking the loop or cancelling the build) for the job to finish
+    if job.future is not None and not job.future.done():
+        await asyncio.wait({asyncio.wrap_future(job.future)}, timeout=RESULT_WAIT_SECONDS)
+
+    if job.status == DONE:
+        return FileResponse(job.output_path)
+    if job.status == FAILED:
+        return JSONResponse(status_code=500, content=job.to_dict())
+    return JSONResponse(status_code=202, content=job.to_dict())
+
+
+def build_query_index(job):
+    """
+    Drill-down index for a job's dataset, cleaned with the job's options: read
+    from the dataset store, else parsed from the job's input (and stored) when
+    it fits the memory budget. The time column is the dashboard's when cached.
+    """
+    store = DatasetStore()
+    stored = store.open(job.dataset_id)
+    if stored is not None:
+        df = stored.read()
+    elif os.path.exists(job.input_path) and fits_in_memory(os.path.getsize(job.input_path), MEMORY_BUDGET_BYTES):
+        def read(read_kwargs):
+            with open(job.input_path, "rb") as f:
+                return read_upload(f, job.filename, **read_kwargs)
+
+        if job.filename.lower().endswith(".csv"):
+            df = read_with_fallback(lambda dialect: read(dialect.read_kwargs()),
+                                    sniff_dialect(job.input_path, job.dataset_id), job.input_path, job.dataset_id)
+        elif job.sheets is not None:
+            df = read_sheets(job.input_path, parse_sheets(job.sheets))
+        else:
+            df = read({})
+        df, _ = compact_dtypes(df)
+        store.put(job.dataset_id, df)
+    else:
+        raise HTTPException(status_code=409, detail="Dataset is too large to keep resident for queries")
+    cleaning = {**DEFAULT_CLEANING, **(job.cleaning or {})}
+    df, _ = plan_from_options(cleaning["drop_duplicates"], cleaning["missing"]).run(df)
+    artifacts = dashboard_cache.load_artifacts(job.cache_key) if job.cache_key else None
+    time_col = ((artifacts or {}).get("columns") or {}).get("time_col")
+    print(f"🔎 Indexing {job.filename} for queries ({len(df):,} rows)")
+    return DatasetIndex.build(df, time_col)
+
+
+def _query_index(job_id: str) -> DatasetIndex:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if job.dataset_id is None:
+        raise HTTPException(status_code=404, detail="Job has no dataset to query")
+    key = (job.dataset_id, tuple(sorted((job.cleaning or {}).items())))
+    return query_indexes.get(key, lambda: build_query_index(job))
+
+
+@app.get("/jobs/{job_id}/fields")
+async def query_fields(job_id: str):
+    # Dimensions, measures and time range a query can use (builds the index on first call)
+    index = await run_in_threadpool(_query_index, job_id)
+    return index.fields()
+
+
+@app.post("/jobs/{job_id}/query")
+async def query_dataset(job_id: str, query: dict = Body(...)):
+    # Filter + aggregate over the job's resident index, e.g.
+    # {"filters": {"Region": "West"}, "time": {"last_days": 90},
+    #  "group_by": ["Category"], "metrics": {"Revenue": ["sum", "mean"]}}
+    index = await run_in_threadpool(_query_index, job_id)
+    try:
+        return await run_in_threadpool(index.query, query)
+    except (QueryError, KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/dashboard")
 def serve_dashboard():
-    return FileResponse("dashboard.html")
+    # Most recently finished upload; falls back to the CLI-generated file
+    job = job_manager.latest_done()
+    return FileResponse(job.output_path if job else OUTPUT_FILE)
 
 # --------------------------
 # CONFIGURATION
 # --------------------------
 DATA_FILE_PATH = r"C:\Users\nakul\OneDrive\Desktop\amazon_sales_dataset_500.csv"  # Change this path
 OUTPUT_FILE = "dashboard.html"
+DEFAULT_CLEANING = {"drop_duplicates": True, "missing": "drop"}
 
 
 # --------------------------
@@ -80,19 +303,16 @@ def format_rupees(value):
         return f"₹{value:,.0f}"
 
 
-def pick_columns(df):
-    """Auto-detect numeric, categorical, datetime, and key chart columns."""
-    numeric_cols = df.select_dtypes(include='number').columns.tolist()
-    categorical_cols = df.select_dtypes(include='object').columns.tolist()
-    datetime_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns.tolist()
-
-    for col in categorical_cols[:]:
-        try:
-            df[col] = pd.to_datetime(df[col])
-            datetime_cols.append(col)
-            categorical_cols.remove(col)
-        except Exception:
-            pass
+def pick_columns(df, schema=None):
+    """
+    Auto-detect numeric, categorical, datetime, and key chart columns.
+    Uses the dataset's Schema (inferred here if not given); string date columns
+    are expected to have been converted already with schema.apply_schema.
+    """
+    schema = schema or infer_schema(df)
+    numeric_cols = [c for c in schema.of_kind(NUMERIC) if not pd.api.types.is_bool_dtype(df[c])]
+    categorical_cols = schema.of_kind(CATEGORICAL, TEXT)
+    datetime_cols = schema.of_kind(DATETIME)
 
     time_col = min(datetime_cols, key=lambda c: df[c].isna().sum()) if datetime_cols else None
     pie_col, val_col, hist_col, stacked_cols = None, None, None, []
@@ -115,18 +335,18 @@ def pick_columns(df):
     return numeric_cols, categorical_cols, time_col, stacked_cols, pie_col, val_col, hist_col
 
 
-def generate_kpis(df, numeric_cols):
-    """Generate compact single-line KPI cards."""
+def generate_kpis(cube, numeric_cols):
+    """Generate compact single-line KPI cards from the dataset's AggregationCube."""
     kpi_colors = ["#00E5FF", "#FF6B6B", "#FFD93D", "#8B5CF6"]
     kpis_html = "<div class='kpi-container'>"
-    kpis_html += f"<div class='kpi' style='border-color:{kpi_colors[0]}'><h3>Total Rows</h3><p>{len(df):,}</p></div>"
-    kpis_html += f"<div class='kpi' style='border-color:{kpi_colors[1]}'><h3>Total Columns</h3><p>{len(df.columns)}</p></div>"
+    kpis_html += f"<div class='kpi' style='border-color:{kpi_colors[0]}'><h3>Total Rows</h3><p>{cube.n_rows:,}</p></div>"
+    kpis_html += f"<div class='kpi' style='border-color:{kpi_colors[1]}'><h3>Total Columns</h3><p>{cube.n_columns}</p></div>"
 
     revenue_col = next((col for col in numeric_cols if 'revenue' in col.lower()), None)
     units_col = next((col for col in numeric_cols if 'unit' in col.lower() and 'sold' in col.lower()), None)
 
     if revenue_col:
-        total_revenue = df[revenue_col].sum()
+        total_revenue = cube.total(revenue_col)
         kpis_html += f"""
             <div class='kpi' style='border-color:{kpi_colors[2]}'>
                 <h3>Revenue</h3>
@@ -135,7 +355,7 @@ def generate_kpis(df, numeric_cols):
         """
 
     if units_col:
-        total_units = int(df[units_col].sum())
+        total_units = int(cube.total(units_col))
         kpis_html += f"""
             <div class='kpi' style='border-color:{kpi_colors[3]}'>
                 <h3>Units Sold</h3>
@@ -152,8 +372,15 @@ def generate_summary(df):
     numeric_df = df.select_dtypes(include='number')
     if numeric_df.empty:
         return "<p>No numeric data available for summary statistics.</p>"
+    return format_summary_table(numeric_df.describe().T)
+
+
+def format_summary_table(stats):
+    """Format a describe()-style table (columns x count/mean/std/...) as HTML."""
+    if stats.empty:
+        return "<p>No numeric data available for summary statistics.</p>"
 
-    summary = numeric_df.describe().T.reset_index()
+    summary = stats.reset_index()
     summary.rename(columns={
         "index": "Column",
         "count": "Count",
@@ -174,31 +401,26 @@ def generate_summary(df):
 
 
 # --------------------------
-# MAIN DASHBOARD FUNCTION
+# DASHBOARD RENDERING
 # --------------------------
-def generate_dashboard():
-    print("🚀 Loading data...")
-    df = load_data_from_path(DATA_FILE_PATH)
-
-    print("🧹 Cleaning data...")
-    df = remove_duplicates(df)
-    df = handle_missing(df, method='drop')
-
-    print("📊 Running analysis...")
-    summary_html = generate_summary(df)
-    dashboard_name = os.path.splitext(os.path.basename(DATA_FILE_PATH))[0].replace("_", " ").title()
-
-    numeric_cols, categorical_cols, time_col, stacked_cols, pie_col, val_col, hist_col = pick_columns(df)
+def build_charts(cube, columns, bins, corr, time_label, limits):
+    """
+    Render the three chart sections from pre-aggregated inputs only:
+    the AggregationCube, the histogram bins for hist_col and the correlation heatmap
+    matrix (already truncated and clustered, see correlations.heatmap_matrix).
+    """
+    numeric_cols, categorical_cols, time_col, stacked_cols, pie_col, val_col, hist_col = columns
     color_theme = px.colors.qualitative.Plotly
-    kpis_html = generate_kpis(df, numeric_cols)
     chart_sections = []
 
     # === Section 1: Sales Trends ===
     section1 = "<h2 class='section-title'>📈 Sales & Time Trends</h2><div class='chart-container'>"
     if time_col and numeric_cols:
         for y_col in numeric_cols[:2]:
-            fig_line = px.line(df, x=time_col, y=y_col, markers=True,
-                               title=f"{y_col} over {time_col}",
+            trend = cube.time_series(y_col, "sum").rename(columns={"value": y_col})
+            line_df = downsample_line(trend, time_col, y_col, limits["line"])
+            fig_line = px.line(line_df, x=time_col, y=y_col, markers=True,
+                               title=f"{y_col} per {time_label} ({time_col})",
                                color_discrete_sequence=color_theme)
             fig_line.update_traces(line=dict(width=3))
             section1 += f"<div class='chart-box'>{pio.to_html(fig_line, full_html=False, include_plotlyjs='cdn')}</div>"
@@ -209,14 +431,19 @@ def generate_dashboard():
     section2 = "<h2 class='section-title'>🌍 Category & Regional Analysis</h2><div class='chart-container'>"
     if stacked_cols:
         x_col, y_col, color_col = stacked_cols
-        fig_stacked = px.bar(df, x=x_col, y=y_col, color=color_col,
+        grouped = cube.aggregate([x_col, color_col] if color_col else [x_col], y_col, "sum")
+        bar_df = aggregate_bar(grouped.rename(columns={"value": y_col}), x_col, y_col, color_col,
+                               max_bars=limits["bar"], max_colors=limits["bar_colors"])
+        fig_stacked = px.bar(bar_df, x=x_col, y=y_col, color=color_col,
                              title="Stacked Column Chart",
                              barmode='stack', text_auto=True,
                              color_discrete_sequence=px.colors.qualitative.Pastel)
         section2 += f"<div class='chart-box'>{pio.to_html(fig_stacked, full_html=False, include_plotlyjs=False)}</div>"
 
     if pie_col:
-        fig_pie = px.pie(df, names=pie_col, values=val_col,
+        pie_df = aggregate_pie(cube.aggregate([pie_col], val_col, "sum"), pie_col, "value",
+                               max_slices=limits["pie"])
+        fig_pie = px.pie(pie_df, names=pie_col, values="value",
                          title=f"Distribution by {pie_col}", hole=0.35,
                          color_discrete_sequence=px.colors.qualitative.Set3)
         section2 += f"<div class='chart-box'>{pio.to_html(fig_pie, full_html=False, include_plotlyjs=False)}</div>"
@@ -225,26 +452,29 @@ def generate_dashboard():
 
     # === Section 3: Performance Metrics ===
     section3 = "<h2 class='section-title'>📊 Performance Metrics</h2><div class='chart-container'>"
-    if hist_col:
-        fig_hist = px.histogram(df, x=hist_col, nbins=20,
-                                title=f"Distribution of {hist_col}",
-                                color_discrete_sequence=["#FF6B6B"], text_auto=True)
+    if hist_col and bins is not None:
+        fig_hist = px.bar(bins, x="center", y="count",
+                          title=f"Distribution of {hist_col}",
+                          labels={"center": hist_col},
+                          color_discrete_sequence=["#FF6B6B"], text_auto=True)
+        fig_hist.update_traces(width=(bins["right"] - bins["left"]).tolist())
+        fig_hist.update_layout(bargap=0)
         section3 += f"<div class='chart-box'>{pio.to_html(fig_hist, full_html=False, include_plotlyjs=False)}</div>"
 
-    if numeric_cols:
-        corr = correlation(df[numeric_cols])
-        if not corr.empty:
-            fig_corr = px.imshow(corr, text_auto=True, color_continuous_scale='Viridis',
-                                 title="Correlation Heatmap")
-            section3 += f"<div class='chart-box'>{pio.to_html(fig_corr, full_html=False, include_plotlyjs=False)}</div>"
+    if corr is not None and not corr.empty:
+        # Cell labels only while they stay legible
+        fig_corr = px.imshow(corr, text_auto=".2f" if len(corr) <= ANNOTATE_MAX else False,
+                             color_continuous_scale='Viridis', zmin=-1, zmax=1,
+                             title="Correlation Heatmap")
+        section3 += f"<div class='chart-box'>{pio.to_html(fig_corr, full_html=False, include_plotlyjs=False)}</div>"
     section3 += "</div>"
     chart_sections.append(section3)
 
-    charts_html = "".join(chart_sections)
+    return "".join(chart_sections)
+
 
-    # --------------------------
-    # HTML Layout
-    # --------------------------
+def render_dashboard(dashboard_name, kpis_html, charts_html, summary_html):
+    """Assemble the full dashboard HTML page."""
     html = f"""
     <html>
     <head>
@@ -383,12 +613,272 @@ def generate_dashboard():
     </html>
     """
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+    return html
+
+
+def write_dashboard(html, output_file, open_browser=True):
+    with open(output_file, "w", encoding="utf-8") as f:
         f.write(html)
 
-    abs_path = os.path.abspath(OUTPUT_FILE)
+    abs_path = os.path.abspath(output_file)
     print(f"✅ Dashboard saved to: {abs_path}")
-    webbrowser.open(f"file://{abs_path}", new=2)
+    if open_browser:
+        webbrowser.open(f"file://{abs_path}", new=2)
+    return abs_path
+
+
+def _column_artifacts(columns):
+    numeric_cols, categorical_cols, time_col, stacked_cols, pie_col, val_col, hist_col = columns
+    return {
+        "numeric_cols": numeric_cols, "categorical_cols": categorical_cols, "time_col": time_col,
+        "stacked_cols": stacked_cols, "pie_col": pie_col, "val_col": val_col, "hist_col": hist_col,
+    }
+
+
+# --------------------------
+# MAIN DASHBOARD FUNCTION
+# --------------------------
+def generate_dashboard(df=None, dataset_name=None, output_file=None, open_browser=True,
+                       cleaning=None, artifacts=None, point_budget=None, total_columns=None, projection=None):
+    """
+    Build the dashboard HTML and return the path it was written to.
+    - df: an already-parsed DataFrame (e.g. from the /process upload); if None,
+      the dataset at DATA_FILE_PATH is loaded from disk.
+    - dataset_name: dashboard title; defaults to the DATA_FILE_PATH basename.
+    - output_file: where to write the HTML; defaults to OUTPUT_FILE.
+    - open_browser: open the result locally (disabled for background jobs).
+    - cleaning: {"drop_duplicates": bool, "missing": "drop" | "keep"}; defaults to both on.
+    - artifacts: optional dict filled with the intermediates worth caching
+      ("summary", "columns", "correlation"); "correlation" is the heatmap
+      matrix and summary["top_correlations"] the strongest column pairs.
+    - point_budget: per-chart overrides for chart_data.POINT_BUDGETS
+      (max line points, histogram bins, bars, pie slices).
+    - total_columns: column count of the source file when df is a projection
+      of it (see projection.read_projected).
+    - projection: the projection.RestProfile of the columns df lacks; they are
+      added to the summary metadata so it covers every column of the file.
+    """
+    output_file = output_file or OUTPUT_FILE
+    cleaning = {**DEFAULT_CLEANING, **(cleaning or {})}
+    if df is None:
+        print("🚀 Loading data...")
+        df = load_data_from_path(DATA_FILE_PATH)
+
+    print("🧹 Cleaning data...")
+    # Dedupe and dropna fuse into one row mask and a single take
+    df, clean_report = plan_from_options(cleaning["drop_duplicates"], cleaning["missing"]).run(df)
+    duplicates = clean_report.get("duplicates")
+    df = strip_helpers(df)
+
+    print("📊 Running analysis...")
+    # Infer the schema once (on a sample) and convert string dates with the cached format
+    schema = infer_schema(df)
+    df = apply_schema(df, schema)
+    summary_html = generate_summary(df)
+    dashboard_name = dataset_name or dataset_name_from(DATA_FILE_PATH)
+
+    columns = pick_columns(df, schema)
+    numeric_cols, categorical_cols, time_col, stacked_cols, pie_col, val_col, hist_col = columns
+    # Charts are built from reduced data (see chart_data), never from the raw rows
+    limits = budgets(point_budget)
+
+    # Aggregate once into a cube; KPIs, trend, bar and pie charts all read from it
+    bar_x, bar_color = (stacked_cols[0], stacked_cols[2]) if stacked_cols else (None, None)
+    chart_dims = [c for c in (bar_x, bar_color, pie_col) if c]
+    pairs = [(bar_x, bar_color)] if bar_x and bar_color else []
+    # Trend granularity (hour/day/week/month) follows the span and density of time_col
+    time_freq, time_label = choose_granularity(df[time_col]) if time_col else (None, None)
+    cube = AggregationCube.build(df, numeric_cols, pick_dimensions(df, categorical_cols) + chart_dims,
+                                 time_col=time_col, time_freq=time_freq, pairs=pairs)
+    if total_columns:
+        cube.n_columns = total_columns
+    bins = histogram_bins(df[hist_col], limits["histogram"]) if hist_col else None
+    corr_view = summarize_correlation(correlation(df[numeric_cols])) if numeric_cols else None
+    corr = corr_view["heatmap"] if corr_view else None
+    if artifacts is not None:
+        artifacts["summary"] = compute_summary(df, schema)
+        if total_columns:
+            artifacts["summary"]["dataset_info"]["n_columns"] = total_columns
+        if projection is not None:
+            projection.complete(artifacts["summary"], cleaning)
+        if duplicates is not None:
+            artifacts["summary"]["dataset_info"]["duplicates"] = duplicates
+        if corr_view:
+            artifacts["summary"]["top_correlations"] = corr_view["top_pairs"]
+        artifacts["summary"]["trends"] = cube_trends(cube, numeric_cols[:TREND_MEASURES], time_label)
+        artifacts["columns"] = _column_artifacts(columns)
+        artifacts["correlation"] = corr
+
+    kpis_html = generate_kpis(cube, numeric_cols)
+    charts_html = build_charts(cube, columns, bins, corr, time_label, limits)
+    html = render_dashboard(dashboard_name, kpis_html, charts_html, summary_html)
+    return write_dashboard(html, output_file, open_browser)
+
+
+def generate_dashboard_chunked(chunks, dataset_name=None, output_file=None, open_browser=True,
+                               cleaning=None, artifacts=None, point_budget=None):
+    """
+    Out-of-core variant of generate_dashboard: consumes an iterable of DataFrame
+    chunks in one pass (see chunked.ChunkedPass) and renders the same summary,
+    KPIs and aggregated charts without ever holding the full dataset.
+    Median, quartiles and the histogram come from sketches (see sketches.ERROR_BOUNDS).
+    """
+    cleaning = {**DEFAULT_CLEANING, **(cleaning or {})}
+
+    print("🧹📊 Cleaning and profiling in chunks...")
+    state = ChunkedPass(cleaning, pick_columns).run(chunks)
+    return render_chunked(state, dataset_name, output_file, open_browser, artifacts, point_budget)
+
+
+def render_chunked(state, dataset_name=None, output_file=None, open_browser=True, artifacts=None,
+                   point_budget=None):
+    """Render the dashboard from a finished ChunkedPass (its sketches and rolled-up cube)."""
+    output_file = output_file or OUTPUT_FILE
+    if state.cube is None:
+        raise ValueError("No rows left to analyse after cleaning.")
+    columns = state.columns
+    numeric_cols, categorical_cols, time_col, stacked_cols, pie_col, val_col, hist_col = columns
+    limits = budgets(point_budget)
+
+    summary_html = format_summary_table(state.profile.describe())
+    bins = state.histogram(hist_col, limits["histogram"]) if hist_col else None
+    corr_view = summarize_correlation(state.covariance.correlation()) if numeric_cols else None
+    corr = corr_view["heatmap"] if corr_view else None
+    if artifacts is not None:
+        artifacts["summary"] = summary_from_profile(state.profile, state.schema)
+        if state.seen is not None:
+            artifacts["summary"]["dataset_info"]["duplicates"] = state.seen.stats()
+        if state.coerced:
+            artifacts["summary"]["dataset_info"]["coerced_values"] = dict(state.coerced)
+        if corr_view:
+            artifacts["summary"]["top_correlations"] = corr_view["top_pairs"]
+        artifacts["summary"]["trends"] = cube_trends(state.cube, numeric_cols[:TREND_MEASURES], state.time_label)
+        artifacts["columns"] = _column_artifacts(columns)
+        artifacts["correlation"] = corr
+
+    kpis_html = generate_kpis(state.cube, numeric_cols)
+    charts_html = build_charts(state.cube, columns, bins, corr, state.time_label, limits)
+    html = render_dashboard(dataset_name or dataset_name_from(DATA_FILE_PATH), kpis_html, charts_html, summary_html)
+    return write_dashboard(html, output_file, open_browser)
+
+
+def generate_dashboard_append(path, filename, lineage, dataset_id=None, memory_budget=None, **kwargs):
+    """
+    Append-mode build of a CSV upload in a lineage (see lineage.py). When the
+    upload extends the lineage's last one, only the rows past its bytes are
+    parsed, cleaned against the stored dedupe fingerprints and merged into the
+    stored chunked state; otherwise the lineage is rebuilt from the whole upload.
+    The dashboard is rendered from the updated state (as generate_dashboard_chunked),
+    and the state is saved once rendering succeeded.
+    """
+    if not filename.lower().endswith(".csv"):
+        raise ValueError("Append mode supports CSV uploads only")
+    budget = memory_budget or MEMORY_BUDGET_BYTES
+    cleaning = {**DEFAULT_CLEANING, **(kwargs.pop("cleaning", None) or {})}
+    previous = lineage_store.load(lineage)
+    if previous is not None and previous.extends(path, cleaning, dataset_id):
+        mode, dialect = APPEND, previous.dialect()
+        offset = previous.meta["n_bytes"]
+        print(f"➕ Appending to lineage {lineage}: {os.path.getsize(path) - offset:,} new bytes "
+              f"after {offset:,} already ingested")
+    else:
+        mode, dialect = REBUILD if previous is not None else CREATE, sniff_dialect(path, dataset_id)
+        offset = 0
+        print(f"🧬 {'Rebuilding' if previous is not None else 'Starting'} lineage {lineage} from {filename}")
+
+    def ingest(dialect):
+        # A decode error reruns from a fresh copy of the state with the next encoding
+        state = previous.state() if mode == APPEND else ChunkedPass(cleaning, pick_columns)
+        # Fingerprints past the memory cap, and those of the new rows at save, go to the lineage
+        state.spill_to(lineage_store.path(lineage))
+        chunk_rows = chunk_rows_for_budget(path, budget, **dialect.read_kwargs())
+        rows_before = state.rows_read
+        state.run(read_rows(path, dialect, chunk_rows, offset))
+        return state, dialect, state.rows_read - rows_before
+
+    state, dialect, rows_added = read_with_fallback(ingest, dialect, path, dataset_id)
+
+    artifacts = kwargs.get("artifacts")
+    output = render_chunked(state, **kwargs)
+    if artifacts is not None and artifacts.get("summary") is not None:
+        artifacts["summary"]["dataset_info"]["lineage"] = {
+            "name": lineage, "version": previous.version + 1 if previous is not None else 1,
+            "mode": mode, "rows_added": rows_added, "rows_total": state.rows_read,
+        }
+    sha256 = dataset_id or hash_prefix(path, os.path.getsize(path))
+    lineage_store.save(lineage, state, path, sha256, dialect, cleaning, mode, rows_added, previous)
+    return output
+
+
+def generate_dashboard_from_file(path, filename, memory_budget=None, dataset_id=None, sheets=None, **kwargs):
+    """
+    Build the dashboard for a file on disk, choosing the execution mode from the
+    memory budget: CSVs too large to load whole are processed in chunked passes.
+    With a dataset_id, an in-memory build reads the columnar copy from the
+    DatasetStore when one exists (memory-mapped, no parsing) and otherwise
+    converts the parsed upload into the store once for later rebuilds.
+    Parsed frames are dtype-compacted first; the per-column report is added to artifacts.
+    CSVs with columns the dashboard never uses are parsed as a projection
+    (projection.plan_projection); projections are not put in the store.
+    CSV encoding and dialect are sniffed once (cached per dataset) and used by every read;
+    a decode error past the sniffed sample reruns the build with the next fallback encoding.
+    .xlsx sheets and JSON Lines files too large for the budget are streamed into the chunked pass.
+    sheets ("all" or comma-separated names) stacks several Excel sheets (excel.read_sheets).
+    """
+    budget = memory_budget or MEMORY_BUDGET_BYTES
+    store = DatasetStore() if dataset_id else None
+    if store is not None and store.has(dataset_id):
+        print(f"🗄️ Reading columnar copy of {filename} from the dataset store")
+        return generate_dashboard(store.open(dataset_id).read(), **kwargs)
+    if filename.lower().endswith(".csv"):
+        return read_with_fallback(lambda dialect: _build_from_file(path, filename, budget, store, dataset_id,
+                                                                   dialect.read_kwargs(), dict(kwargs)),
+                                  sniff_dialect(path, dataset_id), path, dataset_id)
+    return _build_from_file(path, filename, budget, store, dataset_id, {}, kwargs, sheets)
+
+
+def _build_from_file(path, filename, budget, store, dataset_id, read_kwargs, kwargs, sheets=None):
+    """generate_dashboard_from_file past the store lookup; read_kwargs parse a CSV (empty otherwise)."""
+    is_csv = filename.lower().endswith(".csv")
+    stack_sheets = sheets is not None and filename.lower().endswith(EXCEL_SUFFIXES)
+    sheet_list = parse_sheets(sheets) if stack_sheets else None
+    if is_csv and not fits_in_memory(os.path.getsize(path), budget):
+        chunk_rows = chunk_rows_for_budget(path, budget, **read_kwargs)
+        print(f"📦 {filename} exceeds the memory budget — processing in chunks of {chunk_rows:,} rows")
+        with open(path, "rb") as f:
+            return generate_dashboard_chunked(iter_csv_chunks(f, chunk_rows=chunk_rows, **read_kwargs), **kwargs)
+    if filename.lower().endswith(".xlsx") and not fits_in_memory(os.path.getsize(path) * XLSX_EXPANSION, budget):
+        print(f"📦 {filename} exceeds the memory budget — streaming its rows in chunks")
+        if stack_sheets:
+            return generate_dashboard_chunked(iter_sheets_chunks(path, sheet_list), **kwargs)
+        return generate_dashboard_chunked(iter_sheet_chunks(path), **kwargs)
+    if not fits_in_memory(os.path.getsize(path), budget):
+        with open(path, "rb") as f:
+            if is_json_lines_upload(f, filename):
+                print(f"📦 {filename} exceeds the memory budget — streaming its records in chunks")
+                # The chunked pass fixes its columns on the first chunk
+                records = iter_json_lines_chunks(f, stabilizer=SchemaStabilizer(freeze_columns=True))
+                return generate_dashboard_chunked(records, **kwargs)
+    plan = plan_projection(path, pick_columns, **read_kwargs) if is_csv else None
+    if plan is not None and plan.dropped and plan.needed:
+        print(f"✂️ Parsing {len(plan.needed)} of {len(plan.columns)} columns of {filename}")
+        cleaning = {**DEFAULT_CLEANING, **(kwargs.get("cleaning") or {})}
+        kwargs["projection"] = RestProfile(plan)
+        df = read_projected(path, plan, cleaning, profile=kwargs["projection"], **read_kwargs)
+        store, kwargs["total_columns"] = None, len(plan.columns)
+    elif stack_sheets:
+        print(f"📑 Parsing {'all sheets' if sheet_list is None else ', '.join(sheet_list)} of {filename}")
+        df = read_sheets(path, sheet_list)
+    else:
+        with open(path, "rb") as f:
+            df = read_upload(f, filename, **read_kwargs)
+    df, report = compact_dtypes(df)
+    print(f"🗜️ Compacted {len(report)} columns, saving {bytes_saved(report) / 1e6:.1f} MB")
+    if kwargs.get("artifacts") is not None:
+        kwargs["artifacts"]["compaction"] = report
+    if store is not None:
+        store.put(dataset_id, df)
+    return generate_dashboard(df, **kwargs)
 
 
 if __name__ == "__main__":
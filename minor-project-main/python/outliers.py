@@ -0,0 +1,197 @@
+# outliers.py
+"""
+Batched outlier detection over many numeric columns:
+- methods: IQR fences, z-score and MAD (modified z-score)
+- all quartiles / medians / moments come from one vectorized call across columns
+- results are per-column boolean masks or row positions, never filtered copies
+  of the frame
+- a two-pass streaming variant for files read in chunks: pass one feeds
+  sketches (approximate quartiles / MAD, exact mean and std), pass two flags rows
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+from sketches import KLLSketch, MomentsSketch
+
+OUTLIER_METHODS = ("iqr", "zscore", "mad")
+DEFAULT_THRESHOLDS = {"iqr": 1.5, "zscore": 3.0, "mad": 3.5}
+# Modified z-score: 0.6745 * (x - median) / MAD (Iglewicz and Hoaglin)
+MAD_CONSISTENCY = 0.6745
+
+
+def _check(method: str, threshold: Optional[float]) -> float:
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"method must be one of {OUTLIER_METHODS}")
+    return DEFAULT_THRESHOLDS[method] if threshold is None else float(threshold)
+
+
+def fences(stats: pd.DataFrame, method: str = "iqr", threshold: Optional[float] = None) -> pd.DataFrame:
+    """
+    Lower / upper bounds per column from its statistics (one row per column):
+    q1, q3 for IQR; mean, std for z-score; median, mad for MAD.
+    """
+    threshold = _check(method, threshold)
+    if method == "iqr":
+        spread = threshold * (stats["q3"] - stats["q1"])
+        lower, upper = stats["q1"] - spread, stats["q3"] + spread
+    elif method == "zscore":
+        spread = threshold * stats["std"]
+        lower, upper = stats["mean"] - spread, stats["mean"] + spread
+    else:
+        spread = threshold * stats["mad"] / MAD_CONSISTENCY
+        lower, upper = stats["median"] - spread, stats["median"] + spread
+    return pd.DataFrame({"lower": lower, "upper": upper})
+
+
+def column_stats(data: pd.DataFrame, method: str = "iqr") -> pd.DataFrame:
+    """The statistics fences() needs for every column of data, in batched reductions."""
+    _check(method, None)
+    if method == "iqr":
+        q = data.quantile([0.25, 0.75])
+        return pd.DataFrame({"q1": q.iloc[0], "q3": q.iloc[1]})
+    if method == "zscore":
+        return pd.DataFrame({"mean": data.mean(), "std": data.std()})
+    median = data.median()
+    return pd.DataFrame({"median": median, "mad": (data - median).abs().median()})
+
+
+class OutlierResult:
+    """
+    Outliers per column: either a boolean mask over the rows (masks) or the
+    row positions of the flagged values (indices), plus the bounds used.
+    """
+
+    def __init__(self, method: str, bounds: pd.DataFrame, n_rows: int,
+                 masks: Optional[Dict[Any, np.ndarray]] = None,
+                 indices: Optional[Dict[Any, np.ndarray]] = None):
+        self.method = method
+        self.bounds = bounds
+        self.n_rows = n_rows
+        self.masks = masks
+        self.indices = indices if indices is not None else \
+            {col: np.flatnonzero(mask) for col, mask in (masks or {}).items()}
+
+    def counts(self) -> Dict[Any, int]:
+        return {col: int(len(idx)) for col, idx in self.indices.items()}
+
+    def any_mask(self) -> np.ndarray:
+        """Rows flagged in at least one column."""
+        flagged = np.zeros(self.n_rows, dtype=bool)
+        for idx in self.indices.values():
+            flagged[idx] = True
+        return flagged
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "rows": self.n_rows,
+            "counts": self.counts(),
+            "bounds": {col: {"lower": float(b["lower"]), "upper": float(b["upper"])}
+                       for col, b in self.bounds.iterrows()},
+        }
+
+
+def _flag(values: np.ndarray, lower: float, upper: float) -> np.ndarray:
+    # NaN compares False on both sides, so missing values are never outliers
+    return (values < lower) | (values > upper)
+
+
+def find_outliers(df: pd.DataFrame, columns: Optional[Sequence[Any]] = None, method: str = "iqr",
+                  threshold: Optional[float] = None, as_indices: bool = False) -> OutlierResult:
+    """
+    Flag outliers in every column of columns (all numeric columns when None).
+    The statistics come from one batched call; each column is then compared
+    against its bounds without copying the frame.
+    """
+    if columns is None:
+        columns = [c for c in df.columns
+                   if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+    data = df[list(columns)]
+    bounds = fences(column_stats(data, method), method, threshold)
+    flags = {}
+    for col in bounds.index:
+        mask = _flag(data[col].to_numpy(dtype="float64", na_value=np.nan),
+                     bounds.at[col, "lower"], bounds.at[col, "upper"])
+        flags[col] = np.flatnonzero(mask) if as_indices else mask
+    if as_indices:
+        return OutlierResult(method, bounds, len(df), indices=flags)
+    return OutlierResult(method, bounds, len(df), masks=flags)
+
+
+class StreamingOutlierDetector:
+    """
+    Two-pass outlier detection over chunks. fit() feeds every chunk into a
+    KLLSketch (quartiles, median and MAD, approximate: see sketches.ERROR_BOUNDS)
+    and a MomentsSketch (mean / std, exact) per column; flag() then returns the
+    global row positions of outliers per chunk. MAD is the weighted median of
+    |item - median| over the sketch's retained items.
+    """
+
+    def __init__(self, columns: Sequence[Any], method: str = "iqr", threshold: Optional[float] = None):
+        self.threshold = _check(method, threshold)
+        self.method = method
+        self.columns = list(columns)
+        self.quantiles = {col: KLLSketch() for col in self.columns}
+        self.moments = {col: MomentsSketch() for col in self.columns}
+        self.n_rows = 0
+        self._bounds: Optional[pd.DataFrame] = None
+
+    def fit(self, chunk: pd.DataFrame) -> "StreamingOutlierDetector":
+        for col in self.columns:
+            values = chunk[col].to_numpy(dtype="float64", na_value=np.nan)
+            if self.method == "zscore":
+                self.moments[col].update(values)
+            else:
+                self.quantiles[col].update(values)
+        self.n_rows += len(chunk)
+        self._bounds = None
+        return self
+
+    @staticmethod
+    def _mad(sketch: KLLSketch, median: float) -> float:
+        items, weights = sketch.weighted_items()
+        dev = np.abs(items - median)
+        order = np.argsort(dev, kind="stable")
+        cum = np.cumsum(weights[order])
+        return float(dev[order][np.searchsorted(cum, 0.5 * cum[-1])])
+
+    def stats(self) -> pd.DataFrame:
+        rows = {}
+        for col in self.columns:
+            if self.method == "zscore":
+                m = self.moments[col]
+                rows[col] = {"mean": m.mean if m.count else np.nan, "std": m.std}
+                continue
+            sketch = self.quantiles[col]
+            q1, median, q3 = (np.nan if v is None else v for v in sketch.quantiles([0.25, 0.5, 0.75]))
+            rows[col] = {"q1": q1, "q3": q3, "median": median,
+                         "mad": self._mad(sketch, median) if sketch.n else np.nan}
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+    def bounds(self) -> pd.DataFrame:
+        if self._bounds is None:
+            self._bounds = fences(self.stats(), self.method, self.threshold)
+        return self._bounds
+
+    def flag(self, chunk: pd.DataFrame, offset: int = 0) -> Dict[Any, np.ndarray]:
+        """Row positions (offset + position in chunk) of each column's outliers in chunk."""
+        bounds = self.bounds()
+        return {col: offset + np.flatnonzero(_flag(chunk[col].to_numpy(dtype="float64", na_value=np.nan),
+                                                   bounds.at[col, "lower"], bounds.at[col, "upper"]))
+                for col in self.columns}
+
+    def detect(self, chunks: Callable[[], Iterable[pd.DataFrame]]) -> OutlierResult:
+        """Run both passes; chunks is called once per pass and must yield the same chunks."""
+        for chunk in chunks():
+            self.fit(chunk)
+        found: Dict[Any, List[np.ndarray]] = {col: [] for col in self.columns}
+        offset = 0
+        for chunk in chunks():
+            for col, idx in self.flag(chunk, offset).items():
+                found[col].append(idx)
+            offset += len(chunk)
+        indices = {col: np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+                   for col, parts in found.items()}
+        return OutlierResult(self.method, self.bounds(), self.n_rows, indices=indices)
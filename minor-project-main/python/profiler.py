@@ -0,0 +1,102 @@
+# profiler.py
+"""
+Vectorized column profiler used by data_processor.compute_summary:
+- numeric statistics (mean/median/min/max/std) for all numeric columns at once,
+  computed over blocks of the underlying float64 NumPy array
+- missing-value and cardinality counts in batch over the whole frame
+- top-k levels of every non-numeric column from the same value_counts pass
+  that yields its cardinality, so insights never rescan the rows
+- sample values taken from a small prefix instead of stringifying whole columns
+"""
+
+from typing import Any, Dict, List, Tuple
+import warnings
+import numpy as np
+import pandas as pd
+
+# Numeric columns converted to one float64 block at a time; bounds the temporary copy
+BLOCK_COLUMNS = 64
+N_SAMPLE_VALUES = 5
+# Levels kept per non-numeric column (matches sketches.TopK's default k)
+TOP_VALUES = 10
+
+
+def numeric_stats(df: pd.DataFrame, numeric_cols: List[str], block_columns: int = BLOCK_COLUMNS) -> Dict[str, Dict[str, Any]]:
+    """Return {col: {mean, median, min, max, std}} computed column-block-wise with NumPy."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for start in range(0, len(numeric_cols), block_columns):
+        cols = numeric_cols[start:start + block_columns]
+        block = df[cols].to_numpy(dtype="float64", na_value=np.nan)
+        with warnings.catch_warnings(), np.errstate(all="ignore"):
+            # all-NaN columns legitimately produce NaN (reported as None below)
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            counts = np.count_nonzero(~np.isnan(block), axis=0)
+            means = np.nanmean(block, axis=0)
+            medians = np.nanmedian(block, axis=0)
+            mins = np.nanmin(block, axis=0)
+            maxs = np.nanmax(block, axis=0)
+            stds = np.nanstd(block, axis=0, ddof=1)
+        for i, col in enumerate(cols):
+            if counts[i] == 0:
+                stats[col] = {"mean": None, "median": None, "min": None, "max": None, "std": None}
+                continue
+            stats[col] = {
+                "mean": float(means[i]),
+                "median": float(medians[i]),
+                "min": float(mins[i]),
+                "max": float(maxs[i]),
+                # a single observation has undefined sample std, as in pandas
+                "std": float(stds[i]),
+            }
+    return stats
+
+
+def sample_values(ser: pd.Series, n: int = N_SAMPLE_VALUES) -> List[str]:
+    """First n distinct non-null values as strings, scanning only as much of the column as needed."""
+    window = 64
+    total = len(ser)
+    while True:
+        head = ser.iloc[:window].dropna()
+        uniques = pd.unique(head.astype(str))
+        if len(uniques) >= n or window >= total:
+            return uniques[:n].tolist()
+        window *= 8
+
+
+def top_values(ser: pd.Series, k: int = TOP_VALUES) -> Tuple[int, List[Tuple[Any, int]]]:
+    """(n_unique, [(value, count)] of the k most frequent non-null values) from one counting pass."""
+    counts = ser.value_counts(sort=False, dropna=True)
+    top = counts.nlargest(k)
+    return len(counts), list(zip(top.index.tolist(), top.astype("int64").tolist()))
+
+
+def profile_columns(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-column profile with the compute_summary shape (minus inferred_type):
+    dtype, n_missing, n_unique, sample_values and, for numeric columns,
+    mean/median/min/max/std, for the others top_values ([(value, count)]).
+    """
+    n_missing = df.isna().sum()
+    numeric_cols = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    n_unique = df[numeric_cols].nunique(dropna=True)
+    num_stats = numeric_stats(df, numeric_cols)
+
+    profile: Dict[str, Dict[str, Any]] = {}
+    for col in df.columns:
+        ser = df[col]
+        if col in num_stats:
+            unique, top = int(n_unique[col]), None
+        else:
+            unique, top = top_values(ser)
+        info = {
+            "dtype": str(ser.dtype),
+            "n_missing": int(n_missing[col]),
+            "n_unique": unique,
+            "sample_values": sample_values(ser),
+        }
+        if col in num_stats:
+            info.update(num_stats[col])
+        else:
+            info["top_values"] = top
+        profile[col] = info
+    return profile
@@ -0,0 +1,156 @@
+# projection.py
+"""
+Projection pushdown for CSV uploads:
+- read the header plus a sample and decide which columns the dashboard uses
+  (every numeric column, cube dimensions, the time column and chart columns)
+- parse only those columns (usecols) when cleaning does not need the rest
+- otherwise reduce the other columns chunk by chunk to two helper columns, so
+  drop_duplicates / dropna on the projected frame keep their full-row meaning
+- the dropped columns stay in the summary metadata (RestProfile): dtype, type and
+  samples from the planning sample, plus missing counts and distinct estimates
+  whenever they are parsed for cleaning anyway
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from cube import pick_dimensions
+from dedupe import row_hashes
+from ingestion import DEFAULT_CHUNK_ROWS, iter_csv_chunks
+from profiler import sample_values
+from schema import SAMPLE_ROWS, infer_schema, apply_schema
+from sketches import HyperLogLog
+
+# 64-bit hash of the unprojected values (keeps duplicate detection full-row)
+REST_HASH = "__rest_hash__"
+# NaN where any unprojected value is missing, else 0.0 (keeps dropna full-row)
+REST_NULL = "__rest_null__"
+HELPER_COLUMNS = (REST_HASH, REST_NULL)
+
+
+class ProjectionPlan:
+    """
+    The file's columns and the subset the dashboard needs, in file order.
+    sample_info describes the dropped columns as seen in the planning sample
+    (dtype, inferred_type, sample_values).
+    """
+
+    def __init__(self, columns: List[str], needed: List[str],
+                 sample_info: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.columns = columns
+        self.needed = needed
+        self.sample_info = sample_info or {}
+
+    @property
+    def dropped(self) -> List[str]:
+        needed = set(self.needed)
+        return [c for c in self.columns if c not in needed]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"columns": len(self.columns), "needed": self.needed, "dropped": self.dropped}
+
+
+def plan_projection(path: str, column_picker: Callable, sample_rows: int = SAMPLE_ROWS,
+                    **read_kwargs) -> ProjectionPlan:
+    """
+    Plan from the first sample_rows rows. column_picker is main.pick_columns
+    (passed in to avoid a circular import).
+    """
+    sample = pd.read_csv(path, nrows=sample_rows, **read_kwargs)
+    schema = infer_schema(sample)
+    sample = apply_schema(sample, schema)
+    numeric_cols, categorical_cols, time_col, stacked_cols, pie_col, val_col, hist_col = column_picker(sample, schema)
+    # Columns with more than MAX_DIMENSION_LEVELS levels in the sample have at least as many in the file
+    wanted = set(numeric_cols) | set(pick_dimensions(sample, categorical_cols))
+    wanted |= {c for c in (time_col, pie_col, val_col, hist_col, *stacked_cols) if c}
+    types = schema.types()
+    sample_info = {c: {"dtype": str(sample[c].dtype), "inferred_type": types.get(c, "unknown"),
+                       "sample_values": sample_values(sample[c])}
+                   for c in sample.columns if c not in wanted}
+    return ProjectionPlan(list(sample.columns), [c for c in sample.columns if c in wanted], sample_info)
+
+
+class RestProfile:
+    """
+    Light profile of the columns a projection drops, so the summary still lists
+    every column of the file. Missing counts (exact) and distinct counts
+    (HyperLogLog) are only known when the columns were parsed, i.e. when
+    cleaning needed them; they describe the rows as read, before deduplication.
+    """
+
+    def __init__(self, plan: ProjectionPlan):
+        self.plan = plan
+        self.parsed = False
+        self.n_missing = {c: 0 for c in plan.dropped}
+        self.distinct = {c: HyperLogLog() for c in plan.dropped}
+
+    def update(self, rest: pd.DataFrame) -> "RestProfile":
+        self.parsed = True
+        missing = rest.isna().sum()
+        for col in rest.columns:
+            self.n_missing[col] += int(missing[col])
+            self.distinct[col].update(rest[col])
+        return self
+
+    def column_summary(self, col: str, cleaning: Dict[str, Any]) -> Dict[str, Any]:
+        info = dict(self.plan.sample_info.get(col, {"dtype": "unknown", "inferred_type": "unknown",
+                                                    "sample_values": []}))
+        sample = info.pop("sample_values")
+        if not self.parsed:
+            n_missing, n_unique = None, None
+        else:
+            # dropna keeps only rows complete in every column
+            n_missing = 0 if cleaning.get("missing") == "drop" else self.n_missing[col]
+            n_unique = self.distinct[col].estimate()
+        info.update({"n_missing": n_missing, "n_unique": n_unique, "sample_values": sample,
+                     "projected_out": True})
+        return info
+
+    def complete(self, summary: Dict[str, Any], cleaning: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the dropped columns to a compute_summary dict, in file order."""
+        profiled = summary["columns"]
+        summary["columns"] = {c: profiled[c] if c in profiled else self.column_summary(c, cleaning)
+                              for c in self.plan.columns}
+        summary["dataset_info"]["columns"] = list(self.plan.columns)
+        summary["dataset_info"]["n_columns"] = len(self.plan.columns)
+        return summary
+
+
+def project_chunk(chunk: pd.DataFrame, plan: ProjectionPlan, cleaning: Dict[str, Any],
+                  profile: Optional[RestProfile] = None) -> pd.DataFrame:
+    """The needed columns of chunk plus the helper columns cleaning requires."""
+    out = chunk[plan.needed].copy()
+    rest = chunk[plan.dropped]
+    if profile is not None:
+        profile.update(rest)
+    if cleaning.get("drop_duplicates"):
+        out[REST_HASH] = row_hashes(rest)
+    if cleaning.get("missing") == "drop":
+        out[REST_NULL] = np.where(rest.isna().any(axis=1).to_numpy(), np.nan, 0.0)
+    return out
+
+
+def read_projected(path: str, plan: ProjectionPlan, cleaning: Dict[str, Any],
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS, profile: Optional[RestProfile] = None,
+                   **read_kwargs) -> pd.DataFrame:
+    """
+    Parse path keeping only plan.needed. Without duplicate or missing-value
+    cleaning the other columns are never converted (usecols); with it they are
+    folded into HELPER_COLUMNS chunk by chunk (and fed to profile, if given).
+    Remove the helpers with strip_helpers once cleaning is done.
+    """
+    if not (cleaning.get("drop_duplicates") or cleaning.get("missing") == "drop"):
+        return pd.read_csv(path, usecols=plan.needed, **read_kwargs)
+    with open(path, "rb") as f:
+        parts = [project_chunk(chunk, plan, cleaning, profile)
+                 for chunk in iter_csv_chunks(f, chunk_rows=chunk_rows, **read_kwargs)]
+    if len(parts) == 1:
+        return parts[0]
+    return pd.concat(parts, ignore_index=True)
+
+
+def strip_helpers(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop the projection helper columns, if any."""
+    present = [c for c in HELPER_COLUMNS if c in df.columns]
+    return df.drop(columns=present) if present else df
@@ -0,0 +1,417 @@
+# query_index.py
+"""
+Resident columnar indexes for interactive drill-down queries:
+- dimension columns are dictionary-encoded (intp codes + sorted levels)
+- per-level bitmaps (packed bits) are built on first use and kept, so a repeat
+  filter on the same value is a bitwise AND over n / 8 bytes
+- the time column is indexed by sort order: a date range is two searchsorted calls
+- time-bucket codes are computed once per bucket unit and kept, like the bitmaps
+- measures are float64 arrays; filter + group-by + aggregate answers are JSON
+- recently used indexes stay resident in an LRU registry keyed by dataset
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import json
+import os
+import threading
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+from schema import infer_schema, apply_schema, NUMERIC, CATEGORICAL, DATETIME, TEXT
+
+# Text / categorical columns with more distinct values than this are not dimensions
+MAX_QUERY_LEVELS = int(os.getenv("DASHBOARD_QUERY_MAX_LEVELS", "10000"))
+# Packed bitmaps kept per index (each costs n_rows / 8 bytes)
+MAX_BITMAPS = int(os.getenv("DASHBOARD_QUERY_MAX_BITMAPS", "512"))
+QUERY_MAX_DATASETS = int(os.getenv("DASHBOARD_QUERY_DATASETS", "4"))
+QUERY_AGGREGATIONS = ("count", "sum", "mean", "min", "max")
+TIME_BUCKETS = {"hour": "h", "day": "D", "week": "W", "month": "M", "year": "Y"}
+DEFAULT_LIMIT = 1000
+# Group-by codes up to this many combinations are counted densely (bincount) instead of via np.unique
+DENSE_GROUPS = 1_000_000
+# Answers kept per index for repeated queries
+RESULT_CACHE_SIZE = 64
+_NAT = np.iinfo(np.int64).min
+_DAY_NS = 86_400 * 10 ** 9
+
+
+class QueryError(ValueError):
+    """A query that refers to unknown columns or options."""
+
+
+class Dimension:
+    """One dictionary-encoded column: codes[i] indexes levels (-1 = missing)."""
+
+    def __init__(self, ser: pd.Series):
+        codes, levels = pd.factorize(ser, sort=True)
+        # intp, so bincount / take use the codes without a conversion copy
+        self.codes = codes.astype(np.intp)
+        self.levels: List[Any] = list(levels)
+        self.has_missing = bool((self.codes < 0).any())
+        self.lookup = {_json_value(v): i for i, v in enumerate(self.levels)}
+
+    def level_codes(self, values) -> List[int]:
+        values = values if isinstance(values, (list, tuple)) else [values]
+        return [self.lookup[v] for v in values if v in self.lookup]
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _timestamp_ns(value: Any) -> int:
+    return pd.Timestamp(value).as_unit("ns").value
+
+
+class DatasetIndex:
+    """Columnar, filterable copy of one cleaned dataset."""
+
+    def __init__(self, n_rows: int, dimensions: Dict[str, Dimension], measures: Dict[str, np.ndarray],
+                 time_col: Optional[str] = None, times: Optional[np.ndarray] = None):
+        self.n_rows = n_rows
+        self.dimensions = dimensions
+        self.measures = measures
+        self.time_col = time_col
+        self.times = times
+        self.has_nan = {col: bool(np.isnan(values).any()) for col, values in measures.items()}
+        self.bitmaps: "OrderedDict[Tuple[str, int], np.ndarray]" = OrderedDict()
+        self.buckets: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if times is not None:
+            self.time_order = np.argsort(times, kind="stable")
+            self.sorted_times = times[self.time_order]
+            # NaT (int64 min) sorts first; skip it in every range
+            self.first_valid = int(np.searchsorted(self.sorted_times, _NAT, side="right"))
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, time_col: Optional[str] = None,
+              max_levels: int = MAX_QUERY_LEVELS) -> "DatasetIndex":
+        """Encode df's columns; time_col defaults to the first datetime column."""
+        schema = infer_schema(df)
+        df = apply_schema(df, schema)
+        kinds = schema.types()
+        if time_col is None or time_col not in df.columns:
+            time_col = next((c for c, k in kinds.items() if k == DATETIME), None)
+        dimensions, measures = {}, {}
+        for col, kind in kinds.items():
+            if kind == NUMERIC:
+                measures[col] = df[col].to_numpy(dtype="float64", na_value=np.nan)
+            elif kind in (CATEGORICAL, TEXT) and df[col].nunique() <= max_levels:
+                dimensions[col] = Dimension(df[col])
+        times = None
+        if time_col is not None:
+            times = pd.to_datetime(df[time_col], errors="coerce").to_numpy(dtype="datetime64[ns]").view(np.int64)
+        return cls(len(df), dimensions, measures, time_col, times)
+
+    # --------------------------
+    # Filtering
+    # --------------------------
+    def _bitmap(self, col: str, code: int) -> np.ndarray:
+        key = (col, code)
+        with self._lock:
+            bits = self.bitmaps.get(key)
+            if bits is not None:
+                self.bitmaps.move_to_end(key)
+                return bits
+        bits = np.packbits(self.dimensions[col].codes == code)
+        with self._lock:
+            self.bitmaps[key] = bits
+            while len(self.bitmaps) > MAX_BITMAPS:
+                self.bitmaps.popitem(last=False)
+        return bits
+
+    def _time_rows(self, spec: Dict[str, Any]) -> np.ndarray:
+        if self.times is None:
+            raise QueryError("Dataset has no time column")
+        lo, hi = self.first_valid, len(self.sorted_times)
+        if hi == lo:
+            return np.empty(0, dtype=np.int64)
+        end = _timestamp_ns(spec["end"]) if spec.get("end") else int(self.sorted_times[-1])
+        start = _timestamp_ns(spec["start"]) if spec.get("start") else None
+        if spec.get("last_days") is not None:
+            start = max(start or _NAT, end - int(float(spec["last_days"]) * _DAY_NS))
+        if start is not None:
+            lo = max(lo, int(np.searchsorted(self.sorted_times, start, side="left")))
+        hi = int(np.searchsorted(self.sorted_times, end, side="right"))
+        return self.time_order[lo:hi]
+
+    def filter_bits(self, query: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Packed row mask for the query's filters (None = every row)."""
+        bits = None
+
+        def combine(new):
+            nonlocal bits
+            bits = new if bits is None else bits & new
+
+        for col, values in (query.get("filters") or {}).items():
+            if col not in self.dimensions:
+                raise QueryError(f"Unknown dimension: {col}")
+            codes = self.dimensions[col].level_codes(values)
+            level_bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+            for code in codes:
+                level_bits |= self._bitmap(col, code)
+            combine(level_bits)
+        for col, (low, high) in (query.get("ranges") or {}).items():
+            if col not in self.measures:
+                raise QueryError(f"Unknown measure: {col}")
+            values = self.measures[col]
+            mask = ~np.isnan(values)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+            combine(np.packbits(mask))
+        if query.get("time"):
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[self._time_rows(query["time"])] = True
+            combine(np.packbits(mask))
+        return bits
+
+    def matching_rows(self, query: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Row positions matching the query's filters (None = every row)."""
+        bits = self.filter_bits(query)
+        if bits is None:
+            return None
+        return np.flatnonzero(np.unpackbits(bits, count=self.n_rows))
+
+    # --------------------------
+    # Aggregation
+    # --------------------------
+    def _bucket_codes(self, rows: Optional[np.ndarray], bucket: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (codes, bucket start timestamps) of each selected row's time bucket (-1 = NaT).
+        Labels cover the dataset's whole time range; only observed buckets are answered.
+        """
+        if self.times is None:
+            raise QueryError("Dataset has no time column")
+        if bucket not in TIME_BUCKETS:
+            raise QueryError(f"time_bucket must be one of {list(TIME_BUCKETS)}")
+        unit = TIME_BUCKETS[bucket]
+        with self._lock:
+            cached = self.buckets.get(unit)
+        if cached is None:
+            cached = self._encode_buckets(unit)
+            with self._lock:
+                self.buckets[unit] = cached
+        codes, labels = cached
+        return (codes if rows is None else codes[rows]), labels
+
+    def _encode_buckets(self, unit: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Bucket codes of every row for one numpy datetime unit (W = Monday-based weeks)."""
+        times = self.times
+        valid = times != _NAT
+        if unit == "W":
+            # Weeks start on Monday; 1970-01-01 was a Thursday
+            days = np.floor_divide(times, _DAY_NS)
+            starts = ((days + 3) // 7 * 7 - 3).astype("datetime64[D]")
+        else:
+            starts = times.view("datetime64[ns]").astype(f"datetime64[{unit}]")
+        raw = starts.astype(np.int64)
+        base = raw[valid].min() if valid.any() else 0
+        codes = np.where(valid, raw - base, -1).astype(np.intp)
+        labels = (np.arange(codes.max(initial=-1) + 1) + base).astype(starts.dtype)
+        return codes, labels
+
+    def aggregate(self, query: Dict[str, Any], rows: Optional[np.ndarray]) -> Tuple[List[Dict[str, Any]], int]:
+        group_by = list(query.get("group_by") or [])
+        metrics: Dict[str, Sequence[str]] = query.get("metrics") or {}
+        for col, aggs in metrics.items():
+            if col not in self.measures:
+                raise QueryError(f"Unknown measure: {col}")
+            bad = [a for a in aggs if a not in QUERY_AGGREGATIONS]
+            if bad:
+                raise QueryError(f"Unsupported aggregation(s) {bad}: use {list(QUERY_AGGREGATIONS)}")
+        n = self.n_rows if rows is None else len(rows)
+        keys: List[Tuple[str, List[Any]]] = []
+        key_codes: List[np.ndarray] = []
+        for col in group_by:
+            if col not in self.dimensions:
+                raise QueryError(f"Unknown dimension: {col}")
+            dim = self.dimensions[col]
+            keys.append((col, dim.levels))
+            key_codes.append(dim.codes if rows is None else dim.codes[rows])
+        if query.get("time_bucket"):
+            codes, labels = self._bucket_codes(rows, query["time_bucket"])
+            keys.append((self.time_col, [pd.Timestamp(t).isoformat() for t in labels]))
+            key_codes.append(codes)
+        # Rows with a missing key are left out (only checked when some key has them)
+        missing = [codes < 0 for codes in key_codes if (codes < 0).any()]
+        valid = ~np.logical_or.reduce(missing) if missing else None
+        if not key_codes:
+            return self._totals(metrics, rows), 1
+        if len(key_codes) == 1:
+            combined = key_codes[0]
+        else:
+            # Mixed-radix combination of the dimension (and time bucket) codes
+            combined = np.zeros(n, dtype=np.int64)
+            for codes, (_, levels) in zip(key_codes, keys):
+                combined = combined * max(len(levels), 1) + np.maximum(codes, 0)
+        if valid is not None:
+            combined = combined[valid]
+        n_combined = int(np.prod([max(len(levels), 1) for _, levels in keys]))
+        if n_combined <= DENSE_GROUPS:
+            group_codes, group_ids = combined, None
+            n_groups = n_combined
+        else:
+            group_ids, group_codes = np.unique(combined, return_inverse=True)
+            n_groups = len(group_ids)
+        count = np.bincount(group_codes, minlength=n_groups)
+        columns: Dict[str, np.ndarray] = {"count": count}
+        for col, aggs in metrics.items():
+            values = self.measures[col] if rows is None else self.measures[col][rows]
+            if valid is not None:
+                values = values[valid]
+            codes, value_count = group_codes, count
+            if self.has_nan[col]:
+                present = ~np.isnan(values)
+                codes, values = group_codes[present], values[present]
+                value_count = np.bincount(codes, minlength=n_groups)
+            total = np.bincount(codes, weights=values, minlength=n_groups)
+            for agg in aggs:
+                if agg == "count":
+                    columns[f"{col}_count"] = value_count
+                elif agg == "sum":
+                    columns[f"{col}_sum"] = total
+                elif agg == "mean":
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        columns[f"{col}_mean"] = total / value_count
+                else:
+                    out = np.full(n_groups, np.inf if agg == "min" else -np.inf)
+                    (np.minimum if agg == "min" else np.maximum).at(out, codes, values)
+                    columns[f"{col}_{agg}"] = np.where(np.isinf(out), np.nan, out)
+        # Only groups with rows (observed combinations)
+        present_groups = np.flatnonzero(count)
+        ids = present_groups if group_ids is None else group_ids[present_groups]
+        order_by = query.get("order_by") or "count"
+        if order_by not in columns:
+            raise QueryError(f"order_by must be one of {list(columns)}")
+        sort_values = np.nan_to_num(columns[order_by][present_groups], nan=-np.inf)
+        order = np.argsort(-sort_values if query.get("descending", True) else sort_values, kind="stable")
+        limit = int(query.get("limit") or DEFAULT_LIMIT)
+        picked = order[:limit]
+        out_rows = []
+        for g in picked:
+            code, decoded = int(ids[g]), []
+            # Decode the mixed-radix group id, last key first
+            for col, levels in reversed(keys):
+                radix = max(len(levels), 1)
+                decoded.append((col, _json_value(levels[code % radix]) if levels else None))
+                code //= radix
+            row: Dict[str, Any] = dict(reversed(decoded))
+            for name, values in columns.items():
+                value = values[present_groups[g]]
+                row[name] = None if pd.isna(value) else _json_value(value)
+            out_rows.append(row)
+        return out_rows, len(present_groups)
+
+    def _totals(self, metrics: Dict[str, Sequence[str]], rows: Optional[np.ndarray]) -> List[Dict[str, Any]]:
+        """The single ungrouped answer row, from plain reductions."""
+        row: Dict[str, Any] = {"count": self.n_rows if rows is None else int(len(rows))}
+        reducers = {"count": lambda v: int(np.count_nonzero(~np.isnan(v))), "sum": np.nansum,
+                    "mean": np.nanmean, "min": np.nanmin, "max": np.nanmax}
+        with warnings.catch_warnings():
+            # Empty selections and all-NaN measures answer None
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            for col, aggs in metrics.items():
+                values = self.measures[col] if rows is None else self.measures[col][rows]
+                for agg in aggs:
+                    value = reducers[agg](values) if len(values) or agg in ("count", "sum") else np.nan
+                    row[f"{col}_{agg}"] = None if pd.isna(value) else _json_value(value)
+        return [row]
+
+    def query(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answer one filter + aggregate request:
+        {"filters": {dim: value or [values]}, "ranges": {measure: [min, max]},
+         "time": {"start", "end", "last_days"}, "group_by": [dims],
+         "time_bucket": "hour" | "day" | "week" | "month" | "year",
+         "metrics": {measure: ["sum", "mean", ...]}, "order_by", "descending", "limit"}
+        """
+        started = time.perf_counter()
+        key = json.dumps(query, sort_keys=True, default=str)
+        with self._lock:
+            answer = self.results.get(key)
+            if answer is not None:
+                self.results.move_to_end(key)
+        if answer is None:
+            rows = self.matching_rows(query)
+            groups, n_groups = self.aggregate(query, rows)
+            answer = {
+                "rows_matched": self.n_rows if rows is None else int(len(rows)),
+                "total_rows": self.n_rows,
+                "n_groups": n_groups,
+                "groups": groups,
+            }
+            with self._lock:
+                self.results[key] = answer
+                while len(self.results) > RESULT_CACHE_SIZE:
+                    self.results.popitem(last=False)
+        return {**answer, "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    def fields(self, max_levels: int = 100) -> Dict[str, Any]:
+        """Queryable columns: dimensions (with up to max_levels levels), measures and the time range."""
+        time_range = None
+        if self.times is not None and self.first_valid < len(self.sorted_times):
+            time_range = [pd.Timestamp(int(self.sorted_times[self.first_valid])).isoformat(),
+                          pd.Timestamp(int(self.sorted_times[-1])).isoformat()]
+        return {
+            "rows": self.n_rows,
+            "dimensions": {c: {"levels": [_json_value(v) for v in d.levels[:max_levels]], "n_levels": len(d.levels)}
+                           for c, d in self.dimensions.items()},
+            "measures": list(self.measures),
+            "time_col": self.time_col,
+            "time_range": time_range,
+            "aggregations": list(QUERY_AGGREGATIONS),
+            "time_buckets": list(TIME_BUCKETS),
+        }
+
+
+class IndexRegistry:
+    """
+    LRU of resident DatasetIndex objects; each is built once per key, on first use.
+    Builds run outside the registry lock, so queries against resident indexes
+    never wait for another dataset's build; concurrent first queries for the
+    same key wait on that key's pending build.
+    """
+
+    def __init__(self, max_datasets: int = QUERY_MAX_DATASETS):
+        self.max_datasets = max_datasets
+        self.indexes: "OrderedDict[Any, DatasetIndex]" = OrderedDict()
+        self.pending: Dict[Any, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, build: Callable[[], DatasetIndex]) -> DatasetIndex:
+        with self._lock:
+            index = self.indexes.get(key)
+            if index is not None:
+                self.indexes.move_to_end(key)
+                return index
+            pending = self.pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self.pending[key] = Future()
+        if not owner:
+            return pending.result()
+        try:
+            index = build()
+        except BaseException as e:
+            with self._lock:
+                del self.pending[key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            del self.pending[key]
+            self.indexes[key] = index
+            while len(self.indexes) > self.max_datasets:
+                self.indexes.popitem(last=False)
+        pending.set_result(index)
+        return index
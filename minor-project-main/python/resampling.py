@@ -0,0 +1,47 @@
+# resampling.py
+"""
+Time-bucket granularity for the Sales & Time Trends section:
+- pick a granularity (hour/day/week/month) from the span and density of time_col
+  (the cube then groups time_col with pd.Grouper at that frequency)
+"""
+
+from typing import Tuple
+import pandas as pd
+
+# (pandas frequency alias, human label, approximate bucket length), finest first
+GRANULARITIES = (
+    ("h", "hour", pd.Timedelta(hours=1)),
+    ("D", "day", pd.Timedelta(days=1)),
+    ("W", "week", pd.Timedelta(weeks=1)),
+    ("MS", "month", pd.Timedelta(days=30.44)),
+)
+# Upper bound on buckets drawn in a trend chart
+MAX_BUCKETS = 1000
+# Average rows per bucket below which a coarser granularity is preferred
+MIN_ROWS_PER_BUCKET = 1.0
+
+
+def choose_granularity(times: pd.Series, max_buckets: int = MAX_BUCKETS,
+                       min_rows_per_bucket: float = MIN_ROWS_PER_BUCKET) -> Tuple[str, str]:
+    """
+    Return (freq, label) for the finest granularity that keeps the number of
+    buckets within max_buckets while averaging at least min_rows_per_bucket rows.
+    Falls back to monthly buckets for very long or very sparse series.
+    """
+    times = times.dropna()
+    if times.empty:
+        return GRANULARITIES[1][:2]
+    return choose_granularity_for_range(times.min(), times.max(), len(times), max_buckets, min_rows_per_bucket)
+
+
+def choose_granularity_for_range(start: pd.Timestamp, end: pd.Timestamp, n_rows: int,
+                                 max_buckets: int = MAX_BUCKETS,
+                                 min_rows_per_bucket: float = MIN_ROWS_PER_BUCKET) -> Tuple[str, str]:
+    """choose_granularity from a precomputed time range and row count (e.g. gathered chunk by chunk)."""
+    span = end - start
+    for freq, label, length in GRANULARITIES:
+        n_buckets = span / length + 1
+        if n_buckets <= max_buckets and n_rows / n_buckets >= min_rows_per_bucket:
+            return freq, label
+    freq, label, _ = GRANULARITIES[-1]
+    return freq, label
@@ -0,0 +1,145 @@
+# schema.py
+"""
+Schema inference shared across the pipeline:
+- column kinds (numeric/categorical/datetime/text) are inferred on a bounded row sample
+- for string columns that hold dates, the datetime format is detected once on the
+  sample and cached on the schema, so the full conversion is one vectorized parse
+- pick_columns, compute_summary and insight_generator all reuse the same Schema
+"""
+
+from typing import Dict, List, Optional
+import warnings
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas.core.tools.datetimes import guess_datetime_format
+
+SAMPLE_ROWS = 10_000
+# Share of sampled non-null values that must parse for a column to count as datetime
+DATETIME_THRESHOLD = 0.8
+# Each candidate format is screened on this many values before the full sample
+DATETIME_PROBE_VALUES = 50
+# Tried (in order) when the format cannot be guessed from the first value
+COMMON_DATETIME_FORMATS = (
+    "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S",
+    "%d-%m-%Y", "%d/%m/%Y", "%m/%d/%Y", "%d/%m/%Y %H:%M", "%m/%d/%Y %H:%M",
+    "%Y/%m/%d", "%Y-%m", "%b %Y", "%d %b %Y", "%B %d, %Y",
+)
+
+NUMERIC, CATEGORICAL, DATETIME, TEXT = "numeric", "categorical", "datetime", "text"
+
+
+class ColumnSchema:
+    """Inferred kind of one column, plus the cached datetime format for string dates."""
+
+    def __init__(self, name, kind: str, datetime_format: Optional[str] = None, needs_parse: bool = False):
+        self.name = name
+        self.kind = kind
+        self.datetime_format = datetime_format
+        self.needs_parse = needs_parse
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return {"kind": self.kind, "datetime_format": self.datetime_format}
+
+
+class Schema:
+    """Ordered collection of ColumnSchema, built once per dataset by infer_schema."""
+
+    def __init__(self, columns: List[ColumnSchema]):
+        self.columns = {c.name: c for c in columns}
+
+    def types(self) -> Dict[str, str]:
+        """column -> kind, the shape infer_column_types has always returned."""
+        return {name: c.kind for name, c in self.columns.items()}
+
+    def of_kind(self, *kinds: str) -> List[str]:
+        return [name for name, c in self.columns.items() if c.kind in kinds]
+
+    def to_dict(self) -> Dict[str, Dict[str, Optional[str]]]:
+        return {name: c.to_dict() for name, c in self.columns.items()}
+
+
+def _sample(df: pd.DataFrame, sample_rows: int) -> pd.DataFrame:
+    if len(df) <= sample_rows:
+        return df
+    return df.sample(n=sample_rows, random_state=0)
+
+
+def detect_datetime_format(values: pd.Series) -> Optional[str]:
+    """Return a strftime format that parses most of the (non-null, string) sample, else None."""
+    if values.empty:
+        return None
+    first = str(values.iloc[0])
+    candidates = []
+    guessed = guess_datetime_format(first)
+    if guessed:
+        candidates.append(guessed)
+    candidates.extend(f for f in COMMON_DATETIME_FORMATS if f != guessed)
+    probe = values.iloc[:DATETIME_PROBE_VALUES]
+    for fmt in candidates:
+        # Coercing non-dates is slow; reject formats that fail on the probe first
+        if pd.to_datetime(probe, format=fmt, errors="coerce").notna().mean() <= DATETIME_THRESHOLD / 2:
+            continue
+        parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+        if parsed.notna().mean() > DATETIME_THRESHOLD:
+            return fmt
+    return None
+
+
+def _infer_column(name, full: pd.Series, sample: pd.Series) -> ColumnSchema:
+    if pd.api.types.is_datetime64_any_dtype(full):
+        return ColumnSchema(name, DATETIME)
+    if pd.api.types.is_bool_dtype(full) or pd.api.types.is_numeric_dtype(full):
+        return ColumnSchema(name, NUMERIC)
+
+    non_null = sample.dropna()
+    # Dictionary-encoded columns (e.g. read back from the dataset store) are
+    # checked through their categories' dtype
+    values_dtype = full.dtype.categories.dtype if isinstance(full.dtype, pd.CategoricalDtype) else full.dtype
+    if len(non_null) > 0:
+        if pd.api.types.is_string_dtype(values_dtype) or pd.api.types.is_object_dtype(values_dtype):
+            fmt = detect_datetime_format(non_null.astype(str))
+            if fmt is not None:
+                return ColumnSchema(name, DATETIME, datetime_format=fmt, needs_parse=True)
+
+    # Low cardinality (absolute, or relative to the sampled rows) => categorical
+    nunique = non_null.nunique()
+    if nunique <= 20 or (nunique / max(1, len(sample)) < 0.05):
+        return ColumnSchema(name, CATEGORICAL)
+    return ColumnSchema(name, TEXT)
+
+
+def infer_schema(df: pd.DataFrame, sample_rows: int = SAMPLE_ROWS) -> Schema:
+    """Infer a Schema for df from at most sample_rows sampled rows."""
+    sample = _sample(df, sample_rows)
+    return Schema([_infer_column(col, df[col], sample[col]) for col in df.columns])
+
+
+def parse_dates(ser: pd.Series, fmt: Optional[str]) -> pd.Series:
+    """Parse a string (or categorical of strings) column; categoricals parse each category once."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=UserWarning)
+        if isinstance(ser.dtype, pd.CategoricalDtype):
+            categories = pd.to_datetime(ser.cat.categories, format=fmt, errors="coerce")
+            values = categories.take(ser.cat.codes.to_numpy(), allow_fill=True, fill_value=pd.NaT)
+            return pd.Series(values, index=ser.index, name=ser.name)
+        return pd.to_datetime(ser, format=fmt, errors="coerce")
+
+
+def apply_schema(df: pd.DataFrame, schema: Schema) -> pd.DataFrame:
+    """
+    Return df with string date columns converted using their cached format
+    (one vectorized parse per column). The input frame is not modified.
+    """
+    conversions = {}
+    for name, col in schema.columns.items():
+        if col.needs_parse and name in df.columns:
+            conversions[name] = parse_dates(df[name], col.datetime_format)
+    if not conversions:
+        return df
+    out = df.copy(deep=False)
+    for name, values in conversions.items():
+        out[name] = values
+    return out
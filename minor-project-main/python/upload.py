@@ -1,26 +1,45 @@
 import pandas as pd
 import os
+from dataset_store import ARROW_SUFFIXES, StoredDataset
+from compaction import compact_dtypes
+from dialect import read_with_fallback, sniff_dialect
+from excel import EXCEL_SUFFIXES, read_excel_columnar
+from json_lines import JSON_LINES_SUFFIXES, read_json_lines
 
-def load_data_from_path(file_path):
+def load_data_from_path(file_path, dataset_id=None):
     """
-    Load a dataset from the given path with safe encoding fallback.
-    - Tries UTF-8 first.
-    - If decoding fails, retries with Latin-1.
-    - Supports .csv, .xlsx, and .xls formats.
+    Load a dataset from the given path.
+    - CSV encoding (BOM, UTF-8, cp1252/Latin-1), delimiter, quote char and decimal
+      separator are sniffed from a bounded sample, so the file is parsed once.
+    - Supports .csv, .xlsx, and .xls formats, plus .arrow/.feather files
+      from the dataset store (memory-mapped, no parsing).
+    - Excel sheets are parsed with the fastest installed engine; with a dataset_id
+      they are converted once into the dataset store and repeat loads never
+      reopen the workbook.
+    - .jsonl/.ndjson files are streamed in chunks with nested fields flattened.
+    - Compacts dtypes (categoricals, downcast numbers) and logs the bytes saved.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"❌ File not found: {file_path}")
 
-    try:
-        if file_path.endswith(".csv"):
-            df = pd.read_csv(file_path, encoding="utf-8")
-        elif file_path.endswith((".xlsx", ".xls")):
-            df = pd.read_excel(file_path)
-        else:
-            raise ValueError("Unsupported file format. Please upload a CSV or Excel file.")
-    except UnicodeDecodeError:
-        print("⚠️ UTF-8 decode failed — retrying with Latin-1 encoding...")
-        df = pd.read_csv(file_path, encoding="latin1")
+    if file_path.endswith(".csv"):
+        dialect = sniff_dialect(file_path)
+        if dialect.encoding != "utf-8":
+            print(f"ℹ️ Detected {dialect.encoding} encoding")
+        df = read_with_fallback(lambda d: pd.read_csv(file_path, **d.read_kwargs()), dialect, file_path)
+    elif file_path.endswith(EXCEL_SUFFIXES):
+        df = read_excel_columnar(file_path, dataset_id=dataset_id)
+    elif file_path.endswith(ARROW_SUFFIXES):
+        df = StoredDataset(file_path).read()
+    elif file_path.endswith(JSON_LINES_SUFFIXES):
+        with open(file_path, "rb") as f:
+            df = read_json_lines(f)
+    else:
+        raise ValueError("Unsupported file format. Please upload a CSV, Excel, JSON Lines or Arrow file.")
+
+    df, report = compact_dtypes(df)
+    for col, entry in report.items():
+        print(f"🗜️ {col}: {entry['from']} → {entry['to']} (saved {entry['bytes_saved']:,} bytes)")
 
     print(f"✅ File loaded successfully: {os.path.basename(file_path)}  →  {df.shape[0]} rows, {df.shape[1]} columns")
     return df